@@ -0,0 +1,18 @@
+"""Command-line entry point for the offline install-pipeline benchmark.
+
+Usage:
+    python benchmark_main.py --scale small --output bench.json
+    python benchmark_main.py --baseline bench.json --threshold 0.15
+
+Everything runs against a local HTTP stand-in, so no network is needed.
+See :mod:`odoo_agent.benchmark` for the stages and the results format.
+"""
+
+import multiprocessing
+
+from odoo_agent.benchmark import main
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    raise SystemExit(main())
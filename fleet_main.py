@@ -0,0 +1,22 @@
+"""Command-line entry point for provisioning many Odoo instances at once.
+
+Usage:
+    python fleet_main.py specs.json --workers 8 --summary summary.json
+
+``specs.json`` holds a list of instance specs, for example::
+
+    [{"target_dir": "tenants/acme", "version": "16.0", "modules": ["sale"]},
+     {"target_dir": "tenants/globex", "port": 8100}]
+
+A Google Gemini API key is read from the ``GEMINI_API_KEY`` environment
+variable when set.
+"""
+
+import multiprocessing
+
+from odoo_agent.fleet import main
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    raise SystemExit(main())
@@ -7,6 +7,7 @@ parameters and then runs the OdooInstallerAgent in real-install mode.
 
 from __future__ import annotations
 
+import multiprocessing
 import os
 
 from odoo_agent import OdooInstallerAgent
@@ -42,4 +43,6 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    # Needed for the process-pool archive extractor in a frozen EXE.
+    multiprocessing.freeze_support()
     main()
@@ -1,5 +1,6 @@
 """Odoo installer agent package."""
 
 from .agent import OdooInstallerAgent
+from .fleet import InstanceSpec, install_many
 
-__all__ = ["OdooInstallerAgent"]
+__all__ = ["OdooInstallerAgent", "InstanceSpec", "install_many"]
@@ -6,12 +6,38 @@ conceptual Google API integration for an Odoo instance.
 
 from __future__ import annotations
 
+import os
+import sys
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional, Sequence, Union
 
-from .detection import detect_odoo_executable
-from .download import download_odoo
-from .setup_odoo import setup_odoo
+from . import events, metrics
+from .checkpoint import Checkpoint
+from .detection import detect_odoo_executable, read_odoo_version
+from .download import (
+    archive_source_path,
+    archive_validator,
+    download_odoo,
+    extract_odoo,
+    fetch_odoo,
+)
+from .extract import read_source_file
+from .precompile import prepare_tree
+from .ranged import DEFAULT_WORKERS
+from .rpc import OdooClient
+from .scheduler import StepGraph
+from .sizing import size_instance
+from .supervisor import OdooSupervisor
+from .upgrade import update_odoo
+from .venvs import venv_python
+from .wheelhouse import requirements_hash
+from .setup_odoo import (
+    install_requirements,
+    launch_server,
+    setup_database,
+    setup_odoo,
+    write_config,
+)
 from .google_integration import integrate_google_api
 
 
@@ -25,97 +51,770 @@ class OdooInstallerAgent:
 
     config: Dict = field(default_factory=dict)
     odoo_config_path: Optional[str] = None
+    last_step_report: str = ""
+    odoo_path: Optional[str] = None
+    odoo_python: Optional[str] = None
+    http_port: int = 8069
+    supervisor: Optional[OdooSupervisor] = field(default=None, repr=False)
+    run_log: Optional[events.RunLog] = field(default=None, repr=False)
 
     def __post_init__(self) -> None:
-        print("OdooInstallerAgent initialized with configuration:", self.config)
+        self.log(f"OdooInstallerAgent initialized with configuration: {self.config}")
+        # Optional metrics export: JSON lines and/or a Prometheus textfile.
+        metrics.configure(
+            jsonl_path=self.config.get("metrics_jsonl"),
+            prometheus_path=self.config.get("metrics_prom"),
+        )
+
+    def log(self, message: str) -> None:
+        """Report progress to this agent's ``run_log``, or print it."""
+
+        if self.run_log is not None:
+            self.run_log.log(message)
+        else:
+            print(message)
 
     # --- Low-level operations -------------------------------------------------
 
-    def detect_odoo_executable(self):
-        """Detect an existing Odoo executable on the system."""
+    def detect_odoo_executable(self, version: Optional[str] = None):
+        """Detect an existing Odoo executable on the system.
+
+        ``version`` selects a matching install when several are present;
+        the ``detect_roots`` configuration entry overrides the scanned roots.
+        """
 
-        return detect_odoo_executable()
+        return detect_odoo_executable(
+            version=version, roots=self.config.get("detect_roots"), log=self.log
+        )
 
     def download_odoo(
         self,
         version: str = "16.0",
         target_dir: str = ".",
+        download_url: Union[str, Sequence[str], None] = None,
+        modules: Optional[Iterable[str]] = None,
+    ):
+        """Download and extract Odoo source code.
+
+        If ``modules`` is given, only the core source tree and the addons in
+        the dependency closure of those modules are extracted.
+
+        Archives go through the shared download cache unless the agent
+        configuration sets ``use_cache`` to False; ``cache_dir`` overrides
+        the cache location, ``use_store`` checks the source out of the shared
+        deduplicated store (``store_dir``), ``download_workers`` sets the number of
+        parallel HTTP Range segments, ``extract_workers`` sets the number of
+        zip extraction processes and ``stream_extract`` extracts while
+        downloading instead of keeping an archive copy. Store entries are
+        precompiled to bytecode unless ``precompile`` is False. Without a
+        ``download_url``, the ``download_mirrors`` entry (an ordered list of
+        archive URLs) is probed and the fastest source is used.
+        """
+
+        return download_odoo(
+            version=version,
+            target_dir=target_dir,
+            download_url=download_url or self.config.get("download_mirrors"),
+            use_cache=self.config.get("use_cache", True),
+            cache_dir=self.config.get("cache_dir"),
+            workers=self.config.get("download_workers", DEFAULT_WORKERS),
+            stream=self.config.get("stream_extract", False),
+            extract_workers=self.config.get("extract_workers"),
+            modules=modules,
+            use_store=self.config.get("use_store", False),
+            store_dir=self.config.get("store_dir"),
+            precompile=self.config.get("precompile", True),
+            log=self.log,
+        )
+
+    def fetch_odoo(
+        self,
+        version: str = "16.0",
+        target_dir: str = ".",
+        download_url: Union[str, Sequence[str], None] = None,
+    ):
+        """Download the Odoo archive without extracting it.
+
+        The first half of :meth:`download_odoo`, with the same download
+        configuration entries. Returns ``(success, archive_path, sha256)``.
+        """
+
+        return fetch_odoo(
+            version=version,
+            target_dir=target_dir,
+            download_url=download_url or self.config.get("download_mirrors"),
+            use_cache=self.config.get("use_cache", True),
+            cache_dir=self.config.get("cache_dir"),
+            workers=self.config.get("download_workers", DEFAULT_WORKERS),
+            log=self.log,
+        )
+
+    def extract_odoo(
+        self,
+        filename: str,
+        digest: str,
+        version: str = "16.0",
+        target_dir: str = ".",
+        modules: Optional[Iterable[str]] = None,
+    ):
+        """Extract an archive returned by :meth:`fetch_odoo`.
+
+        The second half of :meth:`download_odoo`, with the same extraction
+        and store configuration entries.
+        """
+
+        return extract_odoo(
+            filename,
+            digest,
+            version=version,
+            target_dir=target_dir,
+            extract_workers=self.config.get("extract_workers"),
+            modules=modules,
+            use_store=self.config.get("use_store", False),
+            store_dir=self.config.get("store_dir"),
+            precompile=self.config.get("precompile", True),
+            log=self.log,
+        )
+
+    def update_odoo(
+        self,
+        source_path: Optional[str] = None,
+        version: str = "16.0",
         download_url: Optional[str] = None,
+        modules: Optional[Iterable[str]] = None,
     ):
-        """Download and extract Odoo source code."""
+        """Update an installed source tree in place with only changed files.
+
+        ``source_path`` defaults to the tree this agent installed. When the
+        ``update_mirror`` configuration entry names a per-file mirror, only
+        changed files are downloaded; otherwise the branch archive is
+        fetched through the download cache (``cache_dir``). ``modules``
+        defaults to the selection recorded when the tree was installed.
+        """
 
-        return download_odoo(version=version, target_dir=target_dir, download_url=download_url)
+        return update_odoo(
+            source_path or self.odoo_path or ".",
+            version=version,
+            download_url=download_url,
+            mirror_url=self.config.get("update_mirror"),
+            cache_dir=self.config.get("cache_dir"),
+            workers=self.config.get("download_workers", DEFAULT_WORKERS),
+            modules=modules,
+            log=self.log,
+        )
 
-    def setup_odoo(self, odoo_path: str, real_install: bool = False) -> bool:
+    def setup_odoo(
+        self,
+        odoo_path: str,
+        real_install: bool = False,
+        config_dir: Optional[str] = None,
+        venv_dir: Optional[str] = None,
+        http_port: int = 8069,
+        modules: Optional[Iterable[str]] = None,
+        data_dir: Optional[str] = None,
+        source: Optional[str] = None,
+    ) -> bool:
         """Run Odoo setup steps and remember the config path.
 
         If ``real_install`` is True this will attempt to install
         requirements and start a real Odoo server process. Otherwise it
-        behaves conceptually (no system changes).
+        behaves conceptually (no system changes). ``config_dir`` is the
+        per-instance overlay that receives ``odoo.conf``. Requirements are
+        installed from the shared wheelhouse unless the configuration sets
+        ``use_wheelhouse`` to False; with ``venv_dir`` they go into a
+        per-instance virtualenv cloned from a cached template.
+
+        Unless the configuration sets ``supervise`` to False, a real install
+        does not launch the server itself; call :meth:`start_odoo` (as
+        :meth:`execute_installation_process` does) to run it supervised.
+
+        Real installs get multiprocess settings sized for this host from
+        the ``performance_profile`` configuration entry ("small", "medium"
+        or "large"; "medium" by default), shared between
+        ``instances_on_host`` instances. ``proxy_mode`` marks instances
+        served behind a reverse proxy.
+
+        With ``odoo_db`` configured, a real install creates that database
+        from a cached template initialized with ``modules`` and points
+        ``odoo.conf`` at it; ``db_host``, ``db_port``, ``db_user`` and
+        ``db_password`` override the PostgreSQL connection settings.
+        ``source``, the digest returned by :meth:`fetch_odoo`, keys that
+        template alongside the version and modules.
+
+        Real installs precompile the tree's bytecode unless ``precompile``
+        is False (store checkouts already carry it from the store), and
+        ``warm_imports`` times and warms the core imports before the first
+        server start.
         """
 
-        success, config_path = setup_odoo(odoo_path, real_install=real_install)
+        success, config_path = setup_odoo(
+            odoo_path,
+            real_install=real_install,
+            config_dir=config_dir,
+            use_wheelhouse=self.config.get("use_wheelhouse", True),
+            cache_dir=self.config.get("cache_dir"),
+            venv_dir=venv_dir,
+            http_port=http_port,
+            server_options=self._server_options(real_install),
+            start_server=not self.config.get("supervise", True),
+            database=self.config.get("odoo_db"),
+            modules=modules,
+            data_dir=data_dir,
+            precompile=(
+                self.config.get("precompile", True)
+                and not self.config.get("use_store", False)
+            ),
+            warm_imports=self.config.get("warm_imports", False),
+            db_settings=self._db_settings(),
+            source=source,
+            log=self.log,
+        )
         if success:
             self.odoo_config_path = config_path
+            self.odoo_path = odoo_path
+            self.odoo_python = venv_python(venv_dir) if venv_dir else sys.executable
+            self.http_port = http_port
         return success
 
+    def _server_options(self, real_install: bool) -> Optional[Dict[str, str]]:
+        """Return the ``odoo.conf`` worker and memory settings for this host."""
+
+        default_profile = "medium" if real_install else None
+        profile = self.config.get("performance_profile", default_profile)
+        if not profile:
+            return None
+        return size_instance(
+            profile,
+            instances=self.config.get("instances_on_host", 1),
+            behind_proxy=self.config.get("proxy_mode", False),
+            log=self.log,
+        )
+
+    def _db_settings(self) -> Dict[str, str]:
+        return {
+            key: self.config[key]
+            for key in ("db_host", "db_port", "db_user", "db_password")
+            if key in self.config
+        }
+
+    # --- Server lifecycle -----------------------------------------------------
+
+    def start_odoo(self, wait: bool = True) -> bool:
+        """Start the configured Odoo server under a supervisor.
+
+        The supervisor polls the HTTP port until the server is ready,
+        records the time-to-ready and restarts the server with jittered
+        backoff if it crashes. ``ready_timeout`` and ``max_restarts`` in the
+        configuration tune it. A server that does not become ready is
+        stopped again.
+        """
+
+        if self.odoo_path is None or self.odoo_config_path is None:
+            self.log("Error: run setup_odoo before starting the server.")
+            return False
+
+        if self.supervisor is None:
+            # The server runs with ``cwd=odoo_path``, so relative paths
+            # would resolve against the tree instead of our directory.
+            odoo_path = os.path.abspath(self.odoo_path)
+            self.supervisor = OdooSupervisor(
+                [
+                    os.path.abspath(self.odoo_python or sys.executable),
+                    os.path.join(odoo_path, "odoo-bin"),
+                    "-c",
+                    os.path.abspath(self.odoo_config_path),
+                ],
+                port=self.http_port,
+                cwd=odoo_path,
+                ready_timeout=self.config.get("ready_timeout", 120.0),
+                max_restarts=self.config.get("max_restarts", 5),
+                log=self.log,
+            )
+        if not self.supervisor.start(wait=wait):
+            # Do not leave a half-started server restarting in the background.
+            self.stop_odoo()
+            return False
+        return True
+
+    def stop_odoo(self) -> None:
+        """Stop the supervised Odoo server, if any."""
+
+        if self.supervisor is not None:
+            self.supervisor.stop()
+
+    def odoo_status(self) -> Dict:
+        """Return the supervised server's status (PIDs, readiness, restarts)."""
+
+        if self.supervisor is None:
+            return {"running": False, "port": self.http_port}
+        return self.supervisor.status()
+
+    def odoo_client(self, url: Optional[str] = None) -> OdooClient:
+        """Return an RPC client for this agent's Odoo instance.
+
+        The ``odoo_db``, ``odoo_login``, ``odoo_password`` and
+        ``rpc_protocol`` ("jsonrpc" or "xmlrpc") configuration entries
+        select the database, credentials and wire protocol.
+        """
+
+        return OdooClient(
+            url or f"http://localhost:{self.http_port}",
+            db=self.config.get("odoo_db", "odoo"),
+            login=self.config.get("odoo_login", "admin"),
+            password=self.config.get("odoo_password", "admin"),
+            protocol=self.config.get("rpc_protocol", "jsonrpc"),
+        )
+
     def integrate_google_api(self, odoo_instance_details: Dict) -> bool:
         """Integrate Google APIs (for example Gemini) conceptually."""
 
-        return integrate_google_api(self.config, odoo_instance_details)
+        return integrate_google_api(self.config, odoo_instance_details, log=self.log)
 
     # --- Orchestration --------------------------------------------------------
 
+    def install_many(
+        self,
+        specs: Iterable,
+        workers: Optional[int] = None,
+        real_install: bool = False,
+    ):
+        """Provision several instances concurrently with this configuration.
+
+        See :func:`odoo_agent.fleet.install_many`.
+        """
+
+        from .fleet import install_many
+
+        return install_many(
+            specs,
+            config=self.config,
+            workers=workers,
+            real_install=real_install,
+            log=self.log,
+        )
+
+    def start_installation_process(self, **kwargs) -> events.RunLog:
+        """Run :meth:`execute_installation_process` in a background thread.
+
+        Log lines and step events are collected in the returned
+        :class:`~odoo_agent.events.RunLog` as they happen, isolated from
+        other runs in the same process; its ``result`` holds the workflow's
+        success flag once ``done`` is set. The log becomes this agent's
+        ``run_log``.
+        """
+
+        def run(run_log: events.RunLog, **params) -> bool:
+            self.run_log = run_log
+            return self.execute_installation_process(**params)
+
+        return events.submit(run, **kwargs)
+
     def execute_installation_process(
         self,
         odoo_version: str = "16.0",
         target_directory: str = ".",
         real_install: bool = False,
+        modules: Optional[Iterable[str]] = None,
+        http_port: int = 8069,
+        download_url: Optional[str] = None,
     ) -> bool:
         """Run the full conceptual Odoo installation workflow.
 
         Steps:
-        1. Detect existing Odoo executable.
-        2. If not found, download and extract the specified Odoo version.
-        3. Run setup steps (conceptual or real, depending on ``real_install``).
-        4. Conceptually integrate Google APIs.
+        1. Detect an existing Odoo executable of the requested version.
+        2. If not found, ask the sources whether the archive changed and
+           fetch the Odoo archive of the specified version.
+        3. Extract it (restricted to ``modules`` and their dependencies when
+           given).
+        4. Install the Python requirements, read from the archive while it
+           is being extracted.
+        5. Write ``odoo.conf``, which only needs the source path.
+        6. Create the database and precompile the tree once both the tree
+           and the requirements are in place (conceptual or real, depending
+           on ``real_install``).
+        7. Start the supervised server (real installs).
+        8. Conceptually integrate Google APIs.
+
+        Steps run on a :class:`~odoo_agent.scheduler.StepGraph`, each as soon
+        as the inputs it needs exist: the Google API check does not depend on
+        the others and overlaps with them (unless ``odoo_db`` is configured,
+        in which case it runs after the server started, with an
+        :class:`~odoo_agent.rpc.OdooClient`), and
+        steps downstream of a failure are cancelled. The timing report with
+        the critical path is printed and kept in ``last_step_report``.
+
+        Unless the configuration sets ``checkpoint`` to False, completed
+        steps are recorded in a state file in ``target_directory`` together
+        with a fingerprint of their inputs (version, sources, modules,
+        the values of the steps they depend on and the configuration
+        entries they read). A re-run
+        skips every step whose inputs are unchanged and resumes from the
+        first invalidated one, so retrying a failed setup does not download
+        again. The download is only skipped while a conditional request to
+        the cache (or the sources' ``ETag``/``Last-Modified``), made on
+        every run, shows the archive is unchanged, so a moved branch is
+        fetched again. Starting
+        the server is never skipped.
         """
 
-        print("Starting Odoo installation process...")
+        self.log("Starting Odoo installation process...")
+        checkpoint = None
+        if self.config.get("checkpoint", True):
+            checkpoint = Checkpoint.for_target(target_directory)
+
+        def config_subset(*keys):
+            return {key: self.config.get(key) for key in keys}
+
+        modules_key = sorted(modules) if modules is not None else None
+        use_store = self.config.get("use_store", False)
+        # Streaming extracts while downloading; the store disables it.
+        stream = self.config.get("stream_extract", False) and not use_store
+        database = self.config.get("odoo_db")
+        venv_dir = None
+        if self.config.get("use_venv", False):
+            venv_dir = os.path.abspath(os.path.join(target_directory, "venv"))
+        data_dir = None
+        if database:
+            data_dir = os.path.abspath(os.path.join(target_directory, "data"))
 
         # Step 1: Detect existing Odoo installation
-        found, odoo_exec_path = self.detect_odoo_executable()
-        if found:
-            print(f"Odoo executable found at: {odoo_exec_path}. Skipping download.")
-            # Use the parent directory of the executable as the installation root
-            # when possible.
-            import os
-
-            current_odoo_path = os.path.dirname(odoo_exec_path) or "."
-            print(f"Using detected Odoo path for setup: {current_odoo_path}")
-        else:
-            # Step 2: Download Odoo
-            success, download_path = self.download_odoo(
+        def detect(_):
+            return self.detect_odoo_executable(version=odoo_version)
+
+        def detect_key(_):
+            return {"version": odoo_version, **config_subset("detect_roots")}
+
+        def detect_check(value):
+            found, odoo_exec_path = value
+            return not found or os.path.exists(odoo_exec_path)
+
+        # Step 2: Fetch the archive unless an install was detected. Branch
+        # URLs are mutable, so the sources are asked first whether the archive
+        # changed (a conditional request to the cache, else the sources'
+        # ``ETag``/``Last-Modified``); the fetch is keyed on that answer.
+        use_cache = self.config.get("use_cache", True) and not stream
+        sources = download_url or self.config.get("download_mirrors")
+
+        def revalidate(inputs):
+            found, _ = inputs["detect"]
+            if found:
+                return None
+            return archive_validator(
+                version=odoo_version,
+                download_url=sources,
+                use_cache=use_cache,
+                cache_dir=self.config.get("cache_dir"),
+                log=self.log,
+            )
+
+        def fetch(inputs):
+            found, odoo_exec_path = inputs["detect"]
+            if found:
+                self.log(
+                    f"Odoo executable found at: {odoo_exec_path}. Skipping download."
+                )
+                # Use the parent directory of the executable as the
+                # installation root when possible.
+                current_odoo_path = os.path.dirname(odoo_exec_path) or "."
+                self.log(f"Using detected Odoo path for setup: {current_odoo_path}")
+                return {"odoo_path": current_odoo_path, "detected": True}
+
+            if stream:
+                success, download_path = self.download_odoo(
+                    version=odoo_version,
+                    target_dir=target_directory,
+                    download_url=download_url,
+                    modules=modules,
+                )
+                if not success:
+                    self.log("Odoo download failed.")
+                    return False
+                # The tree path never changes; the validator tells the
+                # downstream steps that its contents did.
+                return {"odoo_path": download_path, "validator": inputs["revalidate"]}
+
+            success, archive, digest = self.fetch_odoo(
                 version=odoo_version,
                 target_dir=target_directory,
+                download_url=download_url,
             )
             if not success:
-                print("Odoo download failed.")
+                self.log("Odoo download failed.")
                 return False
-            current_odoo_path = download_path
+            return {"archive": archive, "digest": digest}
 
-        # Step 3: Setup Odoo
-        if not self.setup_odoo(current_odoo_path, real_install=real_install):
-            print("Odoo setup failed.")
-            return False
+        def fetch_key(inputs):
+            found, _ = inputs["detect"]
+            if not found and inputs["revalidate"] is None:
+                # Nothing shows the archive is unchanged: fetch it again.
+                return None
+            key = {
+                "version": odoo_version,
+                "target": os.path.abspath(target_directory),
+                "sources": sources,
+                **config_subset("use_cache", "cache_dir", "stream_extract", "use_store"),
+            }
+            if stream:
+                key["modules"] = modules_key
+            return key
+
+        def fetch_check(value):
+            if "archive" in value:
+                return os.path.exists(value["archive"])
+            return os.path.exists(os.path.join(value["odoo_path"], "odoo-bin"))
+
+        # Step 3: Extract the archive
+        def extract(inputs):
+            fetched = inputs["fetch"]
+            if "archive" not in fetched:
+                return fetched["odoo_path"]
+            success, source_path = self.extract_odoo(
+                fetched["archive"],
+                fetched["digest"],
+                version=odoo_version,
+                target_dir=target_directory,
+                modules=modules,
+            )
+            if not success:
+                self.log("Odoo extraction failed.")
+                return False
+            return source_path
+
+        def extract_key(_):
+            return {
+                "modules": modules_key,
+                **config_subset("use_store", "store_dir", "precompile"),
+            }
+
+        def extract_check(value):
+            return os.path.exists(os.path.join(value, "odoo-bin"))
+
+        # Step 4: Install the Python requirements
+        def requirements_file(fetched):
+            if "archive" not in fetched:
+                return os.path.join(fetched["odoo_path"], "requirements.txt")
+            # Read it straight from the archive so the install overlaps
+            # with the extraction.
+            path = os.path.join(target_directory, "requirements.txt")
+            _, content = read_source_file(fetched["archive"], "requirements.txt")
+            if content is not None:
+                with open(path, "wb") as f:
+                    f.write(content)
+            elif os.path.exists(path):
+                os.remove(path)
+            return path
+
+        def deps(inputs):
+            fetched = inputs["fetch"]
+            python = install_requirements(
+                requirements_file(fetched),
+                real_install=real_install,
+                use_wheelhouse=self.config.get("use_wheelhouse", True),
+                cache_dir=self.config.get("cache_dir"),
+                venv_dir=venv_dir,
+                version=(
+                    odoo_version
+                    if "archive" in fetched
+                    else read_odoo_version(fetched["odoo_path"])
+                ),
+                log=self.log,
+            )
+            if python is None:
+                self.log("Installing the Odoo requirements failed.")
+                return False
+            return python
+
+        def deps_key(inputs):
+            fetched = inputs["fetch"]
+            key = {
+                "real_install": real_install,
+                **config_subset("use_venv", "use_wheelhouse", "cache_dir"),
+            }
+            if "archive" not in fetched:
+                # The archive digest covers requirements.txt; a detected or
+                # streamed tree is hashed instead.
+                requirements_path = requirements_file(fetched)
+                if os.path.exists(requirements_path):
+                    key["requirements"] = requirements_hash(requirements_path)
+            return key
+
+        # Step 5: Write odoo.conf, which only needs the source path
+        def config(inputs):
+            fetched = inputs["fetch"]
+            odoo_path = fetched.get("odoo_path") or archive_source_path(
+                fetched["archive"], target_directory, odoo_version
+            )
+            config_dir = None
+            if use_store and not fetched.get("detected"):
+                # Store checkouts share files with the store; keep
+                # per-instance files in an overlay next to them.
+                config_dir = os.path.join(target_directory, "instance")
+            config_path = write_config(
+                odoo_path,
+                config_dir=config_dir,
+                http_port=http_port,
+                server_options=self._server_options(real_install),
+                database=database,
+                data_dir=data_dir,
+                db_settings=self._db_settings(),
+                log=self.log,
+            )
+            return {"config_path": config_path, "odoo_path": odoo_path}
+
+        def config_key(_):
+            return {
+                "real_install": real_install,
+                "http_port": http_port,
+                **config_subset(
+                    "use_store",
+                    "performance_profile",
+                    "instances_on_host",
+                    "proxy_mode",
+                    "odoo_db",
+                    "db_host",
+                    "db_port",
+                    "db_user",
+                    "db_password",
+                ),
+            }
+
+        def config_check(value):
+            return os.path.exists(value["config_path"])
+
+        # Step 6: Create the database from a cached template
+        def db(inputs):
+            if not setup_database(
+                inputs["extract"],
+                database,
+                inputs["deps"],
+                real_install=real_install,
+                modules=modules,
+                data_dir=data_dir,
+                db_settings=self._db_settings(),
+                cache_dir=self.config.get("cache_dir"),
+                source=inputs["fetch"].get("digest"),
+                log=self.log,
+            ):
+                self.log("Odoo database setup failed.")
+                return False
+            return True
+
+        def db_key(_):
+            return {
+                "real_install": real_install,
+                "modules": modules_key,
+                **config_subset(
+                    "cache_dir",
+                    "odoo_db",
+                    "db_host",
+                    "db_port",
+                    "db_user",
+                    "db_password",
+                ),
+            }
+
+        # Store checkouts already carry bytecode compiled in the store.
+        precompile = self.config.get("precompile", True) and not use_store
+        warm_imports = self.config.get("warm_imports", False)
+
+        def prepare(inputs):
+            if real_install and (precompile or warm_imports):
+                prepare_tree(
+                    inputs["extract"],
+                    inputs["deps"],
+                    warm=warm_imports,
+                    precompile=precompile,
+                    log=self.log,
+                )
+            return True
+
+        def prepare_key(_):
+            return {
+                "real_install": real_install,
+                **config_subset("precompile", "use_store", "warm_imports"),
+            }
+
+        supervise = self.config.get("supervise", True)
+
+        # Step 7: Start the server (never skipped: it is a process)
+        def start(inputs):
+            self.odoo_config_path = inputs["config"]["config_path"]
+            self.odoo_path = inputs["extract"]
+            self.odoo_python = inputs["deps"]
+            self.http_port = http_port
+            if not real_install:
+                self.log("Initiating Odoo server process (conceptual step)...")
+                return True
+            if not os.path.exists(os.path.join(self.odoo_path, "odoo-bin")):
+                self.log(
+                    f"Error: odoo-bin not found in {self.odoo_path}. Make sure "
+                    "the Odoo source was downloaded correctly."
+                )
+                return False
+            if not supervise:
+                launch_server(
+                    self.odoo_path,
+                    self.odoo_config_path,
+                    self.odoo_python,
+                    http_port,
+                    log=self.log,
+                )
+            elif not self.start_odoo():
+                self.log("Odoo server did not become ready.")
+                return False
+            return True
+
+        # Step 8: Integrate Google API. Without a database only the
+        # configuration is checked, so this runs alongside the other steps;
+        # with ``odoo_db`` configured it waits for setup and gets a client.
+        use_rpc = bool(self.config.get("odoo_db"))
+
+        def integrate(_):
+            odoo_instance_details = {
+                "url": f"http://localhost:{http_port}",
+                "admin_user": self.config.get("odoo_login", "admin"),
+            }
+            if use_rpc:
+                odoo_instance_details["client"] = self.odoo_client(
+                    odoo_instance_details["url"]
+                )
+            if not self.integrate_google_api(odoo_instance_details):
+                self.log("Google API integration failed.")
+                return False
+            return True
 
-        # Placeholder for getting actual Odoo instance details after setup
-        odoo_instance_details = {"url": "http://localhost:8069", "admin_user": "admin"}
+        graph = StepGraph(
+            max_workers=self.config.get("step_workers", 4),
+            checkpoint=checkpoint,
+            log=self.log,
+            run_log=self.run_log,
+        )
+        graph.add("detect", detect, key=detect_key, check=detect_check)
+        graph.add("revalidate", revalidate, deps=["detect"])
+        graph.add(
+            "fetch",
+            fetch,
+            deps=["detect", "revalidate"],
+            key=fetch_key,
+            check=fetch_check,
+        )
+        graph.add(
+            "extract", extract, deps=["fetch"], key=extract_key, check=extract_check
+        )
+        graph.add("deps", deps, deps=["fetch"], key=deps_key, check=os.path.exists)
+        graph.add("config", config, deps=["fetch"], key=config_key, check=config_check)
+        graph.add("db", db, deps=["fetch", "extract", "deps"], key=db_key)
+        graph.add(
+            "prepare", prepare, deps=["fetch", "extract", "deps"], key=prepare_key
+        )
+        graph.add("start", start, deps=["extract", "deps", "config", "db", "prepare"])
+        graph.add("integrate", integrate, deps=["start"] if use_rpc else ())
+        success = graph.run()
 
-        # Step 4: Integrate Google API
-        if not self.integrate_google_api(odoo_instance_details):
-            print("Google API integration failed.")
+        self.last_step_report = graph.report()
+        self.log(self.last_step_report)
+        if not success:
             return False
 
-        print("Odoo installation process completed successfully.")
+        self.log("Odoo installation process completed successfully.")
         return True
@@ -0,0 +1,545 @@
+"""Offline benchmark harness for the install pipeline.
+
+The harness generates a deterministic synthetic source tree shaped like an
+Odoo release (addons with manifests, Python models, XML views, JS assets,
+translations and incompressible images), packs it as ``.zip`` and
+``.tar.gz`` and serves both from a local HTTP stand-in on loopback. The
+stand-in answers conditional requests and, on its ``/ranges/`` prefix,
+single ``Range`` requests; the ``/plain/`` prefix serves the same files
+without Range support. An optional per-connection bandwidth cap makes the
+parallel Range downloader measurable on loopback.
+
+Each stage (download, extract, the full ``download_odoo`` pipeline and
+``setup_odoo``) is timed cold (fresh cache / output directory) and warm
+(repeated against the state the cold run left behind). Results are written
+as JSON and can be compared against a baseline file; a stage whose median
+slows down by more than the threshold is reported as a regression and the
+run exits non-zero.
+
+Run it with::
+
+    python benchmark_main.py --scale small --output bench.json
+    python benchmark_main.py --baseline bench.json --threshold 0.15
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime
+import email.utils
+import gzip
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .cache import ArchiveCache
+from .download import download_odoo
+from .extract import extract_archive
+from .ranged import download_response, make_session
+from .setup_odoo import setup_odoo
+from .sizing import size_instance
+
+SCHEMA_VERSION = 1
+VERSION = "16.0"
+TOP_DIR = f"odoo-{VERSION}"
+# Fixed timestamp so archives are byte-identical between runs.
+EPOCH = 1_672_531_200
+SEND_CHUNK = 64 * 1024
+DEFAULT_THRESHOLD = 0.15
+# Differences below this many seconds are treated as noise.
+DEFAULT_MIN_DELTA = 0.01
+
+
+@dataclass(frozen=True)
+class Scale:
+    """Size of the synthetic source tree."""
+
+    addons: int
+    files_per_addon: int
+
+
+# ``full`` approaches a real Odoo release (600+ addons, ~40k files).
+SCALES = {
+    "tiny": Scale(addons=20, files_per_addon=20),
+    "small": Scale(addons=150, files_per_addon=30),
+    "full": Scale(addons=600, files_per_addon=65),
+}
+
+_WORDS = (
+    "partner invoice move line account journal product template sale order "
+    "stock picking quant location company currency amount tax record field "
+    "compute depends onchange view form tree kanban search action menu"
+).split()
+
+
+# --- Synthetic dataset ---------------------------------------------------------
+
+
+def _text(rng: random.Random, size: int) -> bytes:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words).encode("ascii")[:size]
+
+
+def _file_size(rng: random.Random) -> int:
+    # Source files are mostly a few KB with a long tail.
+    return int(min(256 * 1024, rng.lognormvariate(8.2, 1.1)))
+
+
+def synthetic_files(scale: Scale, seed: int = 0) -> Dict[str, bytes]:
+    """Return a deterministic ``{path: content}`` map shaped like Odoo."""
+
+    rng = random.Random(seed)
+    files: Dict[str, bytes] = {
+        "odoo-bin": b"#!/usr/bin/env python3\nimport odoo\nodoo.cli.main()\n",
+        "requirements.txt": b"",
+        "setup.py": b"from setuptools import setup\nsetup(name='odoo')\n",
+        "odoo/__init__.py": b"",
+        "odoo/release.py": b"version_info = (16, 0, 0, 'final', 0, '')\n",
+        "odoo/addons/base/__manifest__.py": b"{'name': 'Base', 'depends': []}\n",
+    }
+    for i in range(scale.files_per_addon * 5):
+        files[f"odoo/core/module_{i}.py"] = _text(rng, _file_size(rng))
+
+    names = [f"addon_{i:03d}" for i in range(scale.addons)]
+    for index, name in enumerate(names):
+        depends = ["base"] + rng.sample(names[:index], min(index, rng.randint(0, 3)))
+        manifest = {"name": name, "depends": depends, "data": []}
+        files[f"addons/{name}/__manifest__.py"] = repr(manifest).encode("ascii")
+        files[f"addons/{name}/__init__.py"] = b"from . import models\n"
+        for j in range(scale.files_per_addon - 2):
+            kind = rng.random()
+            if kind < 0.4:
+                path = f"addons/{name}/models/model_{j}.py"
+            elif kind < 0.65:
+                path = f"addons/{name}/views/view_{j}.xml"
+            elif kind < 0.85:
+                path = f"addons/{name}/static/src/js/widget_{j}.js"
+            elif kind < 0.95:
+                path = f"addons/{name}/i18n/lang_{j}.po"
+            else:
+                path = f"addons/{name}/static/description/image_{j}.png"
+                files[path] = rng.randbytes(_file_size(rng))
+                continue
+            files[path] = _text(rng, _file_size(rng))
+    return files
+
+
+def build_archives(files: Dict[str, bytes], directory: str) -> Dict[str, str]:
+    """Write ``files`` as ``odoo.zip`` and ``odoo.tar.gz`` under ``directory``."""
+
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        "zip": os.path.join(directory, "odoo.zip"),
+        "tar.gz": os.path.join(directory, "odoo.tar.gz"),
+    }
+    date_time = time.gmtime(EPOCH)[:6]
+    with zipfile.ZipFile(paths["zip"], "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        for name in sorted(files):
+            info = zipfile.ZipInfo(f"{TOP_DIR}/{name}", date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            zip_ref.writestr(info, files[name])
+
+    with open(paths["tar.gz"], "wb") as raw:
+        # A fixed gzip mtime keeps the archive bytes reproducible.
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=EPOCH) as gz:
+            with tarfile.open(fileobj=gz, mode="w") as tar_ref:
+                for name in sorted(files):
+                    info = tarfile.TarInfo(f"{TOP_DIR}/{name}")
+                    info.size = len(files[name])
+                    info.mtime = EPOCH
+                    info.mode = 0o755 if name == "odoo-bin" else 0o644
+                    tar_ref.addfile(info, io.BytesIO(files[name]))
+    return paths
+
+
+# --- Local HTTP stand-in -------------------------------------------------------
+
+
+class _ArchiveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "ArchiveServer"
+
+    def log_message(self, format, *args) -> None:  # noqa: A002 - stdlib signature
+        pass
+
+    def do_HEAD(self) -> None:
+        self._serve(send_body=False)
+
+    def do_GET(self) -> None:
+        self._serve(send_body=True)
+
+    def _serve(self, send_body: bool) -> None:
+        match = re.fullmatch(r"/(ranges|plain)/([\w.]+)", self.path)
+        entry = self.server.entries.get(match.group(2)) if match else None
+        if entry is None:
+            self.send_error(404)
+            return
+        ranges = match.group(1) == "ranges"
+        path, size, etag = entry
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = 0, size - 1
+        status = 200
+        requested = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if ranges and requested and (if_range is None or if_range == etag):
+            parsed = re.fullmatch(r"bytes=(\d+)-(\d*)", requested)
+            if parsed:
+                start = int(parsed.group(1))
+                end = min(int(parsed.group(2) or size - 1), size - 1)
+                status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", email.utils.formatdate(EPOCH, usegmt=True))
+        if ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if send_body:
+            self._send_file(path, start, end - start + 1)
+
+    def _send_file(self, path: str, offset: int, length: int) -> None:
+        bandwidth = self.server.bandwidth
+        began = time.monotonic()
+        sent = 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while sent < length:
+                chunk = f.read(min(SEND_CHUNK, length - sent))
+                if not chunk:
+                    break
+                try:
+                    self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                sent += len(chunk)
+                if bandwidth:
+                    ahead = sent / bandwidth - (time.monotonic() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+
+class ArchiveServer(ThreadingHTTPServer):
+    """Loopback HTTP server for the synthetic archives.
+
+    Files are served as ``/ranges/<name>`` (with Range support) and
+    ``/plain/<name>`` (without). ``bandwidth`` caps each connection in
+    bytes per second; 0 means unlimited.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, files: Dict[str, str], bandwidth: int = 0):
+        super().__init__(("127.0.0.1", 0), _ArchiveHandler)
+        self.bandwidth = bandwidth
+        self.entries: Dict[str, Tuple[str, int, str]] = {}
+        for name, path in files.items():
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            self.entries[name] = (path, os.path.getsize(path), f'"{digest.hexdigest()}"')
+        self._thread: Optional[threading.Thread] = None
+
+    def handle_error(self, request, client_address) -> None:
+        # The ranged downloader drops its probe connection on purpose.
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def url(self, name: str, ranges: bool = True) -> str:
+        prefix = "ranges" if ranges else "plain"
+        return f"http://127.0.0.1:{self.server_address[1]}/{prefix}/{name}"
+
+    def __enter__(self) -> "ArchiveServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+# --- Measurements --------------------------------------------------------------
+
+
+def _timed(func: Callable[[], object], verbose: bool) -> float:
+    sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink:
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+    ok = result[0] if isinstance(result, tuple) and result else result
+    if ok is False:
+        raise RuntimeError("benchmarked call reported failure")
+    return elapsed
+
+
+def _summary(runs: List[float]) -> Dict:
+    return {
+        "median": statistics.median(runs),
+        "min": min(runs),
+        "max": max(runs),
+        "runs": runs,
+    }
+
+
+def run_benchmarks(
+    scale: str = "small",
+    repeat: int = 3,
+    workers: int = 4,
+    extract_workers: Optional[int] = None,
+    bandwidth: int = 0,
+    workdir: Optional[str] = None,
+    seed: int = 0,
+    verbose: bool = False,
+) -> Dict:
+    """Run every stage cold and warm and return the results document.
+
+    Args:
+        scale: Name of a :data:`SCALES` entry.
+        repeat: Cold/warm pairs per stage; the median is used for comparison.
+        workers: Parallel Range segments for downloads.
+        extract_workers: Zip extraction processes; defaults to the CPU count.
+        bandwidth: Per-connection cap of the HTTP stand-in in bytes/s.
+        workdir: Scratch directory; a temporary one is used and removed when
+            omitted.
+        seed: Seed of the synthetic dataset.
+        verbose: Keep the installer's own output instead of silencing it.
+
+    Returns:
+        Dict: JSON-serializable results with environment and dataset details.
+    """
+
+    extract_workers = extract_workers or os.cpu_count() or 1
+    own_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="odoo_agent_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    scratch = os.path.join(workdir, "runs")
+    results: Dict[str, Dict] = {}
+
+    def fresh(label: str) -> str:
+        return tempfile.mkdtemp(prefix=label.replace(".", "_") + "_", dir=scratch)
+
+    def measure(name: str, prepare: Callable[[], object], run: Callable) -> None:
+        cold, warm = [], []
+        for _ in range(repeat):
+            state = prepare()
+            cold.append(_timed(lambda: run(state), verbose))
+            warm.append(_timed(lambda: run(state), verbose))
+        results[f"{name}.cold"] = _summary(cold)
+        results[f"{name}.warm"] = _summary(warm)
+        print(
+            f"  {name:<28} cold {results[name + '.cold']['median']:8.3f}s   "
+            f"warm {results[name + '.warm']['median']:8.3f}s"
+        )
+
+    try:
+        print(f"Generating '{scale}' synthetic Odoo tree...")
+        files = synthetic_files(SCALES[scale], seed=seed)
+        archives = build_archives(files, os.path.join(workdir, "archives"))
+        served = {os.path.basename(path): path for path in archives.values()}
+        dataset = {
+            "scale": scale,
+            "seed": seed,
+            "files": len(files),
+            "bytes": sum(len(data) for data in files.values()),
+            "archives": {kind: os.path.getsize(path) for kind, path in archives.items()},
+        }
+        del files
+
+        with ArchiveServer(served, bandwidth=bandwidth) as server:
+            for kind, archive in archives.items():
+                name = os.path.basename(archive)
+                for ranges in (True, False):
+                    url = server.url(name, ranges=ranges)
+                    label = f"download.{kind}.{'ranges' if ranges else 'plain'}"
+                    os.makedirs(scratch, exist_ok=True)
+
+                    def fetch(cache_dir: str, url: str = url) -> Tuple:
+                        session = make_session(workers)
+
+                        def downloader(response, path):
+                            return download_response(
+                                response, path, workers=workers, session=session
+                            )
+
+                        return ArchiveCache(cache_dir).fetch(
+                            url, session=session, downloader=downloader
+                        )
+
+                    measure(label, lambda label=label: fresh(label), fetch)
+
+                measure(
+                    f"extract.{kind}",
+                    lambda kind=kind: fresh(f"extract.{kind}"),
+                    lambda base, archive=archive: extract_archive(
+                        archive,
+                        tempfile.mkdtemp(dir=base),
+                        workers=extract_workers,
+                    ),
+                )
+
+                def pipeline(base: str, url: str = server.url(name)) -> Tuple[bool, str]:
+                    return download_odoo(
+                        VERSION,
+                        tempfile.mkdtemp(dir=base),
+                        download_url=url,
+                        cache_dir=os.path.join(base, "cache"),
+                        workers=workers,
+                        extract_workers=extract_workers,
+                    )
+
+                measure(
+                    f"pipeline.{kind}",
+                    lambda kind=kind: fresh(f"pipeline.{kind}"),
+                    pipeline,
+                )
+
+        source = os.path.join(fresh("source"), "extracted")
+        with contextlib.redirect_stdout(io.StringIO()):
+            extract_archive(archives["zip"], source, workers=extract_workers)
+        source = os.path.join(source, TOP_DIR)
+        measure(
+            "setup",
+            lambda: fresh("setup"),
+            lambda base: setup_odoo(
+                source,
+                config_dir=base,
+                use_wheelhouse=False,
+                server_options=size_instance(),
+            ),
+        )
+    finally:
+        if own_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parameters": {
+            "repeat": repeat,
+            "workers": workers,
+            "extract_workers": extract_workers,
+            "bandwidth": bandwidth,
+        },
+        "dataset": dataset,
+        "results": results,
+    }
+
+
+def compare_results(
+    current: Dict,
+    baseline: Dict,
+    threshold: float = DEFAULT_THRESHOLD,
+    min_delta: float = DEFAULT_MIN_DELTA,
+) -> List[Tuple[str, float, float]]:
+    """Return ``(stage, baseline_median, current_median)`` for regressions.
+
+    A stage regresses when its median grows by more than ``threshold``
+    (relative) and by more than ``min_delta`` seconds. Stages missing from
+    either document are ignored.
+    """
+
+    for section in ("dataset", "parameters"):
+        if baseline.get(section) != current.get(section):
+            print(f"Warning: baseline was recorded with different {section}.")
+
+    regressions = []
+    for name, result in sorted(current.get("results", {}).items()):
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        old, new = base["median"], result["median"]
+        if new > old * (1 + threshold) and new - old > min_delta:
+            regressions.append((name, old, new))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Odoo install pipeline.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4, help="Range download workers.")
+    parser.add_argument("--extract-workers", type=int, default=None)
+    parser.add_argument(
+        "--bandwidth",
+        type=int,
+        default=0,
+        help="Per-connection cap of the local server in bytes/s (0 = unlimited).",
+    )
+    parser.add_argument("--workdir", help="Keep generated archives in this directory.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results to this file.")
+    parser.add_argument("--baseline", help="Compare against this results file.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        scale=args.scale,
+        repeat=args.repeat,
+        workers=args.workers,
+        extract_workers=args.extract_workers,
+        bandwidth=args.bandwidth,
+        workdir=args.workdir,
+        seed=args.seed,
+        verbose=args.verbose,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Benchmark results written to {args.output}.")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare_results(
+        report, baseline, threshold=args.threshold, min_delta=args.min_delta
+    )
+    for name, old, new in regressions:
+        print(f"REGRESSION {name}: {old:.3f}s -> {new:.3f}s ({new / old - 1:+.0%})")
+    if not regressions:
+        print(f"No regressions above {args.threshold:.0%} against {args.baseline}.")
+    return 1 if regressions else 0
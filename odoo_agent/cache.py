@@ -0,0 +1,315 @@
+"""Content-addressed cache for downloaded Odoo archives.
+
+Archives are stored once under ``<cache_dir>/blobs/<sha256>`` and indexed
+by source URL. Each index entry remembers the validators (``ETag`` and
+``Last-Modified``) returned by the server so that later runs can issue a
+conditional request and reuse the cached blob on ``304 Not Modified``.
+The cache is shared by every ``target_dir`` and trimmed with an LRU policy
+once it grows past ``max_bytes``.
+
+Several agents (threads or processes) may share one cache directory: index
+updates and downloads of the same URL are serialized with file locks, and
+every download writes to its own temporary file.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import requests
+
+from .events import LogFn
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+CHUNK_SIZE = 1024 * 1024
+# ``(connect, read)`` seconds for archive requests; the read timeout bounds
+# the wait for each chunk, so a stalled server fails instead of hanging.
+HTTP_TIMEOUT = (10.0, 60.0)
+
+
+def default_cache_dir() -> str:
+    """Return the shared cache directory used when none is configured."""
+
+    configured = os.environ.get("ODOO_AGENT_CACHE_DIR")
+    if configured:
+        return configured
+    return os.path.join(os.path.expanduser("~"), ".cache", "odoo_agent")
+
+
+def url_key(url: str) -> str:
+    """Return the index key for ``url``."""
+
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def stream_to_file(response: requests.Response, path: str) -> str:
+    """Write a streamed response body to ``path`` and return its SHA-256."""
+
+    digest = hashlib.sha256()
+    with open(path, "wb") as f:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            f.write(chunk)
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _conditional_headers(entry: Dict) -> Dict[str, str]:
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+@contextlib.contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on ``path`` across threads and processes."""
+
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:  # pragma: no cover - Windows
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:  # pragma: no cover - Windows
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """Materialize ``src`` at ``dst`` with a hardlink, copying as a fallback."""
+
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ArchiveCache:
+    """Shared, size-capped archive cache keyed by URL and content digest."""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        log: LogFn = print,
+    ):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.log = log
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(self.cache_dir, "blobs")
+        self.tmp_dir = os.path.join(self.cache_dir, "tmp")
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    # --- Index handling -------------------------------------------------------
+
+    def _index_lock(self):
+        # Guards read-modify-write cycles; readers rely on atomic replaces.
+        return file_lock(os.path.join(self.cache_dir, "index.lock"))
+
+    def _load_index(self) -> Dict:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"entries": {}}
+
+    def _save_index(self, index: Dict) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.index_path)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest)
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Return the index entry for ``url`` if its blob is still present."""
+
+        entry = self._load_index()["entries"].get(url_key(url))
+        if entry and os.path.exists(self.blob_path(entry["digest"])):
+            return entry
+        return None
+
+    def touch(self, url: str) -> None:
+        """Mark ``url`` as recently used for LRU purposes."""
+
+        with self._index_lock():
+            index = self._load_index()
+            entry = index["entries"].get(url_key(url))
+            if entry:
+                entry["last_used"] = time.time()
+                self._save_index(index)
+
+    def store(self, url: str, path: str, digest: str, headers: Dict) -> str:
+        """Move a downloaded file into the cache and index it under ``url``."""
+
+        blob = self.blob_path(digest)
+        if os.path.exists(blob):
+            os.remove(path)
+        else:
+            os.replace(path, blob)
+
+        with self._index_lock():
+            index = self._load_index()
+            index["entries"][url_key(url)] = {
+                "url": url,
+                "digest": digest,
+                "size": os.path.getsize(blob),
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "last_used": time.time(),
+            }
+            self._evict(index, keep=digest)
+            self._save_index(index)
+        return blob
+
+    def _evict(self, index: Dict, keep: str) -> None:
+        """Drop least recently used blobs until the cache fits ``max_bytes``."""
+
+        entries = index["entries"]
+        sizes: Dict[str, int] = {}
+        last_used: Dict[str, float] = {}
+        for entry in entries.values():
+            sizes[entry["digest"]] = entry.get("size", 0)
+            last_used[entry["digest"]] = max(
+                last_used.get(entry["digest"], 0.0), entry.get("last_used", 0.0)
+            )
+
+        total = sum(sizes.values())
+        for digest in sorted(last_used, key=last_used.get):
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            self.log(f"Evicting cached archive {digest[:12]} ({sizes[digest]} bytes).")
+            try:
+                os.remove(self.blob_path(digest))
+            except OSError:
+                pass
+            total -= sizes[digest]
+            for key in [k for k, e in entries.items() if e["digest"] == digest]:
+                del entries[key]
+
+    # --- Fetching -------------------------------------------------------------
+
+    def revalidate(
+        self, url: str, session: Optional[requests.Session] = None
+    ) -> Optional[Tuple[str, str]]:
+        """Return ``(blob_path, sha256_digest)`` if the copy of ``url`` is current.
+
+        Sends the conditional request of :meth:`fetch` but never downloads:
+        any answer other than ``304`` (or a missing entry) returns None.
+        """
+
+        entry = self.lookup(url)
+        headers = _conditional_headers(entry) if entry else {}
+        if not headers:
+            return None
+        with (session or requests).get(
+            url, stream=True, headers=headers, timeout=HTTP_TIMEOUT
+        ) as response:
+            if response.status_code != 304:
+                return None
+        self.log(f"Cached archive for {url} is up to date.")
+        self.touch(url)
+        return self.blob_path(entry["digest"]), entry["digest"]
+
+    def fetch(
+        self,
+        url: str,
+        session: Optional[requests.Session] = None,
+        downloader: Optional[Callable[[requests.Response, str], str]] = None,
+    ) -> Tuple[str, str, bool]:
+        """Return a cached copy of ``url``, revalidating with the server.
+
+        Args:
+            url: Archive URL.
+            session: Optional session to issue the request with.
+            downloader: Callable that writes a ``200`` response to a path and
+                returns the SHA-256 digest. Defaults to :func:`stream_to_file`.
+
+        Returns:
+            Tuple[str, str, bool]: (blob_path, sha256_digest, cache_hit).
+        """
+
+        http = session or requests
+        downloader = downloader or stream_to_file
+        key = url_key(url)
+        # One download per URL at a time; a concurrent fetcher waits and
+        # then revalidates against the copy the first one stored.
+        with file_lock(os.path.join(self.tmp_dir, key + ".lock")):
+            entry = self.lookup(url)
+            headers = _conditional_headers(entry) if entry else {}
+
+            response = http.get(
+                url, stream=True, headers=headers, timeout=HTTP_TIMEOUT
+            )
+            try:
+                if entry and response.status_code == 304:
+                    self.log(f"Cached archive for {url} is up to date.")
+                    self.touch(url)
+                    return self.blob_path(entry["digest"]), entry["digest"], True
+
+                response.raise_for_status()
+                tmp = os.path.join(
+                    self.tmp_dir, f"{key}.{os.getpid()}.{threading.get_ident()}.part"
+                )
+                self._claim_partial(key, tmp)
+                digest = downloader(response, tmp)
+                blob = self.store(url, tmp, digest, response.headers)
+                self.log(f"Cached archive for {url} as {digest[:12]}.")
+                return blob, digest, False
+            finally:
+                response.close()
+
+    def _claim_partial(self, key: str, tmp: str) -> None:
+        """Move an interrupted download of ``key`` to ``tmp`` so it can resume.
+
+        Called with the URL's lock held, so no other fetch is writing it.
+        """
+
+        claimed = False
+        for part in glob.glob(os.path.join(self.tmp_dir, glob.escape(key) + ".*part")):
+            manifest = part + ".manifest.json"
+            if part == tmp:
+                continue
+            if not claimed and os.path.exists(manifest):
+                os.replace(part, tmp)
+                os.replace(manifest, tmp + ".manifest.json")
+                claimed = True
+                continue
+            for leftover in (part, manifest):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
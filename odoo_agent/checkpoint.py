@@ -0,0 +1,98 @@
+"""Persistent step checkpoints for resumable installation runs.
+
+A :class:`Checkpoint` is a small JSON state file kept in the target
+directory (``.odoo_agent_state.json``). For every step that completed it
+records a fingerprint of the step's inputs and the value it returned.
+:class:`~odoo_agent.scheduler.StepGraph` consults it before running a
+step: when the fingerprint is unchanged (and the recorded output still
+exists on disk) the step is skipped and its recorded value is handed to
+the steps that depend on it.
+
+Only SHA-256 fingerprints of the inputs are stored, so configuration
+secrets such as database passwords never reach the state file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+STATE_NAME = ".odoo_agent_state.json"
+STATE_VERSION = 1
+
+
+def fingerprint(inputs: Any) -> str:
+    """Return a stable SHA-256 of JSON-serializable ``inputs``."""
+
+    payload = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Checkpoint:
+    """Step results of previous runs, keyed by step name and fingerprint."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.steps: Dict[str, Dict] = self._load()
+
+    @classmethod
+    def for_target(cls, target_dir: str) -> "Checkpoint":
+        """Return the checkpoint of installs into ``target_dir``."""
+
+        return cls(os.path.join(target_dir, STATE_NAME))
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if state.get("version") != STATE_VERSION:
+            return {}
+        return state.get("steps", {})
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": STATE_VERSION, "steps": self.steps}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def get(self, step: str, digest: str) -> Tuple[bool, Any]:
+        """Return ``(True, output)`` if ``step`` completed with ``digest``."""
+
+        with self._lock:
+            entry = self.steps.get(step)
+        if entry is None or entry.get("fingerprint") != digest:
+            return False, None
+        return True, entry.get("output")
+
+    def record(self, step: str, digest: str, output: Any) -> None:
+        """Remember that ``step`` completed with ``digest`` and ``output``."""
+
+        with self._lock:
+            self.steps[step] = {
+                "fingerprint": digest,
+                # Round-trip through JSON so callers see what a reload sees.
+                "output": json.loads(json.dumps(output, default=str)),
+                "finished_at": time.time(),
+            }
+            self._save()
+
+    def discard(self, step: str) -> None:
+        """Forget ``step`` so the next run executes it again."""
+
+        with self._lock:
+            if self.steps.pop(step, None) is not None:
+                self._save()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.steps = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,46 @@
+"""Subprocess helpers shared by the setup stages."""
+
+import subprocess
+from typing import Dict, Optional, Sequence
+
+from . import metrics
+from .events import LogFn
+
+
+def run_command(
+    args: Sequence[str],
+    cwd: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    log: LogFn = print,
+) -> bool:
+    """Run a subprocess and report success.
+
+    This is a thin wrapper so that all system calls are logged and
+    failures are visible in the agent logs. With the default ``log`` the
+    child writes to the inherited terminal; any other ``log`` receives the
+    child's combined output line by line, so a run's pip output lands in
+    that run's log.
+    """
+
+    log(f"Running command: {' '.join(args)}")
+    with metrics.span("subprocess", command=" ".join(args[:4])) as span:
+        if log is print:
+            returncode = subprocess.run(list(args), cwd=cwd, env=env).returncode
+        else:
+            with subprocess.Popen(
+                list(args),
+                cwd=cwd,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                errors="replace",
+            ) as process:
+                for line in process.stdout:
+                    log(line.rstrip("\n"))
+                returncode = process.wait()
+        span.set(exit_code=str(returncode))
+    if returncode != 0:
+        log(f"Command failed with exit code {returncode}.")
+        return False
+    return True
@@ -0,0 +1,334 @@
+"""Odoo databases cloned from cached, fully initialized templates.
+
+Initializing a database with ``-i base`` and the requested modules takes
+minutes. Instead, a template database is built once per Odoo version,
+source release and module set (``odoo_tpl_<version>_<hash>``) under a
+scratch name, renamed
+when initialization succeeds and closed to connections, as PostgreSQL
+requires of a template while it is copied. Its filestore is kept under
+``<cache_dir>/db_templates/<template>``.
+
+A new database is then a ``CREATE DATABASE ... TEMPLATE`` (a file-level
+copy inside PostgreSQL) plus a clone of the cached filestore with
+:func:`~odoo_agent.store.clone_tree`. Odoo never rewrites filestore files
+in place, so hardlinked clones are safe. The clone gets a fresh
+``database.uuid`` and ``database.secret`` so instances do not share them.
+
+psycopg2 is an optional dependency needed only by this module.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import os
+import re
+import shutil
+import threading
+import uuid
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import psycopg2
+    from psycopg2 import sql
+except ImportError:  # pragma: no cover - optional dependency
+    psycopg2 = None
+
+from . import metrics
+from .cache import default_cache_dir
+from .commands import run_command
+from .events import LogFn
+from .store import clone_tree
+from .upgrade import release_fingerprint
+
+DEFAULT_DB_SETTINGS = {
+    "db_host": "localhost",
+    "db_port": "5432",
+    "db_user": "odoo",
+    "db_password": "odoo",
+}
+DEFAULT_MODULES = ("base",)
+DB_ERRORS = (psycopg2.Error,) if psycopg2 is not None else ()
+
+_template_locks: Dict[str, threading.Lock] = {}
+_template_locks_guard = threading.Lock()
+
+
+def _require_psycopg2() -> None:
+    if psycopg2 is None:
+        raise RuntimeError(
+            "Template databases need psycopg2: pip install psycopg2-binary"
+        )
+
+
+def default_data_dir() -> str:
+    """Return Odoo's default ``data_dir`` (where it keeps filestores)."""
+
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+        return os.path.join(base, "OpenERP S.A", "Odoo")
+    return os.path.join(os.path.expanduser("~"), ".local", "share", "Odoo")
+
+
+def template_name(
+    version: Optional[str],
+    modules: Iterable[str],
+    source: Optional[str] = None,
+) -> str:
+    """Return the template database name for a version and module set.
+
+    ``source`` identifies the source release (an archive digest); a tree
+    updated in place then gets a fresh template instead of one built from
+    its previous files.
+    """
+
+    names = sorted(set(modules) | set(DEFAULT_MODULES))
+    key = ",".join(names) if source is None else f"{source}:{','.join(names)}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+    series = re.sub(r"[^0-9a-z]+", "_", (version or "unknown").lower())
+    return f"odoo_tpl_{series}_{digest}"
+
+
+def _settings(db_settings: Optional[Dict]) -> Dict[str, str]:
+    settings = dict(DEFAULT_DB_SETTINGS)
+    settings.update({k: str(v) for k, v in (db_settings or {}).items()})
+    return settings
+
+
+def _connect(settings: Dict[str, str], dbname: str = "postgres"):
+    _require_psycopg2()
+    conn = psycopg2.connect(
+        host=settings["db_host"],
+        port=settings["db_port"],
+        user=settings["db_user"],
+        password=settings["db_password"],
+        dbname=dbname,
+    )
+    # CREATE/ALTER DATABASE cannot run inside a transaction.
+    conn.autocommit = True
+    return conn
+
+
+def database_exists(conn, name: str) -> bool:
+    with conn.cursor() as cr:
+        cr.execute("SELECT 1 FROM pg_database WHERE datname = %s", (name,))
+        return cr.fetchone() is not None
+
+
+def _drop(conn, name: str) -> None:
+    with conn.cursor() as cr:
+        cr.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+
+
+def _template_dir(cache_dir: Optional[str], template: str) -> str:
+    return os.path.abspath(
+        os.path.join(cache_dir or default_cache_dir(), "db_templates", template)
+    )
+
+
+def ensure_template(
+    odoo_path: str,
+    python: str,
+    version: Optional[str] = None,
+    modules: Iterable[str] = DEFAULT_MODULES,
+    db_settings: Optional[Dict] = None,
+    cache_dir: Optional[str] = None,
+    demo: bool = False,
+    source: Optional[str] = None,
+    log: LogFn = print,
+) -> Optional[str]:
+    """Return the template database for ``modules``, building it if needed.
+
+    Args:
+        odoo_path: Odoo source root holding ``odoo-bin``.
+        python: Interpreter that runs ``odoo-bin``.
+        version: Odoo series, part of the template name.
+        modules: Modules installed in the template (``base`` is implied).
+        db_settings: ``db_host``/``db_port``/``db_user``/``db_password``.
+        cache_dir: Cache directory holding the template filestores.
+        demo: Load demo data into the template.
+        source: Source release identifier (the extracted archive's
+            digest), part of the template name. The release recorded by an
+            in-place update of ``odoo_path`` takes precedence.
+
+    Returns:
+        Optional[str]: Template database name, or None if building failed.
+    """
+
+    # odoo-bin runs with ``odoo_path`` as its working directory.
+    odoo_path = os.path.abspath(odoo_path)
+    modules = sorted(set(modules) | set(DEFAULT_MODULES))
+    settings = _settings(db_settings)
+    source = release_fingerprint(odoo_path) or source
+    template = template_name(version, modules, source)
+    template_dir = _template_dir(cache_dir, template)
+
+    with _template_locks_guard:
+        lock = _template_locks.setdefault(template, threading.Lock())
+    with lock:
+        conn = _connect(settings)
+        try:
+            if database_exists(conn, template) and os.path.isdir(template_dir):
+                log(f"Using cached template database {template}.")
+                return template
+
+            log(f"Building template database {template} ({', '.join(modules)})...")
+            scratch = f"{template}_build"
+            data_dir = f"{template_dir}.data-{os.getpid()}"
+            _drop(conn, scratch)
+            shutil.rmtree(data_dir, ignore_errors=True)
+            args = [
+                python,
+                os.path.join(odoo_path, "odoo-bin"),
+                "--db_host", settings["db_host"],
+                "--db_port", settings["db_port"],
+                "--db_user", settings["db_user"],
+                "--data-dir", data_dir,
+                "-d", scratch,
+                "-i", ",".join(modules),
+                "--stop-after-init",
+                "--no-http",
+            ]
+            if not demo:
+                args.append("--without-demo=all")
+            # The password goes through libpq's environment, not the log.
+            env = dict(os.environ, PGPASSWORD=settings["db_password"])
+            with metrics.span("db.template", template=template):
+                ok = run_command(args, cwd=odoo_path, env=env, log=log)
+            if not ok:
+                _drop(conn, scratch)
+                shutil.rmtree(data_dir, ignore_errors=True)
+                return None
+
+            _drop(conn, template)
+            with conn.cursor() as cr:
+                cr.execute(
+                    sql.SQL("ALTER DATABASE {} RENAME TO {}").format(
+                        sql.Identifier(scratch), sql.Identifier(template)
+                    )
+                )
+                # No sessions may attach to a template while it is copied.
+                cr.execute(
+                    sql.SQL("ALTER DATABASE {} WITH ALLOW_CONNECTIONS false").format(
+                        sql.Identifier(template)
+                    )
+                )
+            shutil.rmtree(template_dir, ignore_errors=True)
+            filestore = os.path.join(data_dir, "filestore", scratch)
+            if os.path.isdir(filestore):
+                os.rename(filestore, template_dir)
+            else:
+                os.makedirs(template_dir)
+            shutil.rmtree(data_dir, ignore_errors=True)
+            return template
+        finally:
+            conn.close()
+
+
+def clone_database(
+    name: str,
+    template: str,
+    data_dir: Optional[str] = None,
+    db_settings: Optional[Dict] = None,
+    cache_dir: Optional[str] = None,
+    log: LogFn = print,
+) -> None:
+    """Create database ``name`` from ``template`` and copy its filestore."""
+
+    settings = _settings(db_settings)
+    conn = _connect(settings)
+    try:
+        with metrics.span("db.clone", template=template):
+            with conn.cursor() as cr:
+                cr.execute(
+                    sql.SQL("CREATE DATABASE {} TEMPLATE {}").format(
+                        sql.Identifier(name), sql.Identifier(template)
+                    )
+                )
+            data_dir = os.path.abspath(data_dir or default_data_dir())
+            filestore = os.path.join(data_dir, "filestore", name)
+            shutil.rmtree(filestore, ignore_errors=True)
+            method = clone_tree(_template_dir(cache_dir, template), filestore)
+    finally:
+        conn.close()
+
+    # Identity parameters must differ between databases (Odoo's own
+    # "duplicate database" resets them the same way).
+    conn = _connect(settings, dbname=name)
+    try:
+        with conn.cursor() as cr:
+            now = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+            for key, value in (
+                ("database.uuid", str(uuid.uuid1())),
+                ("database.secret", str(uuid.uuid4())),
+                ("database.create_date", now),
+            ):
+                cr.execute(
+                    "UPDATE ir_config_parameter SET value = %s WHERE key = %s",
+                    (value, key),
+                )
+    finally:
+        conn.close()
+    log(f"Created database {name} from {template} (filestore via {method}).")
+
+
+def provision_database(
+    odoo_path: str,
+    name: str,
+    python: str,
+    version: Optional[str] = None,
+    modules: Iterable[str] = DEFAULT_MODULES,
+    data_dir: Optional[str] = None,
+    db_settings: Optional[Dict] = None,
+    cache_dir: Optional[str] = None,
+    demo: bool = False,
+    source: Optional[str] = None,
+    log: LogFn = print,
+) -> Tuple[bool, str]:
+    """Create an initialized database ``name`` from the cached template.
+
+    An existing database of that name is kept as is. ``source`` is passed
+    to :func:`ensure_template`.
+
+    Returns:
+        Tuple[bool, str]: (success_flag, message).
+    """
+
+    try:
+        settings = _settings(db_settings)
+        conn = _connect(settings)
+        try:
+            exists = database_exists(conn, name)
+        finally:
+            conn.close()
+        if exists:
+            return True, f"Database {name} already exists; leaving it unchanged."
+
+        template = ensure_template(
+            odoo_path,
+            python,
+            version=version,
+            modules=modules,
+            db_settings=settings,
+            cache_dir=cache_dir,
+            demo=demo,
+            source=source,
+            log=log,
+        )
+        if template is None:
+            return False, f"Could not build the template database for {name}."
+        clone_database(
+            name,
+            template,
+            data_dir=data_dir,
+            db_settings=settings,
+            cache_dir=cache_dir,
+            log=log,
+        )
+        return True, f"Database {name} created from template {template}."
+    except RuntimeError as exc:
+        return False, str(exc)
+    except DB_ERRORS as exc:
+        return False, f"PostgreSQL error while provisioning {name}: {exc}"
+    except Exception as exc:  # pragma: no cover - generic safety net
+        return False, f"Unexpected error while provisioning {name}: {exc}"
@@ -1,7 +1,53 @@
-"""Odoo executable detection utilities."""
+"""Odoo executable detection utilities.
 
+Besides the fixed list of common locations, installs are discovered by
+scanning ``PATH`` and a set of root directories concurrently with
+:func:`os.scandir`. The version of every install is read from its
+``odoo/release.py``. Scan results are kept in an on-disk index together
+with the mtimes of every scanned directory, so repeated detection on an
+unchanged host is a cache hit that only re-stats those directories.
+"""
+
+import json
 import os
-from typing import Iterable, List, Optional, Tuple
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import metrics
+from .cache import default_cache_dir
+from .events import LogFn
+
+DEFAULT_SCAN_DEPTH = 3
+INDEX_VERSION = 1
+
+# Directory names that never contain an Odoo checkout worth reporting but can
+# be very large to walk.
+_SKIP_DIRS = {
+    ".git",
+    "__pycache__",
+    "node_modules",
+    "site-packages",
+    "dist-packages",
+    "proc",
+    "sys",
+}
+
+_VERSION_RE = re.compile(
+    r"^version_info\s*=\s*\(\s*([^,]+?)\s*,\s*(\d+)", re.MULTILINE
+)
+
+
+@dataclass
+class OdooInstall:
+    """A detected Odoo installation."""
+
+    executable: str
+    root: str
+    version: Optional[str] = None
 
 
 def _default_paths() -> List[str]:
@@ -17,28 +63,228 @@ def _default_paths() -> List[str]:
     ]
 
 
+def _default_roots() -> List[str]:
+    """Return directories scanned for side-by-side Odoo installs."""
+
+    return [
+        "/opt",
+        "/srv",
+        "/usr/local",
+        "/home/odoo",
+        os.path.expanduser("~"),
+        os.getcwd(),
+    ]
+
+
+def _is_executable(path: str) -> bool:
+    return os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def read_odoo_version(root: str) -> Optional[str]:
+    """Return the ``major.minor`` series of the Odoo tree at ``root``.
+
+    The version is parsed from ``version_info`` in ``odoo/release.py``
+    without importing it.
+    """
+
+    try:
+        with open(os.path.join(root, "odoo", "release.py"), "r", encoding="utf-8") as f:
+            match = _VERSION_RE.search(f.read())
+    except OSError:
+        return None
+    if match is None:
+        return None
+    major = match.group(1).strip("'\"")
+    return f"{major}.{match.group(2)}"
+
+
+def _install_at(executable: str) -> OdooInstall:
+    root = os.path.dirname(executable)
+    return OdooInstall(executable=executable, root=root, version=read_odoo_version(root))
+
+
+def _scan_root(root: str, max_depth: int) -> Tuple[List[str], Dict[str, float]]:
+    """Walk ``root`` up to ``max_depth`` levels looking for ``odoo-bin``.
+
+    Returns:
+        Tuple[List[str], Dict[str, float]]: (executables, mtimes of the
+        directories that were scanned).
+    """
+
+    executables: List[str] = []
+    mtimes: Dict[str, float] = {}
+    stack = [(root, 0)]
+    while stack:
+        directory, depth = stack.pop()
+        try:
+            mtimes[directory] = os.stat(directory).st_mtime
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+
+        candidate = os.path.join(directory, "odoo-bin")
+        if any(e.name == "odoo-bin" for e in entries) and _is_executable(candidate):
+            # Do not descend into an Odoo tree: its addons are huge.
+            executables.append(candidate)
+            continue
+
+        if depth >= max_depth:
+            continue
+        for entry in entries:
+            if entry.name.startswith(".") or entry.name in _SKIP_DIRS:
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, depth + 1))
+            except OSError:
+                continue
+    return executables, mtimes
+
+
+def _index_path() -> str:
+    return os.path.join(default_cache_dir(), "detection_index.json")
+
+
+def _load_index(path: str) -> Dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get("version") != INDEX_VERSION:
+        return {}
+    return index
+
+
+def _index_valid(entry: Dict) -> bool:
+    """Return True if no directory recorded in ``entry`` has changed."""
+
+    for directory, mtime in entry["mtimes"].items():
+        try:
+            if os.stat(directory).st_mtime != mtime:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def detect_odoo_installations(
+    roots: Optional[Iterable[str]] = None,
+    max_depth: int = DEFAULT_SCAN_DEPTH,
+    use_index: bool = True,
+    index_path: Optional[str] = None,
+) -> List[OdooInstall]:
+    """Find every Odoo install on ``PATH`` and under ``roots``.
+
+    Args:
+        roots: Directories to scan; defaults to common install roots.
+        max_depth: Directory levels scanned below each root.
+        use_index: If True, reuse the on-disk index for roots whose scanned
+            directories are unchanged, and update it afterwards.
+        index_path: Optional index location; defaults to
+            ``detection_index.json`` in the shared cache directory.
+
+    Returns:
+        List[OdooInstall]: Installs in root order, without duplicates.
+    """
+
+    roots = list(roots) if roots is not None else _default_roots()
+    path_dirs = [d for d in os.environ.get("PATH", "").split(os.pathsep) if d]
+    index_path = index_path or _index_path()
+    index = _load_index(index_path) if use_index else {}
+    cached = index.get("roots", {})
+
+    scans: Dict[str, Tuple[int, Dict]] = {}
+    for root in roots:
+        scans[root] = (max_depth, cached.get(f"{root}|{max_depth}"))
+    for directory in path_dirs:
+        scans.setdefault(directory, (0, cached.get(f"{directory}|0")))
+
+    stale = [
+        (root, depth)
+        for root, (depth, entry) in scans.items()
+        if entry is None or not _index_valid(entry)
+    ]
+    results: Dict[str, Dict] = {
+        f"{root}|{depth}": entry for root, (depth, entry) in scans.items()
+    }
+    if stale:
+        with ThreadPoolExecutor(max_workers=min(16, len(stale))) as pool:
+            scanned = pool.map(lambda item: _scan_root(*item), stale)
+            for (root, depth), (executables, mtimes) in zip(stale, scanned):
+                results[f"{root}|{depth}"] = {
+                    "mtimes": mtimes,
+                    "installs": [asdict(_install_at(e)) for e in executables],
+                }
+
+    metrics.event("detect.index", roots=len(scans), rescanned=len(stale))
+    if use_index and stale:
+        cached.update(results)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        tmp = f"{index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "roots": cached}, f)
+        os.replace(tmp, index_path)
+
+    installs: List[OdooInstall] = []
+    seen = set()
+    for root, (depth, _) in scans.items():
+        for item in results[f"{root}|{depth}"]["installs"]:
+            real = os.path.realpath(item["executable"])
+            if real not in seen:
+                seen.add(real)
+                installs.append(OdooInstall(**item))
+    return installs
+
+
+@metrics.traced("detect")
 def detect_odoo_executable(
     extra_paths: Optional[Iterable[str]] = None,
+    version: Optional[str] = None,
+    roots: Optional[Iterable[str]] = None,
+    log: LogFn = print,
 ) -> Tuple[bool, str]:
     """Detect if an Odoo executable is present on the system.
 
     Args:
         extra_paths: Optional iterable of additional paths to check.
+        version: Optional Odoo series (for example "16.0"). When given, an
+            install reporting that version is preferred; installs whose
+            version cannot be read (such as distribution packages) are
+            accepted only if no install matches.
+        roots: Optional directories to scan in addition to ``PATH``; see
+            :func:`detect_odoo_installations`.
 
     Returns:
         Tuple[bool, str]: (found_flag, path_to_executable or "").
     """
 
-    print("Detecting Odoo executable...")
+    log("Detecting Odoo executable...")
+    start = time.perf_counter()
 
     paths = _default_paths()
     if extra_paths is not None:
         paths.extend(list(extra_paths))
 
-    for path in paths:
-        if os.path.exists(path) and os.path.isfile(path) and os.access(path, os.X_OK):
-            print(f"Odoo executable found at: {path}")
-            return True, path
+    candidates = [_install_at(p) for p in paths if _is_executable(p)]
+    candidates.extend(detect_odoo_installations(roots=roots))
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    matches = [i for i in candidates if version is None or i.version == version]
+    if not matches:
+        matches = [i for i in candidates if i.version is None]
+    if matches:
+        install = matches[0]
+        log(
+            f"Odoo executable found at: {install.executable} "
+            f"(version {install.version or 'unknown'}, {elapsed_ms:.2f} ms)"
+        )
+        return True, install.executable
+
+    if version is not None and candidates:
+        found = ", ".join(sorted({i.version or "unknown" for i in candidates}))
+        log(f"No Odoo {version} executable found (found versions: {found}).")
+        return False, ""
 
-    print("No Odoo executable found in common paths.")
+    log("No Odoo executable found in common paths.")
     return False, ""
@@ -1,97 +1,525 @@
 """Odoo download and extraction utilities."""
 
 import os
-from typing import Optional, Tuple
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, TypeVar, Union
 
 import requests
 import zipfile
 import tarfile
 
+from . import metrics
+from .cache import HTTP_TIMEOUT, ArchiveCache, link_or_copy
+from .events import LogFn
+from .extract import archive_kind, extract_archive, read_source_file, stream_extract
+from .mirrors import equivalent_mirrors, rank_mirrors
+from .precompile import precompile_tree
+from .ranged import DEFAULT_WORKERS, download_response, make_session
+from .store import SourceStore, store_key
+from .upgrade import record_install
+
+T = TypeVar("T")
+VALIDATE_TIMEOUT = 10.0
+
+
+def _find_source_path(extract_path: str, log: LogFn = print) -> str:
+    """Return the Odoo source directory inside ``extract_path``.
+
+    GitHub archives usually add a single top-level directory; if there is
+    none the extraction directory itself is assumed to be the source root.
+    """
+
+    extracted_dirs = [
+        d
+        for d in os.listdir(extract_path)
+        if os.path.isdir(os.path.join(extract_path, d))
+    ]
+    if extracted_dirs:
+        odoo_source_path = os.path.join(extract_path, extracted_dirs[0])
+        log(f"Identified Odoo source path: {odoo_source_path}")
+        return odoo_source_path
+
+    log(
+        f"Warning: No subdirectory found in {extract_path}. Assuming Odoo "
+        "source is directly in the extraction directory."
+    )
+    return extract_path
+
+
+def _extract_path(target_dir: str, version: str) -> str:
+    return os.path.join(target_dir, f"odoo_{version}_extracted")
+
+
+def _archive_filename(target_dir: str, version: str, url: str) -> str:
+    """Return the local archive path for ``url``, keeping its extension."""
+
+    if url.endswith(".tar.gz"):
+        return os.path.join(target_dir, f"odoo_{version}.tar.gz")
+    return os.path.join(target_dir, f"odoo_{version}.zip")
+
+
+def _fetch_archive(
+    url: str,
+    filename: str,
+    session: requests.Session,
+    workers: int,
+    use_cache: bool,
+    cache_dir: Optional[str],
+    mirrors: Sequence[str],
+    log: LogFn = print,
+) -> str:
+    """Download ``url`` to ``filename`` and return the archive's SHA-256."""
+
+    def downloader(response, path):
+        return download_response(
+            response,
+            path,
+            workers=workers,
+            session=session,
+            mirrors=mirrors,
+            log=log,
+        )
+
+    with metrics.span("download.fetch", workers=workers) as fetch:
+        if use_cache:
+            blob, digest, hit = ArchiveCache(cache_dir, log=log).fetch(
+                url, session=session, downloader=downloader
+            )
+            link_or_copy(blob, filename)
+            source = "cache" if hit else url
+            fetch.set(cache_hit=hit)
+            log(f"Copied {source} archive (sha256 {digest[:12]}) to {filename}")
+        else:
+            hit = False
+            with session.get(url, stream=True, timeout=HTTP_TIMEOUT) as response:
+                response.raise_for_status()
+                digest = downloader(response, filename)
+            log(f"Downloaded {url} to {filename}")
+        # ``bytes`` counts transferred bytes only; cache hits move none.
+        size = os.path.getsize(filename)
+        fetch.set(**({"cached_bytes": size} if hit else {"bytes": size}))
+    return digest
+
+
+def _sources(
+    version: str, download_url: Union[str, Sequence[str], None], log: LogFn = print
+) -> List[str]:
+    if download_url is None:
+        download_url = f"https://github.com/odoo/odoo/archive/refs/heads/{version}.zip"
+        log(f"No download URL provided. Using default: {download_url}")
+    return [download_url] if isinstance(download_url, str) else list(download_url)
+
+
+def _from_sources(
+    sources: List[str],
+    session: requests.Session,
+    attempt: Callable[[str, Sequence[str]], T],
+    log: LogFn = print,
+) -> Tuple[str, T]:
+    """Call ``attempt(url, mirrors)`` on ``sources`` until one succeeds.
+
+    Several sources are probed concurrently and tried fastest first; a
+    failing source hands over to the next one.
+    """
+
+    probes = []
+    if len(sources) > 1:
+        probes = rank_mirrors(sources, session=session, log=log)
+    if probes:
+        sources = [p.url for p in probes]
+
+    for index, source_url in enumerate(sources, 1):
+        mirrors = []
+        if probes:
+            mirrors = equivalent_mirrors(probes[index - 1], probes)
+        try:
+            return source_url, attempt(source_url, mirrors)
+        except requests.exceptions.RequestException as exc:
+            if index == len(sources):
+                raise
+            log(f"Source {source_url} failed ({exc}); trying {sources[index]}.")
+    raise ValueError("No download source given.")
+
+
+def _current_cached(
+    sources: Sequence[str],
+    cache_dir: Optional[str],
+    session: requests.Session,
+    log: LogFn = print,
+) -> Optional[Tuple[str, str, str]]:
+    """Return ``(url, blob_path, digest)`` of the first cached source still current.
+
+    Only sources with a cache entry are asked, with a conditional request
+    that downloads nothing; unreachable ones are skipped.
+    """
+
+    cache = ArchiveCache(cache_dir, log=log)
+    for source_url in sources:
+        if cache.lookup(source_url) is None:
+            continue
+        try:
+            found = cache.revalidate(source_url, session=session)
+        except requests.exceptions.RequestException:
+            continue
+        if found is not None:
+            return (source_url, *found)
+    return None
+
+
+def _revalidate_cached(
+    sources: List[str],
+    target_dir: str,
+    version: str,
+    cache_dir: Optional[str],
+    session: requests.Session,
+    log: LogFn = print,
+) -> Optional[Tuple[str, Tuple[str, str]]]:
+    """Reuse the first cached source that is still current, without probing.
+
+    The cache is keyed per URL, so only a cached source can answer ``304``;
+    probing every mirror first would cost a round of range requests on every
+    run (and for every fleet instance).
+    """
+
+    current = _current_cached(sources, cache_dir, session, log=log)
+    if current is None:
+        return None
+    source_url, blob, digest = current
+    filename = _archive_filename(target_dir, version, source_url)
+    with metrics.span("download.fetch", workers=1) as fetch:
+        link_or_copy(blob, filename)
+        fetch.set(cache_hit=True, cached_bytes=os.path.getsize(filename))
+    log(f"Copied cache archive (sha256 {digest[:12]}) to {filename}")
+    return source_url, (filename, digest)
+
+
+def archive_source_path(filename: str, target_dir: str, version: str) -> str:
+    """Return the directory the Odoo source root of ``filename`` extracts to.
+
+    Only the archive's member names are read, so the path is known (and
+    ``odoo.conf`` can point at it) before extraction has finished.
+    """
+
+    prefix, _ = read_source_file(filename, "odoo-bin")
+    return os.path.normpath(os.path.join(_extract_path(target_dir, version), prefix))
+
+
+def archive_validator(
+    version: str = "16.0",
+    download_url: Union[str, Sequence[str], None] = None,
+    use_cache: bool = True,
+    cache_dir: Optional[str] = None,
+    log: LogFn = print,
+) -> Optional[str]:
+    """Return a cheap identifier of the archive the sources serve right now.
+
+    A cached source that answers its conditional request with ``304``
+    yields ``sha256:<digest>``; otherwise the first source whose ``HEAD``
+    response carries an ``ETag`` or ``Last-Modified`` yields that
+    validator. Nothing is downloaded. Returns None when no source offers a
+    validator (or none is reachable), so the archive cannot be shown to be
+    unchanged without fetching it.
+    """
+
+    sources = _sources(version, download_url, log=log)
+    session = make_session(len(sources))
+    current = None
+    if use_cache:
+        current = _current_cached(sources, cache_dir, session, log=log)
+    if current is not None:
+        return f"sha256:{current[2]}"
+    for source_url in sources:
+        try:
+            response = session.head(
+                source_url, allow_redirects=True, timeout=VALIDATE_TIMEOUT
+            )
+        except requests.exceptions.RequestException:
+            continue
+        if not response.ok:
+            continue
+        for header in ("ETag", "Last-Modified"):
+            if response.headers.get(header):
+                return f"{source_url} {header}: {response.headers[header]}"
+    return None
+
+
+def fetch_odoo(
+    version: str = "16.0",
+    target_dir: str = ".",
+    download_url: Union[str, Sequence[str], None] = None,
+    use_cache: bool = True,
+    cache_dir: Optional[str] = None,
+    workers: int = DEFAULT_WORKERS,
+    log: LogFn = print,
+) -> Tuple[bool, str, str]:
+    """Download the Odoo archive into ``target_dir`` without extracting it.
+
+    See :func:`download_odoo` for the arguments.
+
+    Returns:
+        Tuple[bool, str, str]: (success_flag, archive path or "", archive
+        SHA-256 or "").
+    """
+
+    log(f"Downloading Odoo version {version} to {target_dir}...")
+    sources = _sources(version, download_url, log=log)
+    os.makedirs(target_dir, exist_ok=True)
+
+    def fetch(source_url, mirrors):
+        filename = _archive_filename(target_dir, version, source_url)
+        digest = _fetch_archive(
+            source_url,
+            filename,
+            session,
+            workers=workers,
+            use_cache=use_cache,
+            cache_dir=cache_dir,
+            mirrors=mirrors,
+            log=log,
+        )
+        return filename, digest
+
+    try:
+        with metrics.span("download", version=version, stream=False) as span:
+            session = make_session(max(workers, len(sources)))
+            cached = None
+            if use_cache and len(sources) > 1:
+                cached = _revalidate_cached(
+                    sources, target_dir, version, cache_dir, session, log=log
+                )
+            if cached is None:
+                cached = _from_sources(sources, session, fetch, log=log)
+            source_url, (filename, digest) = cached
+            span.set(url=source_url)
+        return True, filename, digest
+    except requests.exceptions.RequestException as exc:
+        log(f"Error during download: {exc}")
+        return False, "", ""
+    except Exception as exc:  # pragma: no cover - generic safety net
+        log(f"An unexpected error occurred: {exc}")
+        return False, "", ""
+
+
+def extract_odoo(
+    filename: str,
+    digest: str,
+    version: str = "16.0",
+    target_dir: str = ".",
+    extract_workers: Optional[int] = None,
+    modules: Optional[Iterable[str]] = None,
+    use_store: bool = False,
+    store_dir: Optional[str] = None,
+    precompile: bool = False,
+    log: LogFn = print,
+) -> Tuple[bool, str]:
+    """Extract an archive fetched by :func:`fetch_odoo`.
+
+    ``digest`` is the archive's SHA-256 and keys the source store entry.
+    See :func:`download_odoo` for the other arguments.
+
+    Returns:
+        Tuple[bool, str]: (success_flag, path_to_extracted_odoo_source or "").
+    """
+
+    extract_path = _extract_path(target_dir, version)
+
+    def extract(path):
+        os.makedirs(path, exist_ok=True)
+        return extract_archive(
+            filename,
+            path,
+            workers=extract_workers or os.cpu_count() or 1,
+            modules=modules,
+            log=log,
+        )
+
+    def populate_store(path):
+        if not extract(path):
+            return False
+        if precompile:
+            # Store entries are immutable, so hash checks are not needed.
+            source_path = _find_source_path(path, log=log)
+            precompile_tree(source_path, unchecked=True, log=log)
+        return True
+
+    try:
+        if use_store:
+            store = SourceStore(store_dir, log=log)
+            key = store_key(version, digest, modules)
+            if not store.add(key, populate_store):
+                return False, ""
+            store.checkout(key, extract_path)
+        elif not extract(extract_path):
+            return False, ""
+        source_path = archive_source_path(filename, target_dir, version)
+        log(f"Identified Odoo source path: {source_path}")
+        # Later in-place updates stay restricted to the same selection.
+        record_install(source_path, archive=digest, modules=modules)
+        return True, source_path
+    except (zipfile.BadZipFile, tarfile.ReadError) as exc:
+        log(f"Error extracting archive: {exc}")
+        return False, ""
+    except Exception as exc:  # pragma: no cover - generic safety net
+        log(f"An unexpected error occurred: {exc}")
+        return False, ""
+
 
 def download_odoo(
     version: str = "16.0",
     target_dir: str = ".",
-    download_url: Optional[str] = None,
+    download_url: Union[str, Sequence[str], None] = None,
+    use_cache: bool = True,
+    cache_dir: Optional[str] = None,
+    workers: int = DEFAULT_WORKERS,
+    stream: bool = False,
+    extract_workers: Optional[int] = None,
+    modules: Optional[Iterable[str]] = None,
+    use_store: bool = False,
+    store_dir: Optional[str] = None,
+    precompile: bool = False,
+    log: LogFn = print,
 ) -> Tuple[bool, str]:
     """Download and extract the specified Odoo version.
 
     Args:
         version: Odoo version to download (for example, "16.0").
         target_dir: Directory where archives and extracted files are stored.
-        download_url: Optional direct URL to the Odoo archive. If omitted, a
-            GitHub branch zip URL for the given version is used.
+        download_url: Optional direct URL to the Odoo archive, or an ordered
+            list of sources (for example an internal mirror, a nightly
+            tarball and GitHub). Several sources are probed concurrently and
+            tried fastest first; a failing source hands over to the next, and
+            ranged downloads move unfinished segments to mirrors serving the
+            same ``ETag``. With the cache, sources already cached are
+            revalidated first and probing only happens when none of them is
+            current. If omitted, a GitHub branch zip URL for the given
+            version is used.
+        use_cache: If True, fetch the archive through the shared
+            :class:`~odoo_agent.cache.ArchiveCache` so unchanged archives are
+            revalidated instead of downloaded again.
+        cache_dir: Optional cache directory. Defaults to
+            ``$ODOO_AGENT_CACHE_DIR`` or ``~/.cache/odoo_agent``.
+        workers: Number of parallel HTTP Range segments to fetch when the
+            server supports ranges. ``1`` forces a single streamed request.
+        stream: If True, extract the archive while it downloads and keep no
+            archive copy in ``target_dir``. ``.tar.gz`` archives are piped
+            through :mod:`tarfile` directly; ``.zip`` archives are spooled to
+            a temporary file first. Streaming bypasses the download cache.
+        extract_workers: Worker processes for zip extraction. Defaults to
+            the CPU count; ``1`` extracts sequentially.
+        modules: Optional list of addons to install. Only the core source
+            tree and the dependency closure of these modules (read from
+            their ``__manifest__.py`` files) are extracted.
+        use_store: If True, extract once into the shared
+            :class:`~odoo_agent.store.SourceStore` and check the tree out into
+            ``target_dir`` with reflinks or hardlinks. Files written per
+            instance (such as ``odoo.conf``) must then go to an overlay
+            directory rather than into the checkout.
+        store_dir: Optional store directory. Defaults to ``store`` inside the
+            download cache directory.
+        precompile: If True, store entries are compiled to ``unchecked-hash``
+            bytecode before they are published, so every checkout starts
+            without compiling.
+        log: Receives progress messages; defaults to ``print``.
 
     Returns:
         Tuple[bool, str]: (success_flag, path_to_extracted_odoo_source or "").
     """
 
-    print(f"Downloading Odoo version {version} to {target_dir}...")
+    if stream and use_store:
+        log("The source store needs the archive digest; streaming is disabled.")
+        stream = False
 
-    if download_url is None:
-        download_url = f"https://github.com/odoo/odoo/archive/refs/heads/{version}.zip"
-        print(f"No download URL provided. Using default: {download_url}")
+    if not stream:
+        success, filename, digest = fetch_odoo(
+            version,
+            target_dir,
+            download_url,
+            use_cache=use_cache,
+            cache_dir=cache_dir,
+            workers=workers,
+            log=log,
+        )
+        if not success:
+            return False, ""
+        return extract_odoo(
+            filename,
+            digest,
+            version,
+            target_dir,
+            extract_workers=extract_workers,
+            modules=modules,
+            use_store=use_store,
+            store_dir=store_dir,
+            precompile=precompile,
+            log=log,
+        )
 
+    log(f"Downloading Odoo version {version} to {target_dir}...")
+    sources = _sources(version, download_url, log=log)
     os.makedirs(target_dir, exist_ok=True)
+    extract_path = _extract_path(target_dir, version)
 
-    # Determine archive filename based on URL extension.
-    filename = os.path.join(target_dir, f"odoo_{version}.zip")
-    if download_url.endswith(".tar.gz"):
-        filename = os.path.join(target_dir, f"odoo_{version}.tar.gz")
-    elif download_url.endswith(".zip"):
-        filename = os.path.join(target_dir, f"odoo_{version}.zip")
-
-    try:
-        response = requests.get(download_url, stream=True)
-        response.raise_for_status()
-
-        with open(filename, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        print(f"Downloaded {download_url} to {filename}")
+    def stream_or_fetch(source_url, mirrors):
+        filename = _archive_filename(target_dir, version, source_url)
+        kind = archive_kind(filename)
+        if modules is not None and kind == "tar.gz":
+            log(
+                "Module selection needs the tar.gz manifests before "
+                "extraction; downloading the archive instead of streaming it."
+            )
+            digest = _fetch_archive(
+                source_url,
+                filename,
+                session,
+                workers=workers,
+                use_cache=use_cache,
+                cache_dir=cache_dir,
+                mirrors=mirrors,
+                log=log,
+            )
+            return filename, digest
 
-        extract_path = os.path.join(target_dir, f"odoo_{version}_extracted")
         os.makedirs(extract_path, exist_ok=True)
-
-        if filename.endswith(".zip"):
-            with zipfile.ZipFile(filename, "r") as zip_ref:
-                zip_ref.extractall(extract_path)
-            print(f"Extracted zip archive to {extract_path}")
-        elif filename.endswith(".tar.gz"):
-            with tarfile.open(filename, "r:gz") as tar_ref:
-                tar_ref.extractall(extract_path)
-            print(f"Extracted tar.gz archive to {extract_path}")
-        else:
-            print(
-                f"Unsupported archive format: {filename}. Only .zip and .tar.gz "
-                "are supported for automatic extraction."
+        with session.get(source_url, stream=True, timeout=HTTP_TIMEOUT) as response:
+            response.raise_for_status()
+            digest = stream_extract(
+                response,
+                kind,
+                extract_path,
+                spool_dir=target_dir,
+                modules=modules,
+                log=log,
             )
-            return False, ""
-
-        # Try to find the actual Odoo source directory inside the extracted
-        # folder (GitHub archives usually add a top-level directory).
-        extracted_dirs = [
-            d
-            for d in os.listdir(extract_path)
-            if os.path.isdir(os.path.join(extract_path, d))
-        ]
-        if extracted_dirs:
-            odoo_source_path = os.path.join(extract_path, extracted_dirs[0])
-            print(f"Identified Odoo source path: {odoo_source_path}")
-            return True, odoo_source_path
-
-        print(
-            f"Warning: No subdirectory found in {extract_path}. Assuming Odoo "
-            "source is directly in the extraction directory."
-        )
-        return True, extract_path
+        log(f"Downloaded and extracted {source_url} (sha256 {digest[:12]})")
+        return None, digest
 
+    try:
+        with metrics.span("download", version=version, stream=True) as span:
+            session = make_session(max(workers, len(sources)))
+            source_url, (filename, digest) = _from_sources(
+                sources, session, stream_or_fetch, log=log
+            )
+            span.set(url=source_url, source="stream" if filename is None else "archive")
     except requests.exceptions.RequestException as exc:
-        print(f"Error during download: {exc}")
+        log(f"Error during download: {exc}")
         return False, ""
     except (zipfile.BadZipFile, tarfile.ReadError) as exc:
-        print(f"Error extracting archive: {exc}")
+        log(f"Error extracting archive: {exc}")
         return False, ""
     except Exception as exc:  # pragma: no cover - generic safety net
-        print(f"An unexpected error occurred: {exc}")
+        log(f"An unexpected error occurred: {exc}")
         return False, ""
+
+    if filename is None:
+        source_path = _find_source_path(extract_path, log=log)
+        record_install(source_path, archive=digest, modules=modules)
+        return True, source_path
+    return extract_odoo(
+        filename,
+        digest,
+        version,
+        target_dir,
+        extract_workers=extract_workers,
+        modules=modules,
+        precompile=precompile,
+        log=log,
+    )
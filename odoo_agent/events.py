@@ -0,0 +1,128 @@
+"""Per-run event streams.
+
+A :class:`RunLog` collects the log lines and step events of one workflow
+run. The package reports progress through a ``log`` callable (``print``
+by default) that every stage accepts and hands on to the stages and
+worker threads it starts; passing :meth:`RunLog.log` sends a run's lines
+to its own log, so concurrent runs in the same process (for example two
+Streamlit sessions) never see each other's output. Nothing touches
+``sys.stdout``. :func:`submit` starts a run in a background thread with a
+fresh log, so callers can render output while it arrives.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+LogFn = Callable[[str], None]
+
+
+class RunLog:
+    """Thread-safe, append-only event buffer for one run.
+
+    Events are dicts with at least ``type`` and ``timestamp``. Log lines
+    have type ``"log"`` and a ``message``; the scheduler adds ``"step"``
+    events with ``name`` and ``status``.
+    """
+
+    def __init__(self):
+        self._events: List[Dict] = []
+        self._partial = ""
+        self._changed = threading.Condition()
+        self.done = False
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def emit(self, kind: str, **data) -> None:
+        event = {"type": kind, "timestamp": time.time()}
+        event.update(data)
+        with self._changed:
+            self._events.append(event)
+            self._changed.notify_all()
+
+    def log(self, message: str) -> None:
+        """Record a message; usable wherever a ``log`` callable is taken."""
+
+        for line in str(message).split("\n"):
+            self.emit("log", message=line)
+
+    def write(self, text: str) -> None:
+        """Accept raw text (such as subprocess output) and emit whole lines."""
+
+        with self._changed:
+            lines = (self._partial + text).split("\n")
+            self._partial = lines.pop()
+        for line in lines:
+            self.emit("log", message=line)
+
+    def finish(self, result: Any = None, error: Optional[BaseException] = None) -> None:
+        if self._partial:
+            partial, self._partial = self._partial, ""
+            self.emit("log", message=partial)
+        with self._changed:
+            self.result = result
+            self.error = error
+            self.done = True
+            self.finished_at = time.time()
+            self._changed.notify_all()
+
+    def events(self, since: int = 0) -> List[Dict]:
+        """Return the events recorded after the first ``since`` ones."""
+
+        with self._changed:
+            return self._events[since:]
+
+    def lines(self) -> List[str]:
+        return [e["message"] for e in self.events() if e["type"] == "log"]
+
+    def steps(self) -> Dict[str, str]:
+        """Return the latest status of every step seen so far."""
+
+        status: Dict[str, str] = {}
+        for event in self.events():
+            if event["type"] == "step":
+                status[event["name"]] = event["status"]
+        return status
+
+    def wait(self, since: int = 0, timeout: Optional[float] = None) -> bool:
+        """Block until more than ``since`` events exist or the run is done.
+
+        Returns:
+            bool: True if new events arrived or the run finished in time.
+        """
+
+        with self._changed:
+            return self._changed.wait_for(
+                lambda: self.done or len(self._events) > since, timeout=timeout
+            )
+
+
+def run_logged(run_log: RunLog, func: Callable[..., Any], *args, **kwargs) -> None:
+    """Call ``func(*args, run_log=run_log, **kwargs)`` and record its outcome."""
+
+    try:
+        result = func(*args, run_log=run_log, **kwargs)
+    except Exception as exc:  # pragma: no cover - generic safety net
+        run_log.log(f"Run failed: {exc}")
+        run_log.finish(error=exc)
+        return
+    run_log.finish(result=result)
+
+
+def submit(func: Callable[..., Any], *args, **kwargs) -> RunLog:
+    """Run ``func`` in a background thread with a new :class:`RunLog`.
+
+    ``func`` receives the log as its ``run_log`` keyword argument. The
+    returned log fills up while the run progresses; ``done``, ``result``
+    and ``error`` are set when ``func`` returns or raises.
+    """
+
+    run_log = RunLog()
+    threading.Thread(
+        target=run_logged, args=(run_log, func) + args, kwargs=kwargs, daemon=True
+    ).start()
+    return run_log
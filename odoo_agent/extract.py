@@ -0,0 +1,329 @@
+"""Archive extraction utilities for downloaded Odoo sources."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import requests
+
+from . import metrics
+from .cache import CHUNK_SIZE
+from .events import LogFn
+from .modules import select_archive_members, source_prefix
+
+
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+# Below this many members the process pool start-up costs more than it saves.
+PARALLEL_MIN_MEMBERS = 2000
+SHARDS_PER_WORKER = 4
+
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class HashingReader:
+    """File-like wrapper that hashes bytes as they are read."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.digest = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(size)
+        self.digest.update(data)
+        self.bytes_read += len(data)
+        return data
+
+    def drain(self) -> None:
+        """Consume the rest of the stream so the digest covers the whole body."""
+
+        while self.read(CHUNK_SIZE):
+            pass
+
+    def hexdigest(self) -> str:
+        return self.digest.hexdigest()
+
+
+def archive_kind(name: str) -> Optional[str]:
+    """Return ``"zip"`` or ``"tar.gz"`` for a supported archive name."""
+
+    if name.endswith(".tar.gz") or name.endswith(".tgz"):
+        return "tar.gz"
+    if name.endswith(".zip"):
+        return "zip"
+    return None
+
+
+def _member_path(extract_path: str, name: str) -> Optional[str]:
+    """Return the sanitized destination of zip member ``name``.
+
+    Mirrors :meth:`zipfile.ZipFile.extract`: absolute prefixes, drive
+    letters and ``.``/``..`` components are dropped so members can never
+    escape ``extract_path``.
+    """
+
+    arcname = name.replace("/", os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    parts = [
+        part
+        for part in arcname.split(os.path.sep)
+        if part not in ("", os.path.curdir, os.path.pardir)
+    ]
+    if not parts:
+        return None
+    return os.path.join(extract_path, *parts)
+
+
+def _extract_zip_shard(filename: str, names: List[str], extract_path: str) -> List[str]:
+    """Extract ``names`` from ``filename`` using a private ``ZipFile`` handle."""
+
+    with zipfile.ZipFile(filename, "r") as zip_ref:
+        for name in names:
+            target = _member_path(extract_path, name)
+            with zip_ref.open(name) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    return names
+
+
+def extract_zip_parallel(
+    filename: str,
+    extract_path: str,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    members: Optional[Iterable[str]] = None,
+    log: LogFn = print,
+) -> int:
+    """Extract a zip archive with members sharded across a process pool.
+
+    All directories are created up front so workers never race on
+    ``makedirs``; each worker then opens its own ``ZipFile`` handle and
+    decompresses its shard of files. Shards are balanced by uncompressed
+    size.
+
+    Args:
+        filename: Path to the ``.zip`` archive.
+        extract_path: Destination directory.
+        workers: Process count; defaults to ``os.cpu_count()``.
+        progress: Optional ``callback(member_name, done, total)`` invoked in
+            the parent process for every extracted member.
+        members: Optional subset of member names to extract.
+
+    Returns:
+        int: Number of files extracted.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    with zipfile.ZipFile(filename, "r") as zip_ref:
+        infos = zip_ref.infolist()
+    if members is not None:
+        wanted = set(members)
+        infos = [info for info in infos if info.filename in wanted]
+
+    files = []
+    directories = {extract_path}
+    for info in infos:
+        target = _member_path(extract_path, info.filename)
+        if target is None:
+            continue
+        if info.is_dir():
+            directories.add(target)
+        else:
+            directories.add(os.path.dirname(target))
+            files.append(info)
+    for directory in sorted(directories):
+        os.makedirs(directory, exist_ok=True)
+
+    total = len(files)
+    shard_count = max(1, min(total, workers * SHARDS_PER_WORKER))
+    shards: List[List[str]] = [[] for _ in range(shard_count)]
+    loads = [0] * shard_count
+    for info in sorted(files, key=lambda i: i.file_size, reverse=True):
+        lightest = loads.index(min(loads))
+        shards[lightest].append(info.filename)
+        loads[lightest] += info.file_size + 512
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_extract_zip_shard, filename, shard, extract_path)
+            for shard in shards
+            if shard
+        ]
+        for future in as_completed(futures):
+            for name in future.result():
+                done += 1
+                if progress is not None:
+                    progress(name, done, total)
+
+    log(f"Extracted {total} files with {workers} worker processes to {extract_path}")
+    return total
+
+
+def read_source_file(filename: str, relpath: str) -> Tuple[str, Optional[bytes]]:
+    """Read one file of the Odoo source tree without extracting the archive.
+
+    Args:
+        filename: ``.zip`` or ``.tar.gz`` archive path.
+        relpath: Path relative to the source root, such as
+            ``requirements.txt``.
+
+    Returns:
+        Tuple[str, Optional[bytes]]: (archive prefix of the source root,
+        file contents or None if the archive has no such file).
+    """
+
+    kind = archive_kind(filename)
+    if kind == "zip":
+        with zipfile.ZipFile(filename, "r") as zip_ref:
+            names = zip_ref.namelist()
+            prefix = source_prefix(names)
+            if prefix + relpath not in names:
+                return prefix, None
+            return prefix, zip_ref.read(prefix + relpath)
+    if kind == "tar.gz":
+        with tarfile.open(filename, "r:gz") as tar_ref:
+            prefix = source_prefix(tar_ref.getnames())
+            try:
+                member = tar_ref.extractfile(prefix + relpath)
+            except KeyError:
+                return prefix, None
+            return prefix, member.read() if member is not None else None
+    raise ValueError(f"Unsupported archive format: {filename}")
+
+
+def extract_archive(
+    filename: str,
+    extract_path: str,
+    workers: int = 1,
+    modules: Optional[Iterable[str]] = None,
+    log: LogFn = print,
+) -> bool:
+    """Extract a downloaded ``.zip`` or ``.tar.gz`` archive.
+
+    Args:
+        filename: Archive path.
+        extract_path: Destination directory.
+        workers: Worker processes for zip extraction; values above one use
+            :func:`extract_zip_parallel` for archives with at least
+            ``PARALLEL_MIN_MEMBERS`` members.
+        modules: Optional module allow-list. When given, only the core
+            source tree and the addons in the dependency closure of these
+            modules are extracted.
+
+    Returns:
+        bool: False if the archive format is not supported.
+    """
+
+    kind = archive_kind(filename)
+    with metrics.span("extract", kind=kind, workers=workers) as span:
+        if kind == "zip":
+            with zipfile.ZipFile(filename, "r") as zip_ref:
+                members = None
+                if modules is not None:
+                    members = select_archive_members(
+                        zip_ref.namelist(), zip_ref.read, modules, log=log
+                    )
+                count = len(zip_ref.infolist()) if members is None else len(members)
+                span.set(files_extracted=count)
+                parallel = workers > 1 and count >= PARALLEL_MIN_MEMBERS
+                if not parallel:
+                    zip_ref.extractall(extract_path, members=members)
+            if parallel:
+                extract_zip_parallel(
+                    filename, extract_path, workers=workers, members=members, log=log
+                )
+            log(f"Extracted zip archive to {extract_path}")
+        elif kind == "tar.gz":
+            with tarfile.open(filename, "r:gz") as tar_ref:
+                tar_members = None
+                if modules is not None:
+                    wanted = set(
+                        select_archive_members(
+                            tar_ref.getnames(),
+                            lambda name: tar_ref.extractfile(name).read(),
+                            modules,
+                            log=log,
+                        )
+                    )
+                    tar_members = [m for m in tar_ref.getmembers() if m.name in wanted]
+                tar_ref.extractall(extract_path, members=tar_members)
+                if tar_members is None:
+                    tar_members = tar_ref.getmembers()
+                span.set(files_extracted=len(tar_members))
+            log(f"Extracted tar.gz archive to {extract_path}")
+        else:
+            log(
+                f"Unsupported archive format: {filename}. Only .zip and .tar.gz "
+                "are supported for automatic extraction."
+            )
+            return False
+    return True
+
+
+def stream_extract(
+    response: requests.Response,
+    kind: str,
+    extract_path: str,
+    spool_dir: Optional[str] = None,
+    modules: Optional[Iterable[str]] = None,
+    log: LogFn = print,
+) -> str:
+    """Extract an archive while it is being downloaded.
+
+    ``.tar.gz`` bodies are piped straight into :mod:`tarfile` (``r|gz``), so
+    no archive copy ever touches the disk. ``.zip`` archives keep their
+    central directory at the end of the file and cannot be read as a
+    stream; they are spooled to a temporary file (in memory up to
+    ``SPOOL_MAX_BYTES``) that is discarded after extraction.
+
+    Args:
+        response: Open streamed ``200`` response.
+        kind: ``"zip"`` or ``"tar.gz"`` as returned by :func:`archive_kind`.
+        extract_path: Destination directory.
+        spool_dir: Directory for the ``.zip`` spool file.
+        modules: Optional module allow-list, honoured for ``.zip`` archives
+            only; a ``.tar.gz`` stream cannot be filtered before its
+            manifests have been read.
+
+    Returns:
+        str: SHA-256 digest of the downloaded archive bytes.
+    """
+
+    response.raw.decode_content = True
+    reader = HashingReader(response.raw)
+
+    with metrics.span("extract.stream", kind=kind) as span:
+        if kind == "tar.gz":
+            with tarfile.open(fileobj=reader, mode="r|gz") as tar_ref:
+                tar_ref.extractall(extract_path)
+            reader.drain()
+            log(f"Stream-extracted tar.gz archive to {extract_path}")
+        elif kind == "zip":
+            with tempfile.SpooledTemporaryFile(
+                max_size=SPOOL_MAX_BYTES, dir=spool_dir
+            ) as spool:
+                for chunk in iter(lambda: reader.read(CHUNK_SIZE), b""):
+                    spool.write(chunk)
+                spool.seek(0)
+                with zipfile.ZipFile(spool, "r") as zip_ref:
+                    members = None
+                    if modules is not None:
+                        members = select_archive_members(
+                            zip_ref.namelist(), zip_ref.read, modules, log=log
+                        )
+                    zip_ref.extractall(extract_path, members=members)
+            log(f"Extracted spooled zip archive to {extract_path}")
+        else:
+            raise ValueError(f"Unsupported archive format for streaming: {kind}")
+        span.set(bytes=reader.bytes_read)
+
+    return reader.hexdigest()
@@ -0,0 +1,337 @@
+"""Fleet mode: provision many Odoo instances concurrently.
+
+Instances run through the normal :class:`OdooInstallerAgent` workflow on a
+bounded worker pool. Downloads of the same archive are serialized per
+version and URL, extractions per archive digest, and the fleet always uses
+the shared source store, so each archive is fetched and extracted once
+while every further instance gets a cheap cached revalidation plus a
+hardlink checkout. HTTP ports are allocated up front so instances never
+collide, and with ``odoo_db`` configured every instance gets its own
+database.
+
+Run from the command line with a JSON list of instance specs::
+
+    python fleet_main.py specs.json --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+from .agent import OdooInstallerAgent
+from .events import LogFn
+
+DEFAULT_BASE_PORT = 8069
+
+
+@dataclass
+class InstanceSpec:
+    """Parameters of one instance to provision."""
+
+    target_dir: str
+    version: str = "16.0"
+    port: Optional[int] = None
+    modules: Optional[List[str]] = None
+    download_url: Union[str, List[str], None] = None
+    database: Optional[str] = None
+
+
+@dataclass
+class InstanceResult:
+    """Outcome of provisioning one instance."""
+
+    target_dir: str
+    version: str
+    port: int
+    success: bool
+    duration: float
+    step_report: str = ""
+    error: str = ""
+
+
+@dataclass
+class FleetSummary:
+    """Results of an :func:`install_many` run."""
+
+    results: List[InstanceResult] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return all(r.success for r in self.results)
+
+    def to_dict(self) -> Dict:
+        return {
+            "success": self.success,
+            "duration": self.duration,
+            "instances": [asdict(r) for r in self.results],
+        }
+
+
+def _port_free(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(("", port))
+        except OSError:
+            return False
+    return True
+
+
+def allocate_ports(
+    specs: Iterable[InstanceSpec],
+    base_port: int = DEFAULT_BASE_PORT,
+) -> List[int]:
+    """Assign a distinct, currently free HTTP port to every spec.
+
+    Explicit ports are honoured (duplicates raise ``ValueError``); the rest
+    get the lowest free ports from ``base_port`` upwards.
+    """
+
+    specs = list(specs)
+    taken: Set[int] = set()
+    for spec in specs:
+        if spec.port is not None:
+            if spec.port in taken:
+                raise ValueError(
+                    f"Port {spec.port} is requested by more than one instance."
+                )
+            taken.add(spec.port)
+
+    ports = []
+    candidate = base_port
+    for spec in specs:
+        if spec.port is not None:
+            ports.append(spec.port)
+            continue
+        while candidate in taken or not _port_free(candidate):
+            candidate += 1
+        taken.add(candidate)
+        ports.append(candidate)
+    return ports
+
+
+def allocate_databases(
+    specs: Iterable[InstanceSpec],
+    base_name: Optional[str] = None,
+) -> List[Optional[str]]:
+    """Assign a distinct database name to every spec.
+
+    Explicit names are honoured (duplicates raise ``ValueError``). With
+    ``base_name`` (the shared ``odoo_db``), the rest get
+    ``<base_name>_<target directory name>``, suffixed on collisions;
+    without it they get no database.
+    """
+
+    specs = list(specs)
+    taken: Set[str] = set()
+    for spec in specs:
+        if spec.database is not None:
+            if spec.database in taken:
+                raise ValueError(
+                    f"Database {spec.database} is requested by more than one instance."
+                )
+            taken.add(spec.database)
+
+    names: List[Optional[str]] = []
+    for spec in specs:
+        if spec.database is not None or not base_name:
+            names.append(spec.database)
+            continue
+        target = os.path.basename(os.path.abspath(spec.target_dir))
+        stem = f"{base_name}_{re.sub(r'[^0-9a-z_]+', '_', target.lower())}"
+        name, suffix = stem, 2
+        while name in taken:
+            name, suffix = f"{stem}_{suffix}", suffix + 1
+        taken.add(name)
+        names.append(name)
+    return names
+
+
+class _FleetAgent(OdooInstallerAgent):
+    """Agent whose downloads and extractions are serialized per archive."""
+
+    def __init__(
+        self,
+        config: Dict,
+        locks: Dict,
+        locks_guard: threading.Lock,
+        log: LogFn = print,
+    ):
+        self._fleet_log = log
+        super().__init__(config=config)
+        self._locks = locks
+        self._locks_guard = locks_guard
+
+    def log(self, message: str) -> None:
+        self._fleet_log(message)
+
+    def _archive_lock(self, version, download_url) -> threading.Lock:
+        with self._locks_guard:
+            sources = download_url
+            if sources is not None and not isinstance(sources, str):
+                sources = tuple(sources)
+            return self._locks.setdefault((version, sources), threading.Lock())
+
+    def fetch_odoo(self, version="16.0", target_dir=".", download_url=None):
+        with self._archive_lock(version, download_url):
+            return super().fetch_odoo(
+                version=version, target_dir=target_dir, download_url=download_url
+            )
+
+    def extract_odoo(
+        self, filename, digest, version="16.0", target_dir=".", modules=None
+    ):
+        # Instances of the same archive would each extract it with a full
+        # process pool; later ones wait and check out the store entry.
+        with self._archive_lock(version, digest):
+            return super().extract_odoo(
+                filename,
+                digest,
+                version=version,
+                target_dir=target_dir,
+                modules=modules,
+            )
+
+    def download_odoo(
+        self,
+        version="16.0",
+        target_dir=".",
+        download_url=None,
+        modules=None,
+    ):
+        with self._archive_lock(version, download_url):
+            return super().download_odoo(
+                version=version,
+                target_dir=target_dir,
+                download_url=download_url,
+                modules=modules,
+            )
+
+
+def install_many(
+    specs: Iterable[InstanceSpec],
+    config: Optional[Dict] = None,
+    workers: Optional[int] = None,
+    real_install: bool = False,
+    base_port: int = DEFAULT_BASE_PORT,
+    log: LogFn = print,
+) -> FleetSummary:
+    """Provision every instance in ``specs`` concurrently.
+
+    Args:
+        specs: Instances to provision.
+        config: Agent configuration shared by all instances. ``use_store``
+            is forced on so each archive is extracted once, and
+            ``instances_on_host`` defaults to the number of specs so the
+            generated server settings share the host's resources.
+            Detection only scans each instance's own ``target_dir``, and
+            ``odoo_db`` is the base of the per-instance database names
+            from :func:`allocate_databases`.
+        workers: Maximum concurrent installs; defaults to the CPU count.
+        real_install: Passed to each instance's installation workflow.
+        base_port: First port tried for specs without an explicit port.
+        log: Receives the progress messages of every instance.
+
+    Returns:
+        FleetSummary: Per-instance results and the total wall time.
+    """
+
+    specs = list(specs)
+    ports = allocate_ports(specs, base_port=base_port)
+    config = dict(config or {})
+    databases = allocate_databases(specs, base_name=config.get("odoo_db"))
+    config["use_store"] = True
+    # Size every instance for its share of this host.
+    config.setdefault("instances_on_host", len(specs))
+    locks: Dict = {}
+    locks_guard = threading.Lock()
+    workers = workers or os.cpu_count() or 1
+
+    def provision(
+        spec: InstanceSpec, port: int, database: Optional[str]
+    ) -> InstanceResult:
+        start = time.perf_counter()
+        # Only reuse a tree in the instance's own target; a system-wide scan
+        # would hand every instance the same detected install.
+        instance_config = dict(config, detect_roots=[spec.target_dir])
+        if database is not None:
+            instance_config["odoo_db"] = database
+        agent = _FleetAgent(instance_config, locks, locks_guard, log=log)
+        try:
+            success = agent.execute_installation_process(
+                odoo_version=spec.version,
+                target_directory=spec.target_dir,
+                real_install=real_install,
+                modules=spec.modules,
+                http_port=port,
+                download_url=spec.download_url,
+            )
+            error = ""
+        except Exception as exc:  # pragma: no cover - generic safety net
+            success, error = False, str(exc)
+        return InstanceResult(
+            target_dir=spec.target_dir,
+            version=spec.version,
+            port=port,
+            success=success,
+            duration=time.perf_counter() - start,
+            step_report=agent.last_step_report,
+            error=error,
+        )
+
+    log(f"Provisioning {len(specs)} Odoo instances with {workers} workers...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(provision, spec, port, database)
+            for spec, port, database in zip(specs, ports, databases)
+        ]
+        results = [future.result() for future in futures]
+    summary = FleetSummary(results=results, duration=time.perf_counter() - start)
+
+    for result in results:
+        status = "OK" if result.success else "FAILED"
+        log(
+            f"  {result.target_dir} (Odoo {result.version}, port {result.port}): "
+            f"{status} in {result.duration:.2f}s"
+        )
+    log(f"Fleet provisioning finished in {summary.duration:.2f}s.")
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Provision many Odoo instances.")
+    parser.add_argument("specs", help="JSON file with a list of instance specs.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--real-install", action="store_true")
+    parser.add_argument("--base-port", type=int, default=DEFAULT_BASE_PORT)
+    parser.add_argument("--summary", help="Write the JSON summary to this file.")
+    args = parser.parse_args(argv)
+
+    with open(args.specs, "r", encoding="utf-8") as f:
+        specs = [InstanceSpec(**item) for item in json.load(f)]
+
+    config = {}
+    if os.environ.get("GEMINI_API_KEY"):
+        config["gemini_api_key"] = os.environ["GEMINI_API_KEY"]
+
+    summary = install_many(
+        specs,
+        config=config,
+        workers=args.workers,
+        real_install=args.real_install,
+        base_port=args.base_port,
+    )
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary.to_dict(), f, indent=2)
+    return 0 if summary.success else 1
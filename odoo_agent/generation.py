@@ -0,0 +1,401 @@
+"""Batched, rate-limited Gemini generation over Odoo records.
+
+A :class:`GenerationTask` describes one capability, for example "write a
+product description from the product's name and category into
+``description_sale``". :func:`run_generation` pages the task's records from
+Odoo, renders one prompt per record and sends the prompts that are not
+cached yet to Gemini:
+
+* several records are packed into one request (``batch_size``) asking for a
+  JSON array of answers; a batch whose answer cannot be parsed is retried
+  record by record;
+* requests run concurrently on a thread pool and pass through
+  :class:`TokenBucket` limits on requests and estimated tokens per minute;
+  ``429`` and ``5xx`` answers are retried with backoff;
+* answers are cached in SQLite under a hash of model, template and
+  rendered prompt, so unchanged records are never sent again;
+* results are written back with one bulk call per ``write_batch`` records.
+
+The Odoo side is duck-typed: any object with a generator
+``search_read(model, domain, fields, page_size=...)`` and
+``write_many(model, values_by_id)`` works, such as
+:class:`odoo_agent.rpc.OdooClient` or a fake used in tests. The Gemini
+endpoint is configurable, so a local fake model server can stand in for it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .cache import default_cache_dir
+from .events import LogFn
+
+DEFAULT_ENDPOINT = "https://generativelanguage.googleapis.com/v1beta"
+DEFAULT_MODEL = "gemini-1.5-flash"
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+MAX_RETRIES = 5
+# Rough prompt-size estimate used for the token budget.
+CHARS_PER_TOKEN = 4
+
+
+class GenerationError(Exception):
+    """Raised when the model endpoint keeps failing or answers garbage."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``rate`` per second."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> None:
+        """Block until ``amount`` tokens are available and take them."""
+
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                delay = (amount - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+class ResponseCache:
+    """SQLite cache of model answers keyed by prompt hash."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(default_cache_dir(), "generation.sqlite")
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)"
+            )
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit.
+            for i in range(0, len(keys), 500):
+                chunk = list(keys[i : i + 500])
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, response FROM responses WHERE key IN ({placeholders})",
+                    chunk,
+                )
+                found.update(rows)
+        return found
+
+    def put_many(self, items: Dict[str, str]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()],
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class GeminiClient:
+    """Minimal Gemini ``generateContent`` REST client with rate limiting."""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = DEFAULT_MODEL,
+        endpoint: str = DEFAULT_ENDPOINT,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+        pool_size: int = 16,
+        timeout: float = 60.0,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.endpoint = endpoint.rstrip("/")
+        self.timeout = timeout
+        self.request_bucket = TokenBucket(requests_per_minute / 60.0)
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0)
+        self.session = requests.Session()
+        # A header keeps the key out of URLs, which end up in error messages.
+        self.session.headers["x-goog-api-key"] = api_key
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def generate(self, prompt: str) -> str:
+        """Send one prompt and return the text of the first candidate."""
+
+        url = f"{self.endpoint}/models/{self.model}:generateContent"
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        self.token_bucket.acquire(len(prompt) / CHARS_PER_TOKEN)
+
+        for attempt in range(1, MAX_RETRIES + 1):
+            # Retries are requests too and count against the rate limit.
+            self.request_bucket.acquire()
+            try:
+                response = self.session.post(url, json=body, timeout=self.timeout)
+            except requests.exceptions.RequestException as exc:
+                if attempt == MAX_RETRIES:
+                    raise GenerationError(
+                        f"Gemini request failed ({type(exc).__name__})."
+                    ) from exc
+                time.sleep(min(30.0, 2 ** attempt))
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == MAX_RETRIES:
+                    break
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+                time.sleep(min(60.0, delay))
+                continue
+            if not response.ok:
+                raise GenerationError(
+                    f"Gemini rejected the request with HTTP {response.status_code}."
+                )
+            try:
+                parts = response.json()["candidates"][0]["content"]["parts"]
+            except (ValueError, KeyError, IndexError) as exc:
+                raise GenerationError(f"Unexpected Gemini response: {exc}") from exc
+            return "".join(part.get("text", "") for part in parts)
+        raise GenerationError(f"Gemini kept failing with HTTP {response.status_code}.")
+
+
+@dataclass
+class GenerationTask:
+    """One generation capability applied to a set of Odoo records.
+
+    ``prompt`` is a :meth:`str.format` template over the record's
+    ``fields``; the answer is written to ``target_field``.
+    """
+
+    model: str
+    fields: List[str]
+    prompt: str
+    target_field: str
+    domain: List = field(default_factory=list)
+
+    def render(self, record: Dict) -> str:
+        values = {name: record.get(name) for name in self.fields}
+        for name, value in values.items():
+            # Many2one values come back as [id, display_name].
+            if (
+                isinstance(value, list)
+                and len(value) == 2
+                and isinstance(value[0], int)
+                and isinstance(value[1], str)
+            ):
+                values[name] = value[1]
+        return self.prompt.format(**values)
+
+
+@dataclass
+class GenerationStats:
+    """Counters reported by :func:`run_generation`."""
+
+    records: int = 0
+    cached: int = 0
+    generated: int = 0
+    requests: int = 0
+    written: int = 0
+    failed: int = 0
+    duration: float = 0.0
+
+
+def prompt_key(model: str, task: GenerationTask, prompt: str) -> str:
+    payload = "\x00".join((model, task.model, task.target_field, prompt))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def pack_prompts(prompts: Sequence[str]) -> str:
+    """Combine several prompts into one request asking for a JSON array."""
+
+    numbered = "\n\n".join(f"### Item {i + 1}\n{p}" for i, p in enumerate(prompts))
+    return (
+        f"Answer each of the following {len(prompts)} items independently. "
+        f"Return only a JSON array of {len(prompts)} strings, the answer for "
+        "item 1 first.\n\n" + numbered
+    )
+
+
+def unpack_answers(text: str, count: int) -> Optional[List[str]]:
+    """Parse the JSON array answer of a packed request, or return None."""
+
+    match = re.search(r"\[.*\]", text, re.DOTALL)
+    if match is None:
+        return None
+    try:
+        answers = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(answers, list) or len(answers) != count:
+        return None
+    return [str(answer).strip() for answer in answers]
+
+
+def _generate_batch(client: GeminiClient, prompts: List[str]) -> Tuple[List[str], int]:
+    """Return the answers for ``prompts`` and the number of requests used."""
+
+    if len(prompts) == 1:
+        return [client.generate(prompts[0]).strip()], 1
+    answers = unpack_answers(client.generate(pack_prompts(prompts)), len(prompts))
+    if answers is not None:
+        return answers, 1
+    return [client.generate(p).strip() for p in prompts], 1 + len(prompts)
+
+
+def _pages(records: Iterable[Dict], size: int) -> Iterable[List[Dict]]:
+    page: List[Dict] = []
+    for record in records:
+        page.append(record)
+        if len(page) >= size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def run_generation(
+    odoo,
+    task: GenerationTask,
+    client: GeminiClient,
+    cache: Optional[ResponseCache] = None,
+    page_size: int = 500,
+    batch_size: int = 10,
+    workers: int = 8,
+    write_batch: int = 200,
+    log: LogFn = print,
+) -> GenerationStats:
+    """Generate ``task.target_field`` for every matching record.
+
+    Args:
+        odoo: Object providing ``search_read`` (a generator) and
+            ``write_many``; see the module docstring.
+        task: What to generate and where to store it.
+        client: Rate-limited model client.
+        cache: Answer cache; a default one in the shared cache directory is
+            used when omitted.
+        page_size: Records fetched per ``search_read`` round trip.
+        batch_size: Prompts packed into one model request.
+        workers: Concurrent model requests.
+        write_batch: Records updated per bulk write.
+        log: Receives progress messages; defaults to ``print``.
+
+    Returns:
+        GenerationStats: Counts of cached, generated and written records.
+    """
+
+    cache = cache or ResponseCache()
+    stats = GenerationStats()
+    start = time.perf_counter()
+    fields = sorted(set(task.fields) | {"id", task.target_field})
+    pending_writes: Dict[int, Dict] = {}
+    in_flight: Dict = {}
+
+    def queue_write(record: Dict, answer: str) -> None:
+        if record.get(task.target_field) != answer:
+            pending_writes[record["id"]] = {task.target_field: answer}
+        if len(pending_writes) >= write_batch:
+            flush()
+
+    def flush() -> None:
+        if pending_writes:
+            odoo.write_many(task.model, dict(pending_writes))
+            stats.written += len(pending_writes)
+            pending_writes.clear()
+
+    def collect(done) -> None:
+        for future in done:
+            batch = in_flight.pop(future)
+            try:
+                answers, requests_used = future.result()
+            except (GenerationError, requests.exceptions.RequestException) as exc:
+                # Request errors may quote the request; only name them.
+                reason = exc if isinstance(exc, GenerationError) else type(exc).__name__
+                log(f"Generation failed for {len(batch)} {task.model} records: {reason}")
+                stats.failed += len(batch)
+                continue
+            stats.requests += requests_used
+            stats.generated += len(batch)
+            cache.put_many({key: answer for (_, key, _), answer in zip(batch, answers)})
+            for (record, _, _), answer in zip(batch, answers):
+                queue_write(record, answer)
+
+    with metrics.span("generation", model=task.model, target=task.target_field) as span:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            records = odoo.search_read(
+                task.model, task.domain, fields, page_size=page_size
+            )
+            for page in _pages(records, page_size):
+                stats.records += len(page)
+                prompts = [task.render(record) for record in page]
+                keys = [prompt_key(client.model, task, p) for p in prompts]
+                cached = cache.get_many(keys)
+                todo: Deque[Tuple[Dict, str, str]] = deque()
+                for record, key, prompt in zip(page, keys, prompts):
+                    if key in cached:
+                        stats.cached += 1
+                        queue_write(record, cached[key])
+                    else:
+                        todo.append((record, key, prompt))
+
+                while todo:
+                    batch = [todo.popleft() for _ in range(min(batch_size, len(todo)))]
+                    future = pool.submit(_generate_batch, client, [p for _, _, p in batch])
+                    in_flight[future] = batch
+                    # Bound the number of queued requests (and of records
+                    # held in memory) to a few per worker.
+                    if len(in_flight) >= workers * 2:
+                        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                        collect(done)
+
+            while in_flight:
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                collect(done)
+        flush()
+        stats.duration = time.perf_counter() - start
+        span.set(
+            records=stats.records,
+            cached=stats.cached,
+            generated=stats.generated,
+            requests=stats.requests,
+            failed=stats.failed,
+        )
+
+    log(
+        f"Generated {task.target_field} for {stats.generated} {task.model} records "
+        f"({stats.cached} cached, {stats.requests} requests, {stats.written} "
+        f"written, {stats.failed} failed) in {stats.duration:.2f}s."
+    )
+    return stats
@@ -4,53 +4,114 @@ This module outlines how the agent could use Google APIs (for example,
 Google Gemini) to augment Odoo with generative AI capabilities.
 """
 
-from typing import Dict
+from typing import Dict, List
 
+from . import metrics
+from .events import LogFn
 
-def integrate_google_api(config: Dict, odoo_instance_details: Dict) -> bool:
+
+@metrics.traced("integrate")
+def integrate_google_api(
+    config: Dict, odoo_instance_details: Dict, log: LogFn = print
+) -> bool:
     """Integrate Google APIs with the given Odoo instance (conceptual).
 
     The implementation focuses on conceptual steps and configuration checks.
 
     Args:
         config: Agent configuration dictionary; expected to contain
-            a `gemini_api_key` entry for Google Gemini access.
+            a `gemini_api_key` entry for Google Gemini access. Optional
+            `generation_tasks` (a list of
+            :class:`~odoo_agent.generation.GenerationTask` keyword dicts)
+            are run for real when an Odoo client is available, tuned by
+            `gemini_model`, `gemini_endpoint`, `gemini_rpm`,
+            `generation_workers` and `generation_batch_size`.
         odoo_instance_details: Metadata about the Odoo instance, such as URL
-            and admin user. Currently used only for logging / future hooks.
+            and admin user, and optionally a connected `client`.
+        log: Receives progress messages; defaults to ``print``.
 
     Returns:
         bool: True if the conceptual integration steps succeed, False otherwise.
     """
 
-    print("Starting Google Gemini API integration process...")
+    log("Starting Google Gemini API integration process...")
 
     try:
         # Step 1: Authenticate with Google Gemini API (conceptual)
-        print("Authenticating with Google Gemini API (conceptual step)...")
+        log("Authenticating with Google Gemini API (conceptual step)...")
         if "gemini_api_key" not in config:
-            print("Error: Google Gemini API key not found in configuration.")
+            log("Error: Google Gemini API key not found in configuration.")
             return False
 
         # A real implementation would configure the client library, for example:
         #   import google.generativeai as genai
         #   genai.configure(api_key=config["gemini_api_key"])
-        print("Google Gemini API authentication simulated using provided key.")
+        log("Google Gemini API authentication simulated using provided key.")
+
+        # Step 2: Use Gemini for Odoo-related tasks
+        tasks = config.get("generation_tasks") or []
+        client = odoo_instance_details.get("client")
+        if tasks and client is not None:
+            return _run_generation_tasks(config, client, tasks, log=log)
 
-        # Step 2: Use Gemini for Odoo-related tasks (conceptual)
-        print(
+        log(
             "Integrating with Google Gemini API for generative tasks "
             "(conceptual step)..."
         )
-        # Examples of future capabilities:
+        # Examples of capabilities, runnable through ``generation_tasks``:
         #   - Generate product descriptions from Odoo product data.
         #   - Summarize CRM interactions.
         #   - Answer natural language questions about Odoo data.
         #   - Help create marketing content.
-        print("Google Gemini API integration for generative tasks simulated.")
+        log("Google Gemini API integration for generative tasks simulated.")
 
-        print("Google Gemini API integration completed successfully.")
+        log("Google Gemini API integration completed successfully.")
         return True
 
     except Exception as exc:  # pragma: no cover - generic safety net
-        print(f"Error during Google Gemini API integration: {exc}")
+        log(f"Error during Google Gemini API integration: {exc}")
+        return False
+
+
+def _run_generation_tasks(
+    config: Dict, odoo_client, tasks: List[Dict], log: LogFn = print
+) -> bool:
+    """Run the configured generation tasks against a live Odoo instance."""
+
+    from .generation import (
+        DEFAULT_ENDPOINT,
+        DEFAULT_MODEL,
+        DEFAULT_REQUESTS_PER_MINUTE,
+        GeminiClient,
+        GenerationTask,
+        ResponseCache,
+        run_generation,
+    )
+
+    client = GeminiClient(
+        config["gemini_api_key"],
+        model=config.get("gemini_model", DEFAULT_MODEL),
+        endpoint=config.get("gemini_endpoint", DEFAULT_ENDPOINT),
+        requests_per_minute=config.get("gemini_rpm", DEFAULT_REQUESTS_PER_MINUTE),
+    )
+    cache = ResponseCache(config.get("generation_cache"))
+    try:
+        failed = 0
+        for spec in tasks:
+            stats = run_generation(
+                odoo_client,
+                GenerationTask(**spec),
+                client,
+                cache=cache,
+                batch_size=config.get("generation_batch_size", 10),
+                workers=config.get("generation_workers", 8),
+                log=log,
+            )
+            failed += stats.failed
+    finally:
+        cache.close()
+    if failed:
+        log(f"Gemini generation failed for {failed} records.")
         return False
+    log("Google Gemini API integration completed successfully.")
+    return True
@@ -0,0 +1,179 @@
+"""Shared job queue for front ends that serve many users.
+
+:class:`JobQueue` runs installation workflows on a bounded worker pool.
+Each job records its output in an :class:`~odoo_agent.events.RunLog`, so
+callers poll :meth:`JobQueue.get` for status and incremental logs instead
+of running the workflow themselves. Jobs are keyed by their parameters and
+a hash of the configuration: submitting the same parameters while a job is
+queued or running, or within ``ttl`` seconds after it succeeded, returns
+that job instead of starting another run.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from . import events
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+DEFAULT_WORKERS = 2
+DEFAULT_TTL = 600.0
+DEFAULT_MAX_JOBS = 256
+
+# Called as ``runner(config, params, run_log=log)``; report to ``run_log``.
+Runner = Callable[..., Any]
+
+
+def run_installation(config: Dict, params: Dict, run_log: events.RunLog) -> bool:
+    """Default runner: one agent workflow with ``params`` as keyword args."""
+
+    from .agent import OdooInstallerAgent
+
+    agent = OdooInstallerAgent(config=config, run_log=run_log)
+    return agent.execute_installation_process(**params)
+
+
+def job_key(config: Dict, params: Dict) -> str:
+    """Return the cache key for a run; secrets in ``config`` are only hashed."""
+
+    payload = json.dumps([params, config], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Job:
+    """One queued, running or finished workflow run."""
+
+    id: str
+    key: str
+    params: Dict
+    log: events.RunLog = field(default_factory=events.RunLog)
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+
+    @property
+    def status(self) -> str:
+        if self.log.done:
+            ok = self.log.error is None and self.log.result is not False
+            return SUCCEEDED if ok else FAILED
+        return RUNNING if self.started_at is not None else QUEUED
+
+    @property
+    def finished_at(self) -> Optional[float]:
+        return self.log.finished_at
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "steps": self.log.steps(),
+        }
+
+
+class JobQueue:
+    """Bounded worker pool with job deduplication and a TTL result cache."""
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        ttl: float = DEFAULT_TTL,
+        max_jobs: int = DEFAULT_MAX_JOBS,
+        runner: Runner = run_installation,
+    ):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.runner = runner
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="odoo-job")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, str] = {}
+        self._ids = itertools.count(1)
+
+    def _expired(self, job: Job, now: float) -> bool:
+        if not job.log.done:
+            return False
+        # Failed runs are never reused; successful ones for ``ttl`` seconds.
+        if job.status == FAILED:
+            return True
+        return now - job.finished_at > self.ttl
+
+    def _purge(self, now: float) -> None:
+        for job_id, job in list(self._jobs.items()):
+            if job.log.done and now - job.finished_at > self.ttl:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+        # Drop the oldest finished jobs once the table is full.
+        finished = sorted(
+            (j for j in self._jobs.values() if j.log.done), key=lambda j: j.finished_at
+        )
+        while len(self._jobs) > self.max_jobs and finished:
+            job = finished.pop(0)
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
+
+    def submit(self, config: Optional[Dict] = None, **params) -> Job:
+        """Queue a run, or return the live or cached job for the same inputs.
+
+        Args:
+            config: Agent configuration for the run.
+            **params: Keyword arguments for the runner (for the default
+                runner, those of ``execute_installation_process``).
+
+        Returns:
+            Job: The job to poll; check ``status`` and ``log``.
+        """
+
+        config = dict(config or {})
+        key = job_key(config, params)
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            existing = self._jobs.get(self._by_key.get(key, ""))
+            if existing is not None and not self._expired(existing, now):
+                return existing
+
+            job = Job(id=f"job-{next(self._ids)}", key=key, params=params)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+        self._pool.submit(self._execute, job, config)
+        return job
+
+    def _execute(self, job: Job, config: Dict) -> None:
+        job.started_at = time.time()
+        events.run_logged(job.log, self.runner, config, job.params)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of jobs per status."""
+
+        counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        for job in self.jobs():
+            counts[job.status] += 1
+        return counts
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
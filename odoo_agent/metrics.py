@@ -0,0 +1,258 @@
+"""Lightweight span/event instrumentation for the installer.
+
+Code wraps interesting work in :func:`span`; attributes such as bytes
+downloaded or files extracted are attached with :meth:`Span.set` and
+:meth:`Span.add`. Finished spans and :func:`event` records are handed to
+every registered sink. With no sink registered, :func:`span` yields a
+shared no-op object and the overhead is a single list check.
+
+Two sinks are provided: :class:`JsonLinesSink` appends one JSON object per
+record, and :class:`PrometheusTextfileSink` keeps per-span aggregates and
+rewrites a node_exporter textfile atomically. Anything with a
+``write(record)`` method can be registered with :func:`add_sink`.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Protocol
+
+
+class Sink(Protocol):
+    def write(self, record: Dict) -> None: ...
+
+
+_sinks: List[Sink] = []
+_configured: Dict[str, Sink] = {}
+_sinks_lock = threading.Lock()
+
+
+class Span:
+    """An in-progress timed operation."""
+
+    __slots__ = ("name", "attrs", "start", "wall_start")
+
+    def __init__(self, name: str, attrs: Dict):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+
+    def set(self, **attrs) -> None:
+        """Set attributes on the span."""
+
+        self.attrs.update(attrs)
+
+    def add(self, key: str, amount: float = 1) -> None:
+        """Increment a numeric attribute."""
+
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def add(self, key: str, amount: float = 1) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+def enabled() -> bool:
+    """Return True if at least one sink is registered."""
+
+    return bool(_sinks)
+
+
+def add_sink(sink: Sink) -> None:
+    with _sinks_lock:
+        _sinks.append(sink)
+
+
+def remove_sink(sink: Sink) -> None:
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def _emit(record: Dict) -> None:
+    for sink in list(_sinks):
+        try:
+            sink.write(record)
+        except Exception as exc:  # pragma: no cover - sinks must not break installs
+            print(f"Metrics sink {sink!r} failed: {exc}")
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs) -> Iterator:
+    """Time the enclosed block and report it to the registered sinks.
+
+    The record carries ``duration`` in seconds, ``status`` (``"ok"`` or
+    ``"error"``), every attribute, and ``throughput`` in bytes per second
+    when a ``bytes`` attribute was set.
+    """
+
+    if not _sinks:
+        yield NULL_SPAN
+        return
+
+    current = Span(name, attrs)
+    status = "ok"
+    try:
+        yield current
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - current.start
+        record = {
+            "type": "span",
+            "name": name,
+            "timestamp": current.wall_start,
+            "duration": duration,
+            "status": status,
+        }
+        record.update(current.attrs)
+        if isinstance(record.get("bytes"), (int, float)) and duration > 0:
+            record["throughput"] = record["bytes"] / duration
+        _emit(record)
+
+
+def traced(name: str) -> Callable:
+    """Decorator running the wrapped function inside :func:`span`.
+
+    Functions following the package's ``bool`` / ``(bool, value)`` return
+    convention also get a ``success`` attribute.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _sinks:
+                return func(*args, **kwargs)
+            with span(name) as current:
+                result = func(*args, **kwargs)
+                flag = result[0] if isinstance(result, tuple) and result else result
+                if isinstance(flag, bool):
+                    current.set(success=flag)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def event(name: str, **attrs) -> None:
+    """Report a point-in-time event to the registered sinks."""
+
+    if not _sinks:
+        return
+    record = {"type": "event", "name": name, "timestamp": time.time()}
+    record.update(attrs)
+    _emit(record)
+
+
+class JsonLinesSink:
+    """Append every record as one JSON line to ``path``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, record: Dict) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class PrometheusTextfileSink:
+    """Aggregate spans into a Prometheus textfile-collector file.
+
+    For every span name this exports a duration sum and count, an error
+    count, and a ``_total`` counter for each attribute listed in
+    ``counters``. The file is rewritten atomically after each span so the
+    collector never reads a partial file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        prefix: str = "odoo_agent",
+        counters: Iterable[str] = ("bytes", "files_extracted", "segments"),
+    ):
+        self.path = path
+        self.prefix = prefix
+        self.counters = tuple(counters)
+        self._lock = threading.Lock()
+        self._durations: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+        self._totals: Dict[tuple, float] = defaultdict(float)
+        self._errors: Dict[str, int] = defaultdict(int)
+
+    def write(self, record: Dict) -> None:
+        if record.get("type") != "span":
+            return
+        name = record["name"].replace(".", "_").replace("-", "_")
+        with self._lock:
+            stats = self._durations[name]
+            stats[0] += record["duration"]
+            stats[1] += 1
+            if record["status"] != "ok":
+                self._errors[name] += 1
+            for key in self.counters:
+                value = record.get(key)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self._totals[(name, key)] += value
+            self._flush()
+
+    def _flush(self) -> None:
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_span_duration_seconds Time spent in instrumented steps.",
+            f"# TYPE {p}_span_duration_seconds summary",
+        ]
+        for name, (total, count) in sorted(self._durations.items()):
+            lines.append(f'{p}_span_duration_seconds_sum{{span="{name}"}} {total}')
+            lines.append(f'{p}_span_duration_seconds_count{{span="{name}"}} {count}')
+        lines.append(f"# TYPE {p}_span_errors_total counter")
+        for name in sorted(self._durations):
+            lines.append(f'{p}_span_errors_total{{span="{name}"}} {self._errors[name]}')
+        # Samples of one metric family must be contiguous, so group by key.
+        for (name, key), value in sorted(self._totals.items(), key=lambda i: i[0][::-1]):
+            lines.append(f'{p}_{key}_total{{span="{name}"}} {value}')
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.path)
+
+
+def configure(
+    jsonl_path: Optional[str] = None,
+    prometheus_path: Optional[str] = None,
+) -> None:
+    """Register file sinks once per path (safe to call from every agent)."""
+
+    with _sinks_lock:
+        for path, factory in (
+            (jsonl_path, JsonLinesSink),
+            (prometheus_path, PrometheusTextfileSink),
+        ):
+            if path and path not in _configured:
+                _configured[path] = factory(path)
+                _sinks.append(_configured[path])
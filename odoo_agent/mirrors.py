@@ -0,0 +1,170 @@
+"""Concurrent probing and ranking of archive mirrors.
+
+Each candidate source is probed in parallel with a small ``Range`` request
+that measures the time to the response headers (latency) and the rate at
+which the first ``probe_bytes`` arrive (throughput). Sources are ranked by
+the estimated time to fetch the whole archive; unreachable ones sort last.
+
+Mirrors that report the same archive kind, size and strong ``ETag`` as
+the best source are treated as serving identical bytes, so the ranged
+downloader can move a failing segment to one of them mid-transfer. A size
+match alone is not enough: two branch snapshots can share a size.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import requests
+
+from . import metrics
+from .cache import CHUNK_SIZE
+from .events import LogFn
+from .extract import archive_kind
+from .ranged import make_session
+
+DEFAULT_PROBE_BYTES = 256 * 1024
+DEFAULT_PROBE_TIMEOUT = 10.0
+# Used to weigh latency against throughput when no source reports a size.
+ASSUMED_ARCHIVE_SIZE = 256 * 1024 * 1024
+
+
+@dataclass
+class Probe:
+    """Measurements for one candidate source."""
+
+    url: str
+    ok: bool = False
+    latency: float = math.inf
+    throughput: float = 0.0
+    size: Optional[int] = None
+    ranges: bool = False
+    etag: Optional[str] = None
+    error: str = ""
+
+    @property
+    def kind(self) -> Optional[str]:
+        return archive_kind(self.url.split("?", 1)[0])
+
+    def estimate(self, size: Optional[int] = None) -> float:
+        """Return the expected seconds to download ``size`` bytes from here."""
+
+        if not self.ok or self.throughput <= 0:
+            return math.inf
+        size = self.size or size or ASSUMED_ARCHIVE_SIZE
+        return self.latency + size / self.throughput
+
+
+def probe_mirror(
+    url: str,
+    session: Optional[requests.Session] = None,
+    probe_bytes: int = DEFAULT_PROBE_BYTES,
+    timeout: float = DEFAULT_PROBE_TIMEOUT,
+) -> Probe:
+    """Fetch the first ``probe_bytes`` of ``url`` and time the transfer."""
+
+    http = session or requests
+    result = Probe(url)
+    started = time.monotonic()
+    try:
+        with http.get(
+            url,
+            headers={"Range": f"bytes=0-{probe_bytes - 1}"},
+            stream=True,
+            timeout=timeout,
+        ) as response:
+            response.raise_for_status()
+            headers_at = time.monotonic()
+            received = 0
+            for chunk in response.iter_content(chunk_size=min(CHUNK_SIZE, probe_bytes)):
+                received += len(chunk)
+                if received >= probe_bytes:
+                    break
+            finished = time.monotonic()
+            result.etag = response.headers.get("ETag")
+
+            total = re.search(r"/(\d+)$", response.headers.get("Content-Range", ""))
+            length = response.headers.get("Content-Length", "")
+            if response.status_code == 206 and total:
+                result.size = int(total.group(1))
+                result.ranges = True
+            elif response.status_code == 200 and length.isdigit():
+                result.size = int(length)
+    except requests.exceptions.RequestException as exc:
+        result.error = str(exc)
+        return result
+
+    result.ok = received > 0
+    result.latency = headers_at - started
+    # Floor the window so a probe served from one buffered read is not
+    # mistaken for infinite bandwidth.
+    result.throughput = received / max(finished - headers_at, 1e-3)
+    return result
+
+
+def rank_mirrors(
+    urls: Sequence[str],
+    session: Optional[requests.Session] = None,
+    probe_bytes: int = DEFAULT_PROBE_BYTES,
+    timeout: float = DEFAULT_PROBE_TIMEOUT,
+    log: LogFn = print,
+) -> List[Probe]:
+    """Probe ``urls`` concurrently and return them fastest first.
+
+    Ties (and unreachable sources) keep the caller's order, so the list
+    also expresses a preference.
+    """
+
+    session = session or make_session(len(urls))
+    with metrics.span("download.probe", sources=len(urls)):
+        with ThreadPoolExecutor(max_workers=max(1, len(urls))) as pool:
+            probes = list(
+                pool.map(
+                    lambda url: probe_mirror(url, session, probe_bytes, timeout), urls
+                )
+            )
+    size = max((p.size for p in probes if p.ok and p.size), default=None)
+    ranked = sorted(probes, key=lambda p: (not p.ok, p.estimate(size)))
+    for rank, p in enumerate(ranked, 1):
+        metrics.event(
+            "download.probe.result",
+            url=p.url,
+            rank=rank,
+            ok=p.ok,
+            latency=p.latency if p.ok else None,
+            throughput=p.throughput,
+        )
+        if p.ok:
+            log(
+                f"Mirror {rank}: {p.url} ({p.latency * 1000:.0f} ms, "
+                f"{p.throughput / 1024 / 1024:.1f} MiB/s)"
+            )
+        else:
+            log(f"Mirror {rank}: {p.url} unavailable ({p.error or 'empty response'})")
+    return ranked
+
+
+def equivalent_mirrors(best: Probe, probes: Sequence[Probe]) -> List[str]:
+    """Return other reachable sources serving the same bytes as ``best``.
+
+    Only a matching strong ``ETag`` vouches for identical content; weak
+    validators (``W/``) and missing ones rule failover out.
+    """
+
+    if not best.size or not best.etag or best.etag.startswith("W/"):
+        return []
+    return [
+        p.url
+        for p in probes
+        if p is not best
+        and p.ok
+        and p.ranges
+        and p.size == best.size
+        and p.kind == best.kind
+        and p.etag == best.etag
+    ]
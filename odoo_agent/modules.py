@@ -0,0 +1,123 @@
+"""Odoo module manifests and dependency resolution.
+
+Used to extract only the core ``odoo/`` package plus the addons a
+deployment actually needs, instead of the several hundred modules shipped
+in the ``addons/`` directory of an Odoo archive.
+"""
+
+from __future__ import annotations
+
+import ast
+import re
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Set
+
+from .events import LogFn
+
+MANIFEST_NAMES = ("__manifest__.py", "__openerp__.py")
+# Loaded by ``odoo-bin`` whatever is installed (its ``server_wide_modules``).
+SERVER_WIDE_MODULES = ("base", "web")
+
+
+def parse_manifest(source: str) -> Dict:
+    """Parse the dictionary literal in an Odoo ``__manifest__.py`` file."""
+
+    manifest = ast.literal_eval(source.strip())
+    if not isinstance(manifest, dict):
+        raise ValueError("Manifest does not contain a dictionary literal.")
+    return manifest
+
+
+def source_prefix(names: Iterable[str]) -> str:
+    """Return the archive path prefix of the Odoo source root.
+
+    GitHub archives nest everything under a top-level directory such as
+    ``odoo-16.0/``; the root is the directory holding ``odoo-bin``.
+    """
+
+    candidates = [n[: -len("odoo-bin")] for n in names if n.endswith("odoo-bin")]
+    candidates = [c for c in candidates if c == "" or c.endswith("/")]
+    if not candidates:
+        return ""
+    return min(candidates, key=len)
+
+
+def dependency_closure(modules: Iterable[str], manifests: Dict[str, Dict]) -> Set[str]:
+    """Expand ``modules`` with every transitive ``depends`` entry.
+
+    Args:
+        modules: Requested module names.
+        manifests: Parsed manifests keyed by module name.
+
+    Returns:
+        Set[str]: Requested modules plus their dependencies. Names with no
+        known manifest are kept so the caller can report them.
+    """
+
+    closure: Set[str] = set()
+    queue = deque(modules)
+    while queue:
+        name = queue.popleft()
+        if name in closure:
+            continue
+        closure.add(name)
+        queue.extend(manifests.get(name, {}).get("depends", []))
+    return closure
+
+
+def select_archive_members(
+    names: List[str],
+    read: Callable[[str], bytes],
+    modules: Iterable[str],
+    log: LogFn = print,
+) -> List[str]:
+    """Return the archive members needed for ``modules``.
+
+    The selection keeps everything outside ``<root>/addons/`` (the core
+    ``odoo`` package, ``odoo-bin``, ``requirements.txt`` and so on) plus the
+    addon directories in the dependency closure of ``modules`` and of the
+    :data:`SERVER_WIDE_MODULES`, which the server loads at start-up.
+
+    Args:
+        names: All member names of the archive.
+        read: Callable returning the bytes of a member by name.
+        modules: Requested module names.
+    """
+
+    prefix = source_prefix(names)
+    addon_re = re.compile(re.escape(prefix) + r"addons/([^/]+)(?:/|$)")
+    core_re = re.compile(re.escape(prefix) + r"odoo/addons/([^/]+)/")
+
+    manifests: Dict[str, Dict] = {}
+    core_modules: Set[str] = set()
+    for name in names:
+        basename = name.rsplit("/", 1)[-1]
+        if basename not in MANIFEST_NAMES:
+            continue
+        core_match = core_re.match(name)
+        addon_match = addon_re.match(name)
+        match = core_match or addon_match
+        if match is None or name != match.group(0) + basename:
+            continue
+        if core_match:
+            core_modules.add(match.group(1))
+        manifests[match.group(1)] = parse_manifest(read(name).decode("utf-8"))
+
+    server_wide = [name for name in SERVER_WIDE_MODULES if name in manifests]
+    closure = dependency_closure([*modules, *server_wide], manifests)
+    unknown = sorted(closure - set(manifests))
+    if unknown:
+        log(f"Warning: no manifest found for modules: {', '.join(unknown)}")
+
+    wanted = closure - core_modules
+    log(
+        f"Selected {len(wanted)} addons ({len(closure)} modules including "
+        "core dependencies) for extraction."
+    )
+
+    selected = []
+    for name in names:
+        match = addon_re.match(name)
+        if match is None or match.group(1) in wanted:
+            selected.append(name)
+    return selected
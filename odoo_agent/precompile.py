@@ -0,0 +1,167 @@
+"""Bytecode precompilation and import warming for Odoo trees.
+
+The first boot of a fresh tree compiles thousands of modules under
+``odoo/`` and ``addons/`` before the server answers. :func:`precompile_tree`
+does that work ahead of time with ``compileall`` on a process pool, using
+the interpreter that will run ``odoo-bin`` so the ``.pyc`` files match its
+cache tag.
+
+Trees in the shared source store never change, so their bytecode uses
+``unchecked-hash`` pycs that skip the per-import source check entirely.
+Other trees keep timestamp pycs, which stay correct when files are edited
+or updated in place.
+
+:func:`measure_cold_start` times importing the core packages in a fresh
+interpreter; :func:`prepare_tree` records it before and after compiling so
+the gain shows up in the logs and metrics. Those imports also warm the page
+cache for the real server start.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from typing import Dict, Optional, Sequence
+
+from . import metrics
+from .commands import run_command
+from .events import LogFn
+
+COMPILE_DIRS = ("odoo", "addons")
+WARM_MODULES = ("odoo", "odoo.cli", "odoo.addons.base", "odoo.http")
+COLD_START_TIMEOUT = 300.0
+
+_TIMER = (
+    "import importlib, sys, time\n"
+    "start = time.perf_counter()\n"
+    "for name in sys.argv[1:]:\n"
+    "    importlib.import_module(name)\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def precompile_tree(
+    root: str,
+    python: Optional[str] = None,
+    workers: int = 0,
+    unchecked: bool = False,
+    log: LogFn = print,
+) -> bool:
+    """Compile the Python sources of the Odoo tree at ``root``.
+
+    Args:
+        root: Odoo source root (the directory holding ``odoo-bin``).
+        python: Interpreter that will run Odoo. Defaults to this one.
+        workers: ``compileall`` worker processes; 0 uses every CPU.
+        unchecked: Write ``unchecked-hash`` pycs. Only for trees that are
+            never modified, such as source store entries.
+
+    Returns:
+        bool: True if every file compiled.
+    """
+
+    # Relative to ``root``, the working directory of the compile run.
+    targets = [name for name in COMPILE_DIRS if os.path.isdir(os.path.join(root, name))]
+    if not targets:
+        log(f"No Python packages to precompile under {root}.")
+        return True
+
+    mode = "unchecked-hash" if unchecked else "timestamp"
+    args = [
+        python or sys.executable,
+        "-m",
+        "compileall",
+        "-q",
+        "-j",
+        str(workers),
+        "--invalidation-mode",
+        mode,
+        *targets,
+    ]
+    with metrics.span("precompile", mode=mode, workers=workers) as span:
+        ok = run_command(args, cwd=root, log=log)
+        span.set(success=ok)
+    if not ok:
+        # A few files (such as scripts for other Python versions) may not
+        # compile; Odoo never imports them, so this is only a warning.
+        log(f"Warning: some files under {root} could not be precompiled.")
+    return ok
+
+
+def measure_cold_start(
+    root: str,
+    python: Optional[str] = None,
+    modules: Sequence[str] = WARM_MODULES,
+    write_bytecode: bool = True,
+    log: LogFn = print,
+) -> Optional[float]:
+    """Return the seconds a fresh interpreter needs to import ``modules``.
+
+    ``write_bytecode=False`` runs with ``-B`` so measuring does not leave
+    pycs behind. Returns None when the imports fail, for example because
+    the Odoo requirements are not installed for ``python``.
+    """
+
+    args = [python or sys.executable]
+    if not write_bytecode:
+        args.append("-B")
+    args += ["-c", _TIMER, *modules]
+    try:
+        result = subprocess.run(
+            args,
+            cwd=root,
+            capture_output=True,
+            text=True,
+            timeout=COLD_START_TIMEOUT,
+        )
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        log(f"Could not time Odoo imports: {exc}")
+        return None
+    if result.returncode != 0:
+        last_line = (result.stderr.strip().splitlines() or ["unknown error"])[-1]
+        log(f"Could not time Odoo imports: {last_line}")
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def prepare_tree(
+    root: str,
+    python: Optional[str] = None,
+    workers: int = 0,
+    unchecked: bool = False,
+    warm: bool = False,
+    precompile: bool = True,
+    log: LogFn = print,
+) -> Dict[str, Optional[float]]:
+    """Precompile ``root`` and optionally warm it with the core imports.
+
+    With ``warm`` the import time is measured before compiling (without
+    writing bytecode) and again afterwards. ``precompile=False`` only warms,
+    for trees whose bytecode was built elsewhere (the source store).
+
+    Returns:
+        Dict[str, Optional[float]]: ``cold_start_before`` and
+        ``cold_start_after`` in seconds (None when not measured).
+    """
+
+    timings: Dict[str, Optional[float]] = {
+        "cold_start_before": None,
+        "cold_start_after": None,
+    }
+    if warm:
+        timings["cold_start_before"] = measure_cold_start(
+            root, python, write_bytecode=False, log=log
+        )
+    if precompile:
+        precompile_tree(
+            root, python=python, workers=workers, unchecked=unchecked, log=log
+        )
+    if warm:
+        timings["cold_start_after"] = measure_cold_start(root, python, log=log)
+
+    before, after = timings["cold_start_before"], timings["cold_start_after"]
+    if before is not None and after is not None:
+        metrics.event("precompile.cold_start", before=before, after=after)
+        log(f"Odoo import time: {before:.2f}s before precompiling, {after:.2f}s after.")
+    return timings
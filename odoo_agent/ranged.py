@@ -0,0 +1,279 @@
+"""Parallel, resumable HTTP Range download engine.
+
+The archive is split into fixed-size segments that are fetched over a
+pooled :class:`requests.Session` by a small thread pool and written into a
+preallocated file at their final offsets. A sidecar manifest
+(``<path>.manifest.json``) records finished segments so an interrupted
+download resumes where it stopped instead of restarting from zero.
+
+Servers that do not advertise ``Accept-Ranges: bytes`` or a
+``Content-Length`` fall back to a single streamed request.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .cache import CHUNK_SIZE, HTTP_TIMEOUT, stream_to_file
+from .events import LogFn
+
+
+DEFAULT_WORKERS = 4
+DEFAULT_SEGMENT_SIZE = 8 * 1024 * 1024
+MAX_SEGMENT_RETRIES = 3
+
+_seek_lock = threading.Lock()
+
+
+def make_session(workers: int = DEFAULT_WORKERS) -> requests.Session:
+    """Return a session whose connection pool fits ``workers`` threads."""
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _pwrite(fd: int, data: bytes, offset: int) -> None:
+    """Write ``data`` at ``offset`` without moving a shared file position."""
+
+    if hasattr(os, "pwrite"):
+        while data:
+            written = os.pwrite(fd, data, offset)
+            data = data[written:]
+            offset += written
+        return
+
+    # Windows has no pwrite; serialize seek+write instead.
+    with _seek_lock:
+        os.lseek(fd, offset, os.SEEK_SET)
+        while data:
+            data = data[os.write(fd, data):]
+
+
+def _segments(size: int, segment_size: int) -> List[Tuple[int, int]]:
+    """Return inclusive ``(start, end)`` byte ranges covering ``size`` bytes."""
+
+    return [
+        (start, min(start + segment_size, size) - 1)
+        for start in range(0, size, segment_size)
+    ]
+
+
+def _manifest_path(path: str) -> str:
+    return path + ".manifest.json"
+
+
+def _load_manifest(path: str, url: str, size: int, validator: Optional[str]) -> Optional[Dict]:
+    """Return the resume manifest for ``path`` if it matches the remote file."""
+
+    try:
+        with open(_manifest_path(path), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if (
+        manifest.get("url") != url
+        or manifest.get("size") != size
+        or manifest.get("validator") != validator
+        or not os.path.exists(path)
+        or os.path.getsize(path) != size
+    ):
+        return None
+    return manifest
+
+
+def _save_manifest(path: str, manifest: Dict) -> None:
+    tmp = _manifest_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, _manifest_path(path))
+
+
+def _preallocate(path: str, size: int) -> None:
+    with open(path, "wb") as f:
+        if hasattr(os, "posix_fallocate") and size:
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                pass
+        f.truncate(size)
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def supports_ranges(headers) -> bool:
+    """Return True if response ``headers`` allow a ranged download."""
+
+    return (
+        headers.get("Accept-Ranges", "").lower() == "bytes"
+        and headers.get("Content-Length", "").isdigit()
+        and "Content-Encoding" not in headers
+    )
+
+
+def download_ranged(
+    url: str,
+    path: str,
+    size: int,
+    validator: Optional[str] = None,
+    workers: int = DEFAULT_WORKERS,
+    segment_size: int = DEFAULT_SEGMENT_SIZE,
+    session: Optional[requests.Session] = None,
+    mirrors: Sequence[str] = (),
+    log: LogFn = print,
+) -> str:
+    """Download ``size`` bytes of ``url`` into ``path`` with Range requests.
+
+    Args:
+        url: Resource URL (ideally the final URL after redirects).
+        path: Destination file; preallocated to ``size`` bytes.
+        size: Total length reported by the server.
+        validator: ``ETag`` or ``Last-Modified`` value; a manifest recorded
+            for a different validator is discarded instead of resumed.
+        workers: Number of concurrent segment fetches.
+        segment_size: Bytes per Range request.
+        session: Optional pooled session; one is created if omitted.
+        mirrors: URLs serving the same bytes (see
+            :func:`~odoo_agent.mirrors.equivalent_mirrors`). When a segment
+            fails, it continues from its current offset on the next mirror,
+            and later segments start there too.
+        log: Receives progress messages, also from the segment threads.
+
+    Returns:
+        str: SHA-256 digest of the completed file.
+    """
+
+    session = session or make_session(workers)
+    manifest = _load_manifest(path, url, size, validator)
+    if manifest is None:
+        _preallocate(path, size)
+        manifest = {"url": url, "size": size, "validator": validator, "done": []}
+        _save_manifest(path, manifest)
+    else:
+        log(f"Resuming download of {url}: {len(manifest['done'])} segments already done.")
+
+    done = set(manifest["done"])
+    pending = [seg for seg in _segments(size, segment_size) if seg[0] not in done]
+    lock = threading.Lock()
+    sources = [url, *mirrors]
+    attempts = MAX_SEGMENT_RETRIES + len(mirrors)
+    # Set when a segment fails for good, so in-flight segments stop early.
+    aborted = threading.Event()
+
+    fd = os.open(path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+    try:
+
+        def fetch_segment(segment: Tuple[int, int]) -> None:
+            start, end = segment
+            offset = start
+            for attempt in range(1, attempts + 1):
+                source = sources[0]
+                headers = {"Range": f"bytes={offset}-{end}"}
+                # Validators are per server; mirrors were matched to the
+                # primary by ETag when they were probed.
+                if validator and source == url:
+                    headers["If-Range"] = validator
+                try:
+                    with session.get(
+                        source, headers=headers, stream=True, timeout=HTTP_TIMEOUT
+                    ) as response:
+                        if response.status_code != 206:
+                            raise requests.exceptions.HTTPError(
+                                f"Expected 206 for range {offset}-{end}, got "
+                                f"{response.status_code}",
+                                response=response,
+                            )
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            if aborted.is_set():
+                                # Not recorded as done; a resume refetches it.
+                                return
+                            _pwrite(fd, chunk, offset)
+                            offset += len(chunk)
+                    if offset != end + 1:
+                        raise requests.exceptions.ChunkedEncodingError(
+                            f"Range {start}-{end} ended early at {offset}"
+                        )
+                    break
+                except requests.exceptions.RequestException:
+                    if attempt == attempts:
+                        raise
+                    with lock:
+                        if len(sources) > 1 and sources[0] == source:
+                            sources.append(sources.pop(0))
+                            log(f"Failing over from {source} to {sources[0]}.")
+
+            with lock:
+                manifest["done"].append(start)
+                _save_manifest(path, manifest)
+
+        remaining = sum(end - start + 1 for start, end in pending)
+        with metrics.span(
+            "download.ranged", workers=workers, segments=len(pending), bytes=remaining
+        ), ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            try:
+                for future in [pool.submit(fetch_segment, seg) for seg in pending]:
+                    future.result()
+            except BaseException:
+                aborted.set()
+                pool.shutdown(wait=True, cancel_futures=True)
+                raise
+    finally:
+        os.close(fd)
+
+    os.remove(_manifest_path(path))
+    return _sha256_file(path)
+
+
+def download_response(
+    response: requests.Response,
+    path: str,
+    workers: int = DEFAULT_WORKERS,
+    session: Optional[requests.Session] = None,
+    mirrors: Sequence[str] = (),
+    log: LogFn = print,
+) -> str:
+    """Save an open ``200`` response to ``path`` and return its SHA-256.
+
+    When the server supports ranges and ``workers`` is greater than one (or
+    ``mirrors`` to fail over to are given) the streamed body is abandoned in
+    favour of :func:`download_ranged`; otherwise the body is streamed
+    sequentially.
+    """
+
+    if (workers <= 1 and not mirrors) or not supports_ranges(response.headers):
+        return stream_to_file(response, path)
+
+    size = int(response.headers["Content-Length"])
+    validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+    url = response.url
+    response.close()
+    log(f"Downloading {size} bytes from {url} with {workers} parallel ranges...")
+    return download_ranged(
+        url,
+        path,
+        size,
+        validator=validator,
+        workers=workers,
+        session=session,
+        mirrors=[m for m in mirrors if m != url],
+        log=log,
+    )
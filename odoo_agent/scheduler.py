@@ -0,0 +1,218 @@
+"""Dependency-graph step scheduler for the installation workflow.
+
+Steps declare the steps they depend on and run on a thread pool as soon as
+those dependencies have succeeded, so independent work overlaps. A step
+fails by raising or by returning ``False`` (the convention used by the
+rest of the package); every step that transitively depends on it is then
+cancelled instead of run. After a run, :meth:`StepGraph.report` describes
+each step's timing and the critical path that bounded the total time.
+
+Steps registered with a ``key`` are memoized in an optional
+:class:`~odoo_agent.checkpoint.Checkpoint`: the key and the values of the
+step's dependencies are fingerprinted, and a step whose fingerprint matches
+its last successful run is skipped and reuses that run's value. A changed
+value invalidates every step downstream of it.
+
+Messages go to the graph's ``log`` callable; with a ``run_log``, each step's
+status changes are also recorded there as ``"step"`` events.
+"""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from . import metrics
+from .checkpoint import Checkpoint, fingerprint
+from .events import LogFn, RunLog
+
+OK = "ok"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+@dataclass
+class Step:
+    """A unit of work in a :class:`StepGraph`."""
+
+    name: str
+    func: Callable[[Dict[str, Any]], Any]
+    deps: Sequence[str] = ()
+    key: Optional[Callable[[Dict[str, Any]], Any]] = None
+    check: Optional[Callable[[Any], bool]] = None
+
+
+@dataclass
+class StepResult:
+    """Outcome and timing of one step."""
+
+    name: str
+    status: str
+    value: Any = None
+    error: Optional[BaseException] = None
+    start: float = 0.0
+    end: float = 0.0
+    cached: bool = False
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class StepGraph:
+    """Runs :class:`Step` objects concurrently in dependency order."""
+
+    max_workers: int = 4
+    checkpoint: Optional[Checkpoint] = None
+    log: LogFn = print
+    run_log: Optional[RunLog] = None
+    steps: Dict[str, Step] = field(default_factory=dict)
+    results: Dict[str, StepResult] = field(default_factory=dict)
+    started_at: float = 0.0
+
+    def add(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Any],
+        deps: Sequence[str] = (),
+        key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        check: Optional[Callable[[Any], bool]] = None,
+    ) -> None:
+        """Register a step.
+
+        ``func`` receives a dict mapping each dependency name to the value it
+        returned. With a ``checkpoint``, ``key`` makes the step resumable: it
+        receives the same dict and returns the JSON-serializable inputs that
+        determine the step's result, or None when they cannot be known (the
+        step then runs). Keys should be cheap and free of side effects;
+        anything that has to ask the network belongs in a step of its own
+        whose value the key then depends on. ``check`` may reject a recorded
+        value whose outputs no longer exist; values must be JSON-serializable.
+        """
+
+        for dep in deps:
+            if dep not in self.steps:
+                raise ValueError(f"Step {name!r} depends on unknown step {dep!r}.")
+        self.steps[name] = Step(name, func, tuple(deps), key=key, check=check)
+
+    def _emit(self, kind: str, **data) -> None:
+        if self.run_log is not None:
+            self.run_log.emit(kind, **data)
+
+    def _run_step(self, step: Step) -> StepResult:
+        inputs = {dep: self.results[dep].value for dep in step.deps}
+        self._emit("step", name=step.name, status="running")
+        start = time.perf_counter()
+        digest = None
+        try:
+            # Key and check functions may fail like the step itself (they
+            # read files and archives); that fails this step, not the run.
+            key = None
+            if self.checkpoint is not None and step.key is not None:
+                key = step.key(inputs)
+            if key is not None:
+                digest = fingerprint({"key": key, "deps": inputs})
+                hit, value = self.checkpoint.get(step.name, digest)
+                if hit and (step.check is None or step.check(value)):
+                    self.log(
+                        f"Step {step.name} is unchanged since the last run; "
+                        "skipping it."
+                    )
+                    end = time.perf_counter()
+                    self._emit(
+                        "step",
+                        name=step.name,
+                        status=OK,
+                        duration=end - start,
+                        cached=True,
+                    )
+                    return StepResult(
+                        step.name, OK, value=value, start=start, end=end, cached=True
+                    )
+            with metrics.span(f"step.{step.name}") as span:
+                value = step.func(inputs)
+                span.set(success=value is not False)
+        except Exception as exc:
+            self.log(f"Step {step.name} raised: {exc}")
+            if self.checkpoint is not None and step.key is not None:
+                self.checkpoint.discard(step.name)
+            end = time.perf_counter()
+            self._emit("step", name=step.name, status=FAILED, duration=end - start)
+            return StepResult(step.name, FAILED, error=exc, start=start, end=end)
+        end = time.perf_counter()
+        status = FAILED if value is False else OK
+        if digest is not None and status == OK:
+            self.checkpoint.record(step.name, digest, value)
+        elif self.checkpoint is not None and step.key is not None:
+            # Failed, or ran without a key: a recorded value may be stale.
+            self.checkpoint.discard(step.name)
+        self._emit("step", name=step.name, status=status, duration=end - start)
+        return StepResult(step.name, status, value=value, start=start, end=end)
+
+    def run(self) -> bool:
+        """Run every step and return True if all of them succeeded."""
+
+        self.results = {}
+        self.started_at = time.perf_counter()
+        pending = dict(self.steps)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name, step in list(pending.items()):
+                    dep_status = [self.results.get(d) for d in step.deps]
+                    if any(r is not None and r.status != OK for r in dep_status):
+                        now = time.perf_counter()
+                        self.results[name] = StepResult(
+                            name, CANCELLED, start=now, end=now
+                        )
+                        self.log(f"Step {name} cancelled because a dependency failed.")
+                        self._emit("step", name=name, status=CANCELLED)
+                        del pending[name]
+                    elif all(r is not None for r in dep_status):
+                        future = pool.submit(self._run_step, step)
+                        running[future] = name
+                        del pending[name]
+
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    result = future.result()
+                    self.results[result.name] = result
+
+        return all(r.status == OK for r in self.results.values())
+
+    def critical_path(self) -> List[str]:
+        """Return the chain of steps that determined the total run time."""
+
+        if not self.results:
+            return []
+        name = max(self.results, key=lambda n: self.results[n].end)
+        path = [name]
+        while self.steps[name].deps:
+            name = max(self.steps[name].deps, key=lambda d: self.results[d].end)
+            path.append(name)
+        return list(reversed(path))
+
+    def report(self) -> str:
+        """Return a human-readable timing report of the last run."""
+
+        lines = ["Step timings (offset from start, duration, status):"]
+        for result in sorted(self.results.values(), key=lambda r: r.start):
+            lines.append(
+                f"  {result.name:<12} +{result.start - self.started_at:7.3f}s "
+                f"{result.duration:7.3f}s  {result.status}"
+                + (" (cached)" if result.cached else "")
+            )
+        path = self.critical_path()
+        if not path:
+            lines.append("No steps ran.")
+            return "\n".join(lines)
+        total = self.results[path[-1]].end - self.started_at
+        lines.append(f"Critical path: {' -> '.join(path)} ({total:.3f}s)")
+        return "\n".join(lines)
@@ -0,0 +1,359 @@
+"""Incremental semantic index over Odoo records.
+
+Natural-language questions about Odoo data are answered from a local
+vector index instead of scanning the database. :class:`SemanticIndex`
+keeps one L2-normalized embedding per record in a memory-mapped float32
+matrix (``vectors.f32``) with sidecar arrays for the record ids
+(``ids.i64``) and their ``write_date`` (``stamps.f64``), plus a small
+``meta.json``. Search is a blocked matrix product of the matrix with the
+query vectors followed by a partial sort, so hundreds of thousands of
+records are searched in milliseconds without loading the file into memory.
+
+:meth:`SemanticIndex.refresh` reads only records whose ``write_date`` is
+newer than the last sync and re-embeds the ones that actually changed;
+:meth:`SemanticIndex.prune` drops rows of deleted records.
+
+NumPy is an optional dependency needed only by this module. Embeddings
+come from :class:`GeminiEmbedder` or, for tests and offline use, from the
+deterministic :class:`HashingEmbedder`.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import os
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import requests
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from .events import LogFn
+from .generation import DEFAULT_ENDPOINT, TokenBucket
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-004"
+EMBED_BATCH = 100
+SEARCH_BLOCK_ROWS = 65536
+INITIAL_CAPACITY = 1024
+ODOO_DATETIME = "%Y-%m-%d %H:%M:%S"
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("The semantic index needs NumPy: pip install numpy")
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def parse_write_date(value: str) -> float:
+    """Return the epoch seconds of an Odoo ``write_date`` string (UTC)."""
+
+    parsed = datetime.datetime.strptime(value[:19], ODOO_DATETIME)
+    return parsed.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words embedder for tests and offline use."""
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 256):
+        _require_numpy()
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                matrix[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        return matrix
+
+
+class GeminiEmbedder:
+    """Gemini ``batchEmbedContents`` client sharing the generation rate limits."""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = DEFAULT_EMBEDDING_MODEL,
+        endpoint: str = DEFAULT_ENDPOINT,
+        requests_per_minute: float = 60,
+        dim: int = 768,
+        timeout: float = 60.0,
+    ):
+        _require_numpy()
+        self.api_key = api_key
+        self.model = model
+        self.name = f"gemini:{model}"
+        self.endpoint = endpoint.rstrip("/")
+        self.dim = dim
+        self.timeout = timeout
+        self.bucket = TokenBucket(requests_per_minute / 60.0)
+        self.session = requests.Session()
+        # A header keeps the key out of URLs, which end up in error messages.
+        self.session.headers["x-goog-api-key"] = api_key
+
+    def embed(self, texts: Sequence[str]):
+        url = f"{self.endpoint}/models/{self.model}:batchEmbedContents"
+        rows: List[List[float]] = []
+        for i in range(0, len(texts), EMBED_BATCH):
+            body = {
+                "requests": [
+                    {
+                        "model": f"models/{self.model}",
+                        "content": {"parts": [{"text": text}]},
+                    }
+                    for text in texts[i : i + EMBED_BATCH]
+                ]
+            }
+            self.bucket.acquire()
+            response = self.session.post(url, json=body, timeout=self.timeout)
+            response.raise_for_status()
+            rows.extend(item["values"] for item in response.json()["embeddings"])
+        return np.asarray(rows, dtype=np.float32).reshape(len(texts), self.dim)
+
+
+class SemanticIndex:
+    """Memory-mapped embedding index for one Odoo model."""
+
+    def __init__(self, path: str, embedder, model: str = "", log: LogFn = print):
+        _require_numpy()
+        self.log = log
+        self.path = path
+        self.embedder = embedder
+        self.model = model
+        os.makedirs(path, exist_ok=True)
+        self.meta = self._load_meta()
+        self._open(self.meta["capacity"])
+        self._rows = {
+            int(record_id): row
+            for row, record_id in enumerate(self.ids[: self.meta["count"]])
+            if record_id >= 0
+        }
+
+    # --- Storage -------------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load_meta(self) -> Dict:
+        try:
+            with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+        fresh = {
+            "dim": self.embedder.dim,
+            "embedder": self.embedder.name,
+            "model": self.model,
+            "count": 0,
+            "capacity": INITIAL_CAPACITY,
+            "last_sync": None,
+        }
+        if meta is None:
+            return fresh
+        if meta["dim"] != self.embedder.dim or meta["embedder"] != self.embedder.name:
+            self.log(f"Embedder changed; rebuilding semantic index at {self.path}.")
+            return fresh
+        return meta
+
+    def _open(self, capacity: int) -> None:
+        dim = self.meta["dim"]
+        layout = (
+            ("vectors.f32", np.float32, (capacity, dim)),
+            ("ids.i64", np.int64, (capacity,)),
+            ("stamps.f64", np.float64, (capacity,)),
+        )
+        arrays = []
+        for name, dtype, shape in layout:
+            path = self._file(name)
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            if self.meta["count"] == 0 and os.path.exists(path):
+                os.remove(path)
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            arrays.append(np.memmap(path, dtype=dtype, mode="r+", shape=shape))
+        self.vectors, self.ids, self.stamps = arrays
+        if self.meta["count"] == 0:
+            self.ids[:] = -1
+        self.meta["capacity"] = capacity
+
+    def _grow(self, needed: int) -> None:
+        capacity = self.meta["capacity"]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self.flush()
+        old_capacity = self.meta["capacity"]
+        del self.vectors, self.ids, self.stamps
+        self._open(capacity)
+        self.ids[old_capacity:] = -1
+
+    def flush(self) -> None:
+        """Write the arrays and metadata to disk."""
+
+        for array in (self.vectors, self.ids, self.stamps):
+            array.flush()
+        tmp = self._file(f"meta.json.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # --- Updates -------------------------------------------------------------
+
+    def upsert(self, records: Sequence[Tuple[int, float, str]]) -> int:
+        """Embed and store ``(record_id, stamp, text)`` rows; return the count."""
+
+        if not records:
+            return 0
+        vectors = _normalize(self.embedder.embed([text for _, _, text in records]))
+        new = sum(1 for record_id, _, _ in records if record_id not in self._rows)
+        self._grow(self.meta["count"] + new)
+        for (record_id, stamp, _), vector in zip(records, vectors):
+            row = self._rows.get(record_id)
+            if row is None:
+                row = self.meta["count"]
+                self.meta["count"] += 1
+                self._rows[record_id] = row
+            self.vectors[row] = vector
+            self.ids[row] = record_id
+            self.stamps[row] = stamp
+        return len(records)
+
+    def remove(self, record_ids: Iterable[int]) -> int:
+        removed = 0
+        for record_id in record_ids:
+            row = self._rows.pop(record_id, None)
+            if row is not None:
+                self.vectors[row] = 0.0
+                self.ids[row] = -1
+                removed += 1
+        return removed
+
+    def refresh(
+        self,
+        odoo,
+        fields: Sequence[str],
+        render: Callable[[Dict], str],
+        domain: Sequence = (),
+        page_size: int = 1000,
+    ) -> int:
+        """Re-embed records changed since the last sync.
+
+        Args:
+            odoo: Client with a ``search_read`` generator, such as
+                :class:`odoo_agent.rpc.OdooClient`.
+            fields: Fields needed by ``render``.
+            render: Turns a record into the text to embed.
+            domain: Extra domain restricting the indexed records.
+            page_size: Records per ``search_read`` round trip.
+
+        Returns:
+            int: Number of records (re-)embedded.
+        """
+
+        last_sync = self.meta.get("last_sync")
+        query = list(domain)
+        if last_sync:
+            # ``>=`` so records written in the same second are not missed;
+            # unchanged ones are skipped by their stored stamp below.
+            query.append(["write_date", ">=", last_sync])
+        wanted = sorted(set(fields) | {"id", "write_date"})
+
+        batch: List[Tuple[int, float, str]] = []
+        embedded = 0
+        newest = last_sync
+        for record in odoo.search_read(self.model, query, wanted, page_size=page_size):
+            write_date = record["write_date"]
+            stamp = parse_write_date(write_date)
+            row = self._rows.get(record["id"])
+            if newest is None or write_date > newest:
+                newest = write_date
+            if row is not None and self.stamps[row] == stamp:
+                continue
+            batch.append((record["id"], stamp, render(record)))
+            if len(batch) >= EMBED_BATCH * 4:
+                embedded += self.upsert(batch)
+                batch = []
+        embedded += self.upsert(batch)
+        self.meta["last_sync"] = newest
+        self.flush()
+        self.log(
+            f"Semantic index for {self.model}: {embedded} records embedded, "
+            f"{len(self)} total."
+        )
+        return embedded
+
+    def prune(self, odoo, domain: Sequence = (), page_size: int = 5000) -> int:
+        """Remove rows whose records no longer exist (or left ``domain``)."""
+
+        records = odoo.search_read(self.model, list(domain), ["id"], page_size=page_size)
+        alive = {record["id"] for record in records}
+        removed = self.remove([rid for rid in list(self._rows) if rid not in alive])
+        self.flush()
+        return removed
+
+    # --- Queries -------------------------------------------------------------
+
+    def search_vectors(self, queries, k: int = 10) -> List[List[Tuple[int, float]]]:
+        """Return the ``k`` best ``(record_id, score)`` pairs per query vector."""
+
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        count = self.meta["count"]
+        k = min(k, len(self))
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            block = self.vectors[start : start + SEARCH_BLOCK_ROWS]
+            scores = queries @ block.T
+            # Removed rows are zero vectors; keep them out of the results.
+            scores[:, self.ids[start : start + len(block)] < 0] = -np.inf
+            top = min(k, scores.shape[1])
+            rows = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+            best_scores = np.concatenate(
+                [best_scores, np.take_along_axis(scores, rows, axis=1)], axis=1
+            )
+            best_rows = np.concatenate([best_rows, rows + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            results.append(
+                [
+                    (int(self.ids[rows[i]]), float(scores[i]))
+                    for i in order
+                    if np.isfinite(scores[i])
+                ]
+            )
+        return results
+
+    def search(
+        self, questions: Sequence[str], k: int = 10
+    ) -> List[List[Tuple[int, float]]]:
+        """Embed ``questions`` and return the best matching records for each."""
+
+        return self.search_vectors(self.embedder.embed(list(questions)), k=k)
@@ -8,110 +8,324 @@ dependencies and starts the Odoo server process.
 import os
 import subprocess
 import sys
-from typing import Tuple
+from typing import Dict, Iterable, Optional, Tuple
 
+from . import metrics
+from .commands import run_command as _run_command
+from .database import DEFAULT_DB_SETTINGS, provision_database
+from .detection import read_odoo_version
+from .events import LogFn
+from .precompile import prepare_tree
+from .venvs import instance_env
+from .wheelhouse import Wheelhouse
 
-def _run_command(args, cwd=None) -> bool:
-    """Run a subprocess and report success.
 
-    This is a thin wrapper so that all system calls are logged and
-    failures are visible in the agent logs.
+def install_requirements(
+    requirements_path: str,
+    real_install: bool = False,
+    use_wheelhouse: bool = True,
+    cache_dir: Optional[str] = None,
+    venv_dir: Optional[str] = None,
+    version: Optional[str] = None,
+    log: LogFn = print,
+) -> Optional[str]:
+    """Install the Odoo Python requirements.
+
+    Only ``requirements_path`` is read, so this can run as soon as that
+    file is available, before the rest of the source tree is extracted.
+    See :func:`setup_odoo` for the arguments; ``version`` keys the cached
+    virtualenv template.
+
+    Returns:
+        Optional[str]: Interpreter that will run Odoo, or None on failure.
     """
 
-    print("Running command:", " ".join(args))
-    result = subprocess.run(args, cwd=cwd)
-    if result.returncode != 0:
-        print(f"Command failed with exit code {result.returncode}.")
-        return False
+    python = sys.executable
+    if real_install and venv_dir:
+        log(f"Creating instance environment in {venv_dir}...")
+        python = instance_env(
+            venv_dir,
+            requirements_path,
+            version=version,
+            cache_dir=cache_dir,
+            log=log,
+        )
+        if python is None:
+            return None
+    elif real_install:
+        log("Installing Python dependencies from requirements.txt...")
+        if os.path.exists(requirements_path) and use_wheelhouse:
+            if not Wheelhouse(requirements_path, cache_dir=cache_dir, log=log).install():
+                return None
+        elif os.path.exists(requirements_path):
+            ok = _run_command(
+                [sys.executable, "-m", "pip", "install", "-r", requirements_path],
+                log=log,
+            )
+            if not ok:
+                return None
+        else:
+            log(
+                "Warning: requirements.txt not found. Skipping dependency "
+                "installation."
+            )
+    else:
+        log("Installing Python dependencies (conceptual step)...")
+    log("Python dependencies step completed.")
+    return python
+
+
+def write_config(
+    odoo_path: str,
+    config_dir: Optional[str] = None,
+    http_port: int = 8069,
+    server_options: Optional[Dict[str, str]] = None,
+    database: Optional[str] = None,
+    data_dir: Optional[str] = None,
+    db_settings: Optional[Dict[str, str]] = None,
+    log: LogFn = print,
+) -> str:
+    """Write ``odoo.conf`` for the source tree at ``odoo_path``.
+
+    Only paths are written, so the tree does not have to exist yet. See
+    :func:`setup_odoo` for the arguments.
+
+    Returns:
+        str: Path of the generated configuration file.
+    """
+
+    log("Creating Odoo configuration file...")
+    db_settings = dict(DEFAULT_DB_SETTINGS, **(db_settings or {}))
+    config_dir = config_dir or odoo_path
+    os.makedirs(config_dir, exist_ok=True)
+    config_path = os.path.join(config_dir, "odoo.conf")
+    with open(config_path, "w", encoding="utf-8") as config_file:
+        config_file.write("# Auto-generated Odoo configuration file\n")
+        # odoo-bin resolves relative paths against its own working directory.
+        addons_path = os.path.abspath(os.path.join(odoo_path, "addons"))
+        config_file.write(f"addons_path = {addons_path}\n")
+        for key in ("db_host", "db_port", "db_user", "db_password"):
+            config_file.write(f"{key} = {db_settings[key]}\n")
+        if database:
+            config_file.write(f"db_name = {database}\n")
+        if data_dir:
+            config_file.write(f"data_dir = {os.path.abspath(data_dir)}\n")
+        config_file.write(f"xmlrpc_port = {http_port}\n")
+        for key, value in (server_options or {}).items():
+            config_file.write(f"{key} = {value}\n")
+    log(f"Odoo configuration file created at {config_path}.")
+    return config_path
+
+
+def setup_database(
+    odoo_path: str,
+    database: Optional[str],
+    python: str,
+    real_install: bool = False,
+    modules: Optional[Iterable[str]] = None,
+    data_dir: Optional[str] = None,
+    db_settings: Optional[Dict[str, str]] = None,
+    cache_dir: Optional[str] = None,
+    source: Optional[str] = None,
+    log: LogFn = print,
+) -> bool:
+    """Create ``database`` from a cached template database.
+
+    Needs the extracted tree and the interpreter returned by
+    :func:`install_requirements`. See :func:`setup_odoo` for the arguments;
+    ``source`` is the digest of the archive the tree was extracted from,
+    which keys the template alongside the version and modules.
+
+    Returns:
+        bool: False if the database could not be provisioned.
+    """
+
+    if real_install and database:
+        ok, message = provision_database(
+            odoo_path,
+            database,
+            python,
+            version=read_odoo_version(odoo_path),
+            modules=modules or (),
+            data_dir=data_dir,
+            db_settings=dict(DEFAULT_DB_SETTINGS, **(db_settings or {})),
+            cache_dir=cache_dir,
+            source=source,
+            log=log,
+        )
+        log(message)
+        if not ok:
+            return False
+    elif real_install:
+        log(
+            "Assuming PostgreSQL is installed and accessible. Odoo will "
+            "use the connection settings from odoo.conf."
+        )
+    else:
+        log("Setting up PostgreSQL database (conceptual step)...")
+    log("Database setup step completed.")
     return True
 
 
-def setup_odoo(odoo_path: str, real_install: bool = False) -> Tuple[bool, str]:
+def launch_server(
+    odoo_path: str, config_path: str, python: str, http_port: int, log: LogFn = print
+) -> None:
+    """Launch ``odoo-bin`` in the background so the installer can exit."""
+
+    log("Launching Odoo server in background...")
+    odoo_path = os.path.abspath(odoo_path)
+    subprocess.Popen(
+        [
+            os.path.abspath(python),
+            os.path.join(odoo_path, "odoo-bin"),
+            "-c",
+            os.path.abspath(config_path),
+        ],
+        cwd=odoo_path,
+    )
+    log(
+        "Odoo server process started. You should be able to open "
+        f"http://localhost:{http_port} in your browser once it finishes "
+        "initializing."
+    )
+
+
+@metrics.traced("setup")
+def setup_odoo(
+    odoo_path: str,
+    real_install: bool = False,
+    config_dir: Optional[str] = None,
+    use_wheelhouse: bool = True,
+    cache_dir: Optional[str] = None,
+    venv_dir: Optional[str] = None,
+    http_port: int = 8069,
+    server_options: Optional[Dict[str, str]] = None,
+    start_server: bool = True,
+    database: Optional[str] = None,
+    modules: Optional[Iterable[str]] = None,
+    data_dir: Optional[str] = None,
+    db_settings: Optional[Dict[str, str]] = None,
+    precompile: bool = False,
+    warm_imports: bool = False,
+    source: Optional[str] = None,
+    log: LogFn = print,
+) -> Tuple[bool, str]:
     """Set up an Odoo environment.
 
     Args:
         odoo_path: Path to the downloaded/extracted Odoo source.
         real_install: If True, perform real steps (pip install and start
             the Odoo server). If False, only simulate the steps.
+        config_dir: Optional per-instance overlay directory for
+            ``odoo.conf``. Required when ``odoo_path`` is a checkout of the
+            shared source store, whose files must not be modified. Defaults
+            to ``odoo_path``.
+        use_wheelhouse: If True, install requirements offline from the
+            shared wheelhouse, building missing wheels in parallel first.
+        cache_dir: Optional cache directory holding the wheelhouse.
+        venv_dir: Optional per-instance virtualenv directory. When given,
+            the venv is cloned from a cached template for this Odoo version
+            and requirements, and ``odoo-bin`` runs with its interpreter
+            instead of the agent's own ``sys.executable``.
+        http_port: HTTP port written to ``odoo.conf``.
+        server_options: Extra ``odoo.conf`` options, such as the worker and
+            memory limits produced by :func:`odoo_agent.sizing.size_instance`.
+        start_server: If False, a real install stops after checking that
+            ``odoo-bin`` exists and leaves launching the server to the
+            caller (for example :class:`~odoo_agent.supervisor.OdooSupervisor`).
+        database: Optional database name. A real install creates it from a
+            cached template database initialized with ``modules`` (see
+            :mod:`odoo_agent.database`); it is written to ``odoo.conf`` as
+            ``db_name``.
+        modules: Modules installed in the template database.
+        data_dir: Optional Odoo ``data_dir`` receiving the filestore.
+        db_settings: PostgreSQL connection entries (``db_host``,
+            ``db_port``, ``db_user``, ``db_password``) for ``odoo.conf``.
+        precompile: If True, a real install compiles the tree's bytecode in
+            parallel before the first server start.
+        warm_imports: If True, a real install imports the core packages
+            once, timing them before and after precompiling.
+        source: SHA-256 of the archive the tree was extracted from; keys
+            the template database together with the version and modules.
+        log: Receives progress messages and the output of pip; defaults to
+            ``print``.
 
     Returns:
         Tuple[bool, str]: (success_flag, path_to_generated_config or "").
     """
 
-    print(f"Starting Odoo setup from {odoo_path}...")
+    log(f"Starting Odoo setup from {odoo_path}...")
 
     try:
         # Step 1: Install Python dependencies
-        requirements_path = os.path.join(odoo_path, "requirements.txt")
-        if real_install:
-            print("Installing Python dependencies from requirements.txt...")
-            if os.path.exists(requirements_path):
-                ok = _run_command(
-                    [sys.executable, "-m", "pip", "install", "-r", requirements_path]
-                )
-                if not ok:
-                    return False, ""
-            else:
-                print(
-                    "Warning: requirements.txt not found. Skipping dependency "
-                    "installation."
-                )
-        else:
-            print("Installing Python dependencies (conceptual step)...")
-        print("Python dependencies step completed.")
+        python = install_requirements(
+            os.path.join(odoo_path, "requirements.txt"),
+            real_install=real_install,
+            use_wheelhouse=use_wheelhouse,
+            cache_dir=cache_dir,
+            venv_dir=venv_dir,
+            version=read_odoo_version(odoo_path),
+            log=log,
+        )
+        if python is None:
+            return False, ""
 
-        # Step 2: Database setup (still conceptual – Odoo can manage DBs itself)
-        if real_install:
-            print(
-                "Assuming PostgreSQL is installed and accessible. Odoo will "
-                "use the connection settings from odoo.conf."
+        if real_install and (precompile or warm_imports):
+            prepare_tree(
+                odoo_path, python, warm=warm_imports, precompile=precompile, log=log
             )
-        else:
-            print("Setting up PostgreSQL database (conceptual step)...")
-        print("Database setup step completed.")
+
+        # Step 2: Database setup from a cached template database
+        if not setup_database(
+            odoo_path,
+            database,
+            python,
+            real_install=real_install,
+            modules=modules,
+            data_dir=data_dir,
+            db_settings=db_settings,
+            cache_dir=cache_dir,
+            source=source,
+            log=log,
+        ):
+            return False, ""
 
         # Step 3: Create Odoo configuration file
-        print("Creating Odoo configuration file...")
-        config_path = os.path.join(odoo_path, "odoo.conf")
-        with open(config_path, "w", encoding="utf-8") as config_file:
-            config_file.write("# Auto-generated Odoo configuration file\n")
-            config_file.write(f"addons_path = {os.path.join(odoo_path, 'addons')}\n")
-            config_file.write("db_host = localhost\n")
-            config_file.write("db_port = 5432\n")
-            config_file.write("db_user = odoo\n")
-            config_file.write("db_password = odoo\n")
-            config_file.write("xmlrpc_port = 8069\n")
-        print(f"Odoo configuration file created at {config_path}.")
+        config_path = write_config(
+            odoo_path,
+            config_dir=config_dir,
+            http_port=http_port,
+            server_options=server_options,
+            database=database,
+            data_dir=data_dir,
+            db_settings=db_settings,
+            log=log,
+        )
 
         # Step 4: Start Odoo server
         if real_install:
-            print("Starting real Odoo server process...")
+            log("Starting real Odoo server process...")
             odoo_bin = os.path.join(odoo_path, "odoo-bin")
             if not os.path.exists(odoo_bin):
-                print(
+                log(
                     f"Error: odoo-bin not found at {odoo_bin}. Make sure the "
                     "Odoo source was downloaded correctly."
                 )
                 return False, ""
 
-            # Launch Odoo in the background so the installer can exit.
-            print("Launching Odoo server in background...")
-            subprocess.Popen(
-                [sys.executable, odoo_bin, "-c", config_path],
-                cwd=odoo_path,
-            )
-            print(
-                "Odoo server process started. You should be able to open "
-                "http://localhost:8069 in your browser once it finishes "
-                "initializing."
-            )
+            if not start_server:
+                log("Leaving the Odoo server launch to the caller.")
+                log("Odoo setup completed successfully.")
+                return True, config_path
+
+            launch_server(odoo_path, config_path, python, http_port, log=log)
         else:
-            print("Initiating Odoo server process (conceptual step)...")
-            print("Odoo server initiation command simulated.")
+            log("Initiating Odoo server process (conceptual step)...")
+            log("Odoo server initiation command simulated.")
 
-        print("Odoo setup completed successfully.")
+        log("Odoo setup completed successfully.")
         return True, config_path
 
     except Exception as exc:  # pragma: no cover - generic safety net
-        print(f"Error during Odoo setup: {exc}")
+        log(f"Error during Odoo setup: {exc}")
         return False, ""
@@ -0,0 +1,170 @@
+"""Performance sizing for generated ``odoo.conf`` files.
+
+Odoo runs single-process and threaded unless ``workers`` is set. This
+module reads the host's CPU count and available memory and turns an
+expected concurrency profile into multiprocess settings, following the
+rules of thumb from the Odoo deployment guide:
+
+* about ``2 * CPUs + 1`` workers at most, and roughly one worker per six
+  concurrent users;
+* an average of ~325 MB per worker (most requests are light, about one in
+  five is heavy), with soft/hard memory limits chosen so that every worker
+  and cron thread can reach its soft limit without exhausting memory.
+
+When several instances share a host the CPU, memory and PostgreSQL
+connection budgets are divided between them. An instance whose memory
+share cannot hold the two-worker prefork minimum stays threaded.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from .events import LogFn
+
+MB = 1024 * 1024
+USERS_PER_WORKER = 6
+AVG_WORKER_MEMORY = 325 * MB
+MAX_SOFT_LIMIT = 2048 * MB
+MAX_HARD_LIMIT = 2560 * MB
+# Share of memory left for the OS, PostgreSQL and the page cache.
+SYSTEM_RESERVE = 0.2
+DEFAULT_PG_MAX_CONNECTIONS = 100
+
+
+@dataclass(frozen=True)
+class ConcurrencyProfile:
+    """Expected load of one instance."""
+
+    name: str
+    concurrent_users: int
+    limit_time_cpu: int = 60
+    limit_time_real: int = 120
+
+
+PROFILES = {
+    "small": ConcurrencyProfile("small", concurrent_users=10),
+    "medium": ConcurrencyProfile("medium", concurrent_users=50),
+    "large": ConcurrencyProfile("large", concurrent_users=200),
+}
+
+
+def _available_memory() -> Optional[int]:
+    """Return available physical memory in bytes, if it can be determined."""
+
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _cpu_count() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def host_resources() -> Tuple[int, Optional[int]]:
+    """Return ``(cpu_count, available_memory_bytes)`` for this host."""
+
+    return _cpu_count(), _available_memory()
+
+
+def size_instance(
+    profile: str = "medium",
+    instances: int = 1,
+    cpus: Optional[int] = None,
+    memory: Optional[int] = None,
+    pg_max_connections: int = DEFAULT_PG_MAX_CONNECTIONS,
+    behind_proxy: bool = False,
+    log: LogFn = print,
+) -> Dict[str, str]:
+    """Return tuned ``odoo.conf`` options for one instance.
+
+    Args:
+        profile: Name of a :data:`PROFILES` entry.
+        instances: Number of instances sharing this host; CPU, memory and
+            PostgreSQL connections are split evenly between them.
+        cpus: CPU count override; detected when omitted.
+        memory: Available memory override in bytes; detected when omitted.
+        pg_max_connections: PostgreSQL ``max_connections`` shared by all
+            instances.
+        behind_proxy: Set ``proxy_mode`` for instances behind a reverse proxy.
+
+    Returns:
+        Dict[str, str]: Option names and values for ``odoo.conf``.
+    """
+
+    load = PROFILES[profile]
+    detected_cpus, detected_memory = host_resources()
+    cpus = cpus or detected_cpus
+    memory = memory or detected_memory or 2048 * MB
+    instances = max(1, instances)
+
+    cpu_share = max(1.0, cpus / instances)
+    memory_share = memory * (1 - SYSTEM_RESERVE) / instances
+    connection_share = max(2, pg_max_connections // instances)
+
+    options = {
+        "limit_time_cpu": str(load.limit_time_cpu),
+        "limit_time_real": str(load.limit_time_real),
+        "proxy_mode": "True" if behind_proxy else "False",
+    }
+
+    if os.name == "nt":
+        # Odoo's prefork server is POSIX-only; Windows stays threaded.
+        options.update({"workers": "0", "max_cron_threads": "1", "db_maxconn": "16"})
+        return options
+
+    by_cpu = int(2 * cpu_share) + 1
+    by_users = math.ceil(load.concurrent_users / USERS_PER_WORKER)
+    by_memory = int(memory_share // AVG_WORKER_MEMORY)
+    if by_memory < 2:
+        # Two workers are the prefork minimum; forcing them would overrun
+        # this instance's memory share, so run threaded instead.
+        log(
+            f"Warning: {int(memory_share // MB)} MB per instance does not fit two "
+            f"Odoo workers; running '{profile}' threaded (workers = 0)."
+        )
+        options.update(
+            {
+                "workers": "0",
+                "max_cron_threads": "1",
+                "db_maxconn": str(min(16, connection_share)),
+            }
+        )
+        return options
+    workers = max(2, min(by_cpu, by_users, by_memory))
+    cron_threads = 1 if workers < 6 else 2
+
+    processes = workers + cron_threads
+    soft = int(min(MAX_SOFT_LIMIT, memory_share / processes))
+    hard = int(min(MAX_HARD_LIMIT, soft * 1.25))
+    db_maxconn = max(2, min(32, connection_share // processes))
+
+    options.update(
+        {
+            "workers": str(workers),
+            "max_cron_threads": str(cron_threads),
+            "limit_memory_soft": str(soft),
+            "limit_memory_hard": str(hard),
+            "limit_request": "8192",
+            "db_maxconn": str(db_maxconn),
+        }
+    )
+    log(
+        f"Sized Odoo for profile '{profile}': {workers} workers, "
+        f"{cron_threads} cron threads, soft memory limit {soft // MB} MB "
+        f"({instances} instance(s) sharing {cpus} CPUs)."
+    )
+    return options
@@ -0,0 +1,173 @@
+"""Deduplicated store of extracted Odoo source trees.
+
+The store keeps one extracted tree per Odoo version, archive digest and
+module selection under ``<cache_dir>/store/<key>``. Instances get a
+checkout of that tree made of reflinks (copy-on-write clones) where the
+filesystem supports them, hardlinks otherwise, and plain copies as a last
+resort, so provisioning another instance of the same version costs
+seconds and almost no extra disk.
+
+Hardlinked checkouts share file contents with the store; anything an
+instance writes (such as ``odoo.conf``) belongs in a per-instance overlay
+directory, never in the checked-out tree.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import threading
+from typing import Callable, Iterable, Optional
+
+from .cache import default_cache_dir, file_lock
+from .events import LogFn
+from .modules import SERVER_WIDE_MODULES
+
+COMPLETE_MARKER = ".odoo_agent_complete"
+
+# ioctl request number of FICLONE on Linux (_IOW(0x94, 9, int)).
+_FICLONE = 0x40049409
+
+
+def _reflink(src: str, dst: str) -> None:
+    """Clone ``src`` to ``dst`` sharing extents (btrfs, XFS, ...)."""
+
+    import fcntl
+
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _hardlink(src: str, dst: str) -> None:
+    os.link(src, dst)
+
+
+def _copy(src: str, dst: str) -> None:
+    shutil.copy2(src, dst)
+
+
+_METHODS = {"reflink": _reflink, "hardlink": _hardlink, "copy": _copy}
+
+
+def clone_tree(src: str, dst: str, method: str = "auto") -> str:
+    """Recreate the tree at ``src`` under ``dst`` sharing file data.
+
+    Directories are always created fresh; files are reflinked, hardlinked or
+    copied. With ``method="auto"`` the cheapest method that works for the
+    first file is used for the rest of the tree.
+
+    Returns:
+        str: The method used (``"reflink"``, ``"hardlink"`` or ``"copy"``).
+    """
+
+    candidates = ["reflink", "hardlink", "copy"] if method == "auto" else [method]
+    if os.name != "posix" and "reflink" in candidates:
+        candidates.remove("reflink")
+
+    for root, dirs, files in os.walk(src):
+        rel = os.path.relpath(root, src)
+        target_root = dst if rel == os.curdir else os.path.join(dst, rel)
+        os.makedirs(target_root, exist_ok=True)
+        for name in [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+            link = os.readlink(os.path.join(root, name))
+            os.symlink(link, os.path.join(target_root, name))
+        for name in files:
+            source = os.path.join(root, name)
+            target = os.path.join(target_root, name)
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+                continue
+            while True:
+                try:
+                    _METHODS[candidates[0]](source, target)
+                    break
+                except OSError:
+                    if len(candidates) == 1:
+                        raise
+                    candidates.pop(0)
+    return candidates[0]
+
+
+def store_key(version: str, digest: str, modules: Optional[Iterable[str]] = None) -> str:
+    """Return the store key for an archive digest and module selection."""
+
+    key = f"{version}-{digest[:16]}"
+    if modules is not None:
+        # The server-wide modules are always part of a restricted tree.
+        selection = ",".join(sorted(set(modules) | set(SERVER_WIDE_MODULES)))
+        key += "-m" + hashlib.sha256(selection.encode("utf-8")).hexdigest()[:8]
+    return key
+
+
+class SourceStore:
+    """Shared store holding one extracted Odoo tree per key."""
+
+    def __init__(self, store_dir: Optional[str] = None, log: LogFn = print):
+        self.log = log
+        self.store_dir = store_dir or os.path.join(default_cache_dir(), "store")
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.store_dir, key)
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self.path(key), COMPLETE_MARKER))
+
+    def add(self, key: str, populate: Callable[[str], bool]) -> bool:
+        """Populate the tree for ``key`` unless it is already present.
+
+        ``populate`` receives a scratch directory to extract into and must
+        return True on success; the directory is moved into place
+        atomically so readers never observe a half-extracted tree. A key
+        completed by a concurrent adder is never replaced.
+        """
+
+        if self.has(key):
+            self.log(f"Source store already holds {key}.")
+            return True
+
+        scratch = self.path(f".tmp-{key}-{os.getpid()}-{threading.get_ident()}")
+        shutil.rmtree(scratch, ignore_errors=True)
+        os.makedirs(scratch)
+        try:
+            if not populate(scratch):
+                return False
+            with open(os.path.join(scratch, COMPLETE_MARKER), "w", encoding="utf-8"):
+                pass
+            with file_lock(self.path(f".lock-{key}")):
+                if self.has(key):
+                    # Another adder published it first and may be checking
+                    # it out; keep that tree and drop ours.
+                    self.log(f"Source store already holds {key}.")
+                    return True
+                # Only an incomplete leftover of an interrupted add remains.
+                shutil.rmtree(self.path(key), ignore_errors=True)
+                os.rename(scratch, self.path(key))
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        self.log(f"Added {key} to source store at {self.path(key)}.")
+        return True
+
+    def checkout(self, key: str, dest: str, method: str = "auto") -> str:
+        """Materialize the tree for ``key`` at ``dest``.
+
+        Any previous checkout at ``dest`` is replaced.
+
+        Returns:
+            str: The clone method that was used.
+        """
+
+        shutil.rmtree(dest, ignore_errors=True)
+        used = clone_tree(self.path(key), dest, method=method)
+        marker = os.path.join(dest, COMPLETE_MARKER)
+        if os.path.exists(marker):
+            os.remove(marker)
+        self.log(f"Checked out {key} to {dest} using {used}.")
+        return used
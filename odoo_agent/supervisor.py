@@ -0,0 +1,204 @@
+"""Supervised Odoo server process.
+
+:class:`OdooSupervisor` launches ``odoo-bin``, polls its HTTP port with
+exponential backoff until the server answers, and records the
+time-to-ready. A monitor thread restarts the server with jittered
+exponential backoff when it exits unexpectedly, so downtime after a crash
+is bounded, and gives up after ``max_restarts`` consecutive crashes.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from . import metrics
+from .events import LogFn
+
+READY_POLL_INITIAL = 0.1
+READY_POLL_MAX = 2.0
+RESTART_BACKOFF_BASE = 1.0
+RESTART_BACKOFF_MAX = 60.0
+# A server that stays up this long resets the consecutive crash counter.
+STABLE_AFTER = 60.0
+
+
+class OdooSupervisor:
+    """Start, watch and restart one Odoo server process."""
+
+    def __init__(
+        self,
+        command: List[str],
+        port: int = 8069,
+        cwd: Optional[str] = None,
+        host: str = "127.0.0.1",
+        ready_timeout: float = 120.0,
+        max_restarts: int = 5,
+        log: LogFn = print,
+    ):
+        self.log = log
+        self.command = command
+        self.port = port
+        self.cwd = cwd
+        self.host = host
+        self.ready_timeout = ready_timeout
+        self.max_restarts = max_restarts
+
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at: Optional[float] = None
+        self.time_to_ready: Optional[float] = None
+        self.restarts = 0
+        self.crashes = 0
+        self.last_exit_code: Optional[int] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._monitor: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/web/login"
+
+    def _spawn(self) -> None:
+        self.log(f"Running command: {' '.join(self.command)}")
+        self.process = subprocess.Popen(self.command, cwd=self.cwd)
+        self.started_at = time.monotonic()
+        self.time_to_ready = None
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Poll the HTTP port until Odoo answers or ``timeout`` expires."""
+
+        timeout = self.ready_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        delay = READY_POLL_INITIAL
+        while time.monotonic() < deadline:
+            process = self.process
+            if process is None or process.poll() is not None:
+                return False
+            try:
+                response = requests.get(self.url, timeout=min(5.0, delay * 5))
+                if response.status_code < 500:
+                    self.time_to_ready = time.monotonic() - self.started_at
+                    metrics.event(
+                        "odoo.ready", port=self.port, time_to_ready=self.time_to_ready
+                    )
+                    self.log(
+                        f"Odoo is ready on port {self.port} after "
+                        f"{self.time_to_ready:.2f}s."
+                    )
+                    return True
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(delay)
+            delay = min(delay * 2, READY_POLL_MAX)
+        self.log(f"Odoo did not become ready on port {self.port} within {timeout:.0f}s.")
+        return False
+
+    def start(self, wait: bool = True) -> bool:
+        """Launch the server and start the restart monitor.
+
+        Args:
+            wait: If True, block until the server is ready.
+
+        Returns:
+            bool: True if the server started (and became ready when waiting).
+        """
+
+        with self._lock:
+            monitored = self._monitor is not None and self._monitor.is_alive()
+            if monitored and not self._stopping.is_set():
+                self.log("Odoo server is already supervised.")
+            else:
+                self._stopping.clear()
+                self._spawn()
+                self._monitor = threading.Thread(target=self._watch, daemon=True)
+                self._monitor.start()
+        return self.wait_ready() if wait else True
+
+    def _watch(self) -> None:
+        while not self._stopping.is_set():
+            process = self.process
+            exit_code = process.wait()
+            if self._stopping.is_set():
+                return
+
+            self.last_exit_code = exit_code
+            metrics.event("odoo.exit", port=self.port, exit_code=exit_code)
+            uptime = time.monotonic() - (self.started_at or time.monotonic())
+            self.crashes = 1 if uptime >= STABLE_AFTER else self.crashes + 1
+            if self.crashes > self.max_restarts:
+                self.log(
+                    f"Odoo server crashed {self.crashes} times in a row; "
+                    "giving up on restarts."
+                )
+                return
+
+            backoff = RESTART_BACKOFF_BASE * 2 ** (self.crashes - 1)
+            backoff = min(RESTART_BACKOFF_MAX, backoff) * random.uniform(0.5, 1.0)
+            self.log(
+                f"Odoo server exited with code {exit_code}; restarting in "
+                f"{backoff:.1f}s (attempt {self.crashes}/{self.max_restarts})."
+            )
+            if self._stopping.wait(backoff):
+                return
+            with self._lock:
+                if self._stopping.is_set():
+                    return
+                self._spawn()
+                self.restarts += 1
+            self.wait_ready()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Terminate the server, killing it if it does not exit in time."""
+
+        self._stopping.set()
+        with self._lock:
+            process = self.process
+            if process is None or process.poll() is not None:
+                return
+            process.terminate()
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        self.log("Odoo server stopped.")
+
+    def child_pids(self) -> List[int]:
+        """Return the PIDs of the server's worker processes (Linux only)."""
+
+        if self.process is None:
+            return []
+        task_dir = f"/proc/{self.process.pid}/task"
+        pids: List[int] = []
+        try:
+            for task in os.listdir(task_dir):
+                with open(os.path.join(task_dir, task, "children"), "r") as f:
+                    pids.extend(int(pid) for pid in f.read().split())
+        except OSError:
+            pass
+        return pids
+
+    def status(self) -> Dict:
+        """Return a snapshot of the supervised server's state."""
+
+        running = self.process is not None and self.process.poll() is None
+        uptime = None
+        if running and self.started_at is not None:
+            uptime = time.monotonic() - self.started_at
+        return {
+            "running": running,
+            "pid": self.process.pid if self.process is not None else None,
+            "child_pids": self.child_pids() if running else [],
+            "port": self.port,
+            "ready": running and self.time_to_ready is not None,
+            "time_to_ready": self.time_to_ready,
+            "uptime": uptime,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+        }
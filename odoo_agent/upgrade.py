@@ -0,0 +1,641 @@
+"""Delta upgrades of an installed Odoo source tree.
+
+Instead of extracting a new branch archive into a fresh directory, an
+update compares a per-file SHA-256 manifest of the installed tree with
+the manifest of the new release and writes only the files that were
+added or changed, and deletes the ones that were removed.
+
+The new release is read from one of two sources:
+
+* a **mirror** laid out by :func:`publish_mirror` and served by any static
+  HTTP server: ``<mirror>/<version>/manifest.json`` plus content-addressed
+  files under ``<mirror>/objects/<sha[:2]>/<sha>``. Only changed files
+  are downloaded, so patch-level updates move megabytes;
+* the branch **archive**, fetched through the shared download cache and
+  streamed once to hash its members. The tree's manifest records the
+  digest of the archive it matches, so an unchanged digest means nothing
+  to do even when another tree already refreshed the cache.
+
+Trees extracted for a module selection stay restricted to it: the release
+is filtered to the selection's dependency closure. The installer records
+the selection (and the archive digest) in the tree's manifest with
+:func:`record_install`, and every update keeps it there.
+
+Updates are applied in place but crash-safe: new contents are staged in
+``.odoo_agent_update/`` inside the tree and a journal is written before
+the staged files are renamed over their targets. An interrupted update is
+finished by the next call. Renaming never writes through existing inodes,
+so trees hardlinked from the shared source store stay intact.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from . import metrics
+from .cache import CHUNK_SIZE, HTTP_TIMEOUT, ArchiveCache, link_or_copy
+from .events import LogFn
+from .extract import archive_kind
+from .modules import MANIFEST_NAMES, select_archive_members, source_prefix
+from .ranged import DEFAULT_WORKERS, make_session
+
+MANIFEST_NAME = ".odoo_agent_manifest.json"
+STAGING_DIR = ".odoo_agent_update"
+JOURNAL_NAME = "journal.json"
+# Files the installer or Odoo create inside the tree; never touched.
+LOCAL_NAMES = {"odoo.conf", MANIFEST_NAME, STAGING_DIR, "__pycache__"}
+
+Manifest = Dict[str, Dict]
+
+
+@dataclass
+class UpdatePlan:
+    """Differences between an installed tree and a new release."""
+
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.added)} added, {len(self.changed)} changed, "
+            f"{len(self.removed)} removed"
+        )
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _is_local(name: str) -> bool:
+    return name in LOCAL_NAMES or name.endswith(".pyc")
+
+
+def tree_manifest(root: str, workers: Optional[int] = None) -> Manifest:
+    """Return ``{relative_path: {"sha256", "size", "mode"}}`` for ``root``.
+
+    Hashes recorded in the stored manifest are reused for files whose size
+    and mtime did not change, so repeated scans only read modified files.
+    """
+
+    stored = load_manifest(root)
+    files: List[Tuple[str, os.stat_result]] = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not _is_local(d)]
+        for name in filenames:
+            if _is_local(name):
+                continue
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path):
+                continue
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            files.append((rel, os.stat(path)))
+
+    def entry(item: Tuple[str, os.stat_result]) -> Tuple[str, Dict]:
+        rel, st = item
+        old = stored.get(rel)
+        unchanged = (
+            old
+            and old.get("size") == st.st_size
+            and old.get("mtime_ns") == st.st_mtime_ns
+        )
+        sha = old["sha256"] if unchanged else _sha256_file(os.path.join(root, rel))
+        return rel, {
+            "sha256": sha,
+            "size": st.st_size,
+            "mode": st.st_mode & 0o777,
+            "mtime_ns": st.st_mtime_ns,
+        }
+
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(entry, files))
+
+
+def _load_state(root: str) -> Dict:
+    """Return the stored manifest file: files, archive digest and modules."""
+
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}}
+    if not isinstance(state.get("files"), dict):
+        # Manifests written before the archive digest was recorded.
+        state = {"files": state}
+    return state
+
+
+def load_manifest(root: str) -> Manifest:
+    return _load_state(root)["files"]
+
+
+def release_fingerprint(root: str) -> Optional[str]:
+    """Return an identifier of the release an updated tree matches.
+
+    That is the recorded archive digest, or a hash of the file manifest
+    for mirror updates; None for trees that were never updated.
+    """
+
+    state = _load_state(root)
+    if state.get("archive"):
+        return state["archive"]
+    if not state["files"]:
+        return None
+    blob = json.dumps(state["files"], sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+def save_manifest(
+    root: str,
+    manifest: Manifest,
+    archive: Optional[str] = None,
+    modules: Optional[List[str]] = None,
+) -> None:
+    """Store ``manifest`` with the release it matches.
+
+    ``archive`` is the SHA-256 of the branch archive the tree now matches
+    (None for mirror updates) and ``modules`` the module selection the tree
+    was restricted to.
+    """
+
+    path = os.path.join(root, MANIFEST_NAME)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"files": manifest, "archive": archive, "modules": modules}, f)
+    os.replace(tmp, path)
+
+
+def record_install(
+    root: str, archive: Optional[str] = None, modules: Optional[Iterable[str]] = None
+) -> None:
+    """Record the archive and module selection a fresh tree was extracted with.
+
+    No file hashes are stored; the first update computes them. Until then
+    updates still default to ``modules``.
+    """
+
+    selection = sorted(modules) if modules is not None else None
+    save_manifest(root, {}, archive=archive, modules=selection)
+
+
+def _same_mode(old: Optional[int], new: Optional[int]) -> bool:
+    # Only the executable bit is part of a release; the rest follows umask.
+    return bool((old or 0) & 0o111) == bool((new or 0) & 0o111)
+
+
+def _same_contents(a: Manifest, b: Manifest) -> bool:
+    return a.keys() == b.keys() and all(
+        a[rel]["sha256"] == b[rel]["sha256"] for rel in a
+    )
+
+
+def plan_update(installed: Manifest, release: Manifest) -> UpdatePlan:
+    plan = UpdatePlan()
+    for rel, entry in release.items():
+        old = installed.get(rel)
+        if old is None:
+            plan.added.append(rel)
+        elif old["sha256"] != entry["sha256"] or not _same_mode(
+            old.get("mode"), entry.get("mode")
+        ):
+            plan.changed.append(rel)
+    plan.removed = [rel for rel in installed if rel not in release]
+    for names in (plan.added, plan.changed, plan.removed):
+        names.sort()
+    return plan
+
+
+# --- Release sources -----------------------------------------------------------
+
+
+def _archive_members(
+    archive: str, modules: Optional[Iterable[str]] = None, log: LogFn = print
+) -> Iterator[Tuple[str, int, Callable[[], bytes]]]:
+    """Yield ``(path, mode, read)`` for every regular file, in archive order.
+
+    With ``modules`` only the files :func:`select_archive_members` keeps
+    for that selection are yielded.
+    """
+
+    if archive_kind(archive) == "zip":
+        with zipfile.ZipFile(archive) as zip_ref:
+            infos = [i for i in zip_ref.infolist() if not i.is_dir()]
+            names = [i.filename for i in infos]
+            prefix = source_prefix(names)
+            wanted = None
+            if modules is not None:
+                wanted = set(
+                    select_archive_members(names, zip_ref.read, modules, log=log)
+                )
+            for info in infos:
+                if not info.filename.startswith(prefix):
+                    continue
+                if wanted is not None and info.filename not in wanted:
+                    continue
+                mode = (info.external_attr >> 16) & 0o777 or 0o644
+                yield info.filename[len(prefix) :], mode, (
+                    lambda info=info: zip_ref.read(info)
+                )
+        return
+
+    # A first pass over the tar.gz headers finds the source root (and reads
+    # the addon manifests for a module selection); the second streams the
+    # members in order.
+    with tarfile.open(archive, "r:gz") as tar_ref:
+        names = [m.name for m in tar_ref.getmembers() if m.isfile()]
+        prefix = source_prefix(names)
+        wanted = None
+        if modules is not None:
+            wanted = set(
+                select_archive_members(
+                    names,
+                    lambda name: tar_ref.extractfile(name).read(),
+                    modules,
+                    log=log,
+                )
+            )
+    with tarfile.open(archive, "r|gz") as tar_ref:
+        for member in tar_ref:
+            if not member.isfile() or not member.name.startswith(prefix):
+                continue
+            if wanted is not None and member.name not in wanted:
+                continue
+            yield member.name[len(prefix) :], member.mode & 0o777, (
+                lambda member=member: tar_ref.extractfile(member).read()
+            )
+
+
+def _safe_target(root: str, rel: str) -> str:
+    target = os.path.normpath(os.path.join(root, rel))
+    root = os.path.abspath(root)
+    if os.path.commonpath([root, os.path.abspath(target)]) != root:
+        raise ValueError(f"Refusing to write outside the tree: {rel}")
+    return target
+
+
+def _stage_path(root: str, rel: str) -> str:
+    return os.path.join(root, STAGING_DIR, "files", rel)
+
+
+def _write_staged(root: str, rel: str, data: bytes, mode: int) -> None:
+    staged = _stage_path(root, rel)
+    os.makedirs(os.path.dirname(staged), exist_ok=True)
+    with open(staged, "wb") as f:
+        f.write(data)
+    os.chmod(staged, mode or 0o644)
+
+
+def stage_from_archive(
+    root: str,
+    archive: str,
+    installed: Manifest,
+    modules: Optional[Iterable[str]] = None,
+    log: LogFn = print,
+) -> Tuple[UpdatePlan, Manifest]:
+    """Hash every archive member and stage the ones that differ.
+
+    ``modules`` restricts the release to the tree's module selection.
+    """
+
+    release: Manifest = {}
+    for rel, mode, read in _archive_members(archive, modules, log=log):
+        if _is_local(os.path.basename(rel)):
+            continue
+        data = read()
+        sha = hashlib.sha256(data).hexdigest()
+        release[rel] = {"sha256": sha, "size": len(data), "mode": mode}
+        old = installed.get(rel)
+        if old is None or old["sha256"] != sha or not _same_mode(old.get("mode"), mode):
+            _write_staged(root, rel, data, mode)
+    return plan_update(installed, release), release
+
+
+def stage_from_mirror(
+    root: str,
+    mirror_url: str,
+    version: str,
+    installed: Manifest,
+    workers: int = DEFAULT_WORKERS,
+    session: Optional[requests.Session] = None,
+    modules: Optional[Iterable[str]] = None,
+    log: LogFn = print,
+) -> Tuple[UpdatePlan, Manifest]:
+    """Fetch the release manifest and download only the changed files.
+
+    ``modules`` restricts the release to the tree's module selection; the
+    addon manifests needed to resolve it are fetched first.
+    """
+
+    session = session or make_session(workers)
+    base = mirror_url.rstrip("/")
+    response = session.get(f"{base}/{version}/manifest.json", timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    release: Manifest = response.json()
+
+    def read(rel: str) -> bytes:
+        sha = release[rel]["sha256"]
+        url = f"{base}/objects/{sha[:2]}/{sha}"
+        with session.get(url, timeout=HTTP_TIMEOUT) as object_response:
+            object_response.raise_for_status()
+            data = object_response.content
+        if hashlib.sha256(data).hexdigest() != sha:
+            raise ValueError(f"Mirror returned corrupt content for {rel}.")
+        return data
+
+    if modules is not None:
+        manifest_names = [
+            rel for rel in release if os.path.basename(rel) in MANIFEST_NAMES
+        ]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            sources = dict(zip(manifest_names, pool.map(read, manifest_names)))
+        wanted = set(
+            select_archive_members(
+                list(release), sources.__getitem__, modules, log=log
+            )
+        )
+        release = {rel: entry for rel, entry in release.items() if rel in wanted}
+    plan = plan_update(installed, release)
+
+    def fetch(rel: str) -> int:
+        data = read(rel)
+        _write_staged(root, rel, data, release[rel].get("mode", 0o644))
+        return len(data)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        names = plan.added + plan.changed
+        fetched = sum(pool.map(fetch, names))
+    metrics.event("update.fetch", bytes=fetched, files=len(names))
+    log(f"Fetched {fetched} bytes for {len(names)} files from {base}.")
+    return plan, release
+
+
+def publish_mirror(source_root: str, mirror_dir: str, version: str) -> Manifest:
+    """Publish ``source_root`` as ``version`` in a per-file mirror directory.
+
+    Objects are shared between versions, so publishing a patch release only
+    adds the files that changed.
+    """
+
+    manifest = tree_manifest(source_root)
+    for rel, entry in manifest.items():
+        sha = entry["sha256"]
+        target = os.path.join(mirror_dir, "objects", sha[:2], sha)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(source_root, rel), target + ".tmp")
+            os.replace(target + ".tmp", target)
+    release = {
+        rel: {k: entry[k] for k in ("sha256", "size", "mode")}
+        for rel, entry in manifest.items()
+    }
+    os.makedirs(os.path.join(mirror_dir, version), exist_ok=True)
+    save_path = os.path.join(mirror_dir, version, "manifest.json")
+    with open(save_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(release, f)
+    os.replace(save_path + ".tmp", save_path)
+    return release
+
+
+# --- Applying --------------------------------------------------------------------
+
+
+def _journal_path(root: str) -> str:
+    return os.path.join(root, STAGING_DIR, JOURNAL_NAME)
+
+
+def _drop_bytecode(target: str) -> None:
+    """Delete cached bytecode of ``target``.
+
+    Precompiled store trees use ``unchecked-hash`` pycs, which Python would
+    keep loading after the source changed.
+    """
+
+    if not target.endswith(".py"):
+        return
+    cache_dir = os.path.join(os.path.dirname(target), "__pycache__")
+    stem = os.path.basename(target)[:-3] + "."
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        if name.startswith(stem) and name.endswith(".pyc"):
+            os.remove(os.path.join(cache_dir, name))
+
+
+def _commit(root: str, journal: Dict) -> None:
+    """Move staged files into place and delete removed files (idempotent)."""
+
+    for rel in journal["write"] + journal["remove"]:
+        _drop_bytecode(_safe_target(root, rel))
+    for rel in journal["write"]:
+        staged = _stage_path(root, rel)
+        if os.path.exists(staged):
+            target = _safe_target(root, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(staged, target)
+    for rel in journal["remove"]:
+        target = _safe_target(root, rel)
+        if os.path.exists(target):
+            os.remove(target)
+            # Drop directories left empty by removed addons.
+            parent = os.path.dirname(target)
+            root_path = os.path.abspath(root)
+            while os.path.abspath(parent) != root_path and not os.listdir(parent):
+                os.rmdir(parent)
+                parent = os.path.dirname(parent)
+    # Unchanged files match the release by definition, so the new manifest
+    # only needs fresh ``stat`` data, not another pass of hashing.
+    manifest: Manifest = {}
+    for rel, entry in journal["manifest"].items():
+        try:
+            st = os.stat(os.path.join(root, rel))
+        except OSError:
+            continue
+        manifest[rel] = dict(
+            entry, size=st.st_size, mode=st.st_mode & 0o777, mtime_ns=st.st_mtime_ns
+        )
+    save_manifest(
+        root, manifest, archive=journal.get("archive"), modules=journal.get("modules")
+    )
+    shutil.rmtree(os.path.join(root, STAGING_DIR), ignore_errors=True)
+
+
+def resume_update(root: str, log: LogFn = print) -> bool:
+    """Finish an update interrupted after its journal was written."""
+
+    try:
+        with open(_journal_path(root), "r", encoding="utf-8") as f:
+            journal = json.load(f)
+    except (OSError, ValueError):
+        # No journal: anything staged is incomplete and is discarded.
+        shutil.rmtree(os.path.join(root, STAGING_DIR), ignore_errors=True)
+        return False
+    log(f"Finishing interrupted update of {root}...")
+    _commit(root, journal)
+    return True
+
+
+def update_tree(
+    root: str,
+    version: str,
+    download_url: Optional[str] = None,
+    mirror_url: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+    workers: int = DEFAULT_WORKERS,
+    modules: Optional[Iterable[str]] = None,
+    log: LogFn = print,
+) -> Tuple[bool, UpdatePlan]:
+    """Bring the Odoo tree at ``root`` to the latest ``version`` release.
+
+    Args:
+        root: Installed source root (the directory holding ``odoo-bin``).
+        version: Odoo series, used for the default archive URL and the
+            mirror path.
+        download_url: Branch archive URL; defaults to the GitHub branch zip.
+        mirror_url: Per-file mirror base URL (see :func:`publish_mirror`).
+            When given, only changed files are downloaded.
+        cache_dir: Download cache location for archive updates.
+        workers: Parallel downloads.
+        modules: Module selection the tree was extracted with (see
+            :func:`~odoo_agent.modules.select_archive_members`); addons
+            outside it are neither added nor updated. Defaults to the
+            selection recorded at install (see :func:`record_install`) or
+            by the previous update.
+
+    Returns:
+        Tuple[bool, UpdatePlan]: (success_flag, applied changes).
+    """
+
+    resume_update(root, log=log)
+    state = _load_state(root)
+    if modules is None:
+        modules = state.get("modules")
+    modules = sorted(modules) if modules is not None else None
+    archive_digest = None
+    with metrics.span("update", version=version, mirror=bool(mirror_url)) as span:
+        installed = tree_manifest(root)
+        session = make_session(workers)
+        if mirror_url:
+            plan, release = stage_from_mirror(
+                root,
+                mirror_url,
+                version,
+                installed,
+                workers=workers,
+                session=session,
+                modules=modules,
+                log=log,
+            )
+        else:
+            download_url = download_url or (
+                f"https://github.com/odoo/odoo/archive/refs/heads/{version}.zip"
+            )
+            blob, archive_digest, _ = ArchiveCache(cache_dir, log=log).fetch(
+                download_url, session=session
+            )
+            # The shared cache may have been refreshed by another tree, so
+            # only this tree's recorded release proves it is current.
+            if (
+                state.get("archive") == archive_digest
+                and state.get("modules") == modules
+                and _same_contents(installed, state["files"])
+            ):
+                log(f"Odoo {version} archive is unchanged; nothing to update.")
+                return True, UpdatePlan()
+            # Blobs are stored without an extension; link one in with the
+            # name the archive readers dispatch on.
+            staged_archive = os.path.join(
+                root, STAGING_DIR, "release." + (archive_kind(download_url) or "zip")
+            )
+            os.makedirs(os.path.dirname(staged_archive), exist_ok=True)
+            link_or_copy(blob, staged_archive)
+            plan, release = stage_from_archive(
+                root, staged_archive, installed, modules=modules, log=log
+            )
+            os.remove(staged_archive)
+
+        span.set(
+            added=len(plan.added), changed=len(plan.changed), removed=len(plan.removed)
+        )
+        if plan.empty:
+            save_manifest(root, installed, archive=archive_digest, modules=modules)
+            shutil.rmtree(os.path.join(root, STAGING_DIR), ignore_errors=True)
+            log(f"Odoo tree at {root} is already up to date.")
+            return True, plan
+
+        journal = {
+            "write": plan.added + plan.changed,
+            "remove": plan.removed,
+            "manifest": release,
+            "archive": archive_digest,
+            "modules": modules,
+        }
+        os.makedirs(os.path.join(root, STAGING_DIR), exist_ok=True)
+        tmp = _journal_path(root) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(journal, f)
+        os.replace(tmp, _journal_path(root))
+        _commit(root, journal)
+
+    log(f"Updated Odoo tree at {root}: {plan.summary()}.")
+    return True, plan
+
+
+def update_odoo(
+    source_path: str,
+    version: str = "16.0",
+    download_url: Optional[str] = None,
+    mirror_url: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+    workers: int = DEFAULT_WORKERS,
+    modules: Optional[Iterable[str]] = None,
+    log: LogFn = print,
+) -> Tuple[bool, str]:
+    """Update an installed Odoo tree in place, writing only changed files.
+
+    ``modules`` is the tree's module selection (see :func:`update_tree`).
+
+    Returns:
+        Tuple[bool, str]: (success_flag, summary_or_error_message).
+    """
+
+    if not os.path.exists(os.path.join(source_path, "odoo-bin")):
+        return False, f"No Odoo source tree found at {source_path}."
+    try:
+        _, plan = update_tree(
+            source_path,
+            version,
+            download_url=download_url,
+            mirror_url=mirror_url,
+            cache_dir=cache_dir,
+            workers=workers,
+            modules=modules,
+            log=log,
+        )
+    except requests.exceptions.RequestException as exc:
+        return False, f"Error fetching the Odoo {version} release: {exc}"
+    except (OSError, ValueError, zipfile.BadZipFile, tarfile.TarError) as exc:
+        return False, f"Error updating {source_path}: {exc}"
+    except Exception as exc:  # pragma: no cover - generic safety net
+        return False, f"Unexpected error while updating Odoo: {exc}"
+    return True, plan.summary()
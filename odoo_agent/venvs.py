@@ -0,0 +1,176 @@
+"""Per-instance virtual environments cloned from cached templates.
+
+A template venv is built once per Odoo version, requirements hash and
+interpreter ABI under ``<cache_dir>/venvs/<key>`` and filled from the
+wheelhouse. Each instance then gets its own venv by cloning the template
+with :func:`~odoo_agent.store.clone_tree` (reflinks or hardlinks where
+possible) and running an offline install that only adds whatever differs
+from the template.
+
+Venvs are not relocatable: scripts under ``bin/`` and ``pyvenv.cfg`` embed
+the absolute venv path. The clone rewrites those text files as new files,
+so the hardlinked originals in the template are never modified.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import venv
+from typing import Optional
+
+from .cache import default_cache_dir, file_lock
+from .events import LogFn
+from .store import clone_tree
+from .wheelhouse import Wheelhouse, abi_tag, requirements_hash
+
+COMPLETE_MARKER = ".odoo_agent_complete"
+
+
+def venv_python(venv_dir: str) -> str:
+    """Return the interpreter path inside ``venv_dir``."""
+
+    if os.name == "nt":
+        return os.path.join(venv_dir, "Scripts", "python.exe")
+    return os.path.join(venv_dir, "bin", "python")
+
+
+def _scripts_dir(venv_dir: str) -> str:
+    return os.path.join(venv_dir, "Scripts" if os.name == "nt" else "bin")
+
+
+def template_key(requirements_path: Optional[str], version: Optional[str]) -> str:
+    """Return the template key for a requirements file and Odoo version."""
+
+    req = "none"
+    if requirements_path and os.path.exists(requirements_path):
+        req = requirements_hash(requirements_path)[:16]
+    return f"{version or 'unknown'}-{req}-{abi_tag()}"
+
+
+def ensure_template(
+    requirements_path: Optional[str],
+    version: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+    log: LogFn = print,
+) -> Optional[str]:
+    """Return the template venv for ``requirements_path``, building it if needed.
+
+    Returns:
+        Optional[str]: Template directory, or None if building failed.
+    """
+
+    # Scripts embed absolute paths, so the template path must be absolute
+    # for the relocation in :func:`clone_venv` to find them.
+    root = os.path.abspath(os.path.join(cache_dir or default_cache_dir(), "venvs"))
+    template = os.path.join(root, template_key(requirements_path, version))
+    if os.path.exists(os.path.join(template, COMPLETE_MARKER)):
+        log(f"Using cached template environment {template}.")
+        return template
+
+    os.makedirs(root, exist_ok=True)
+    # Fleet instances are threads of one process: serialize builders of the
+    # same template and let the later ones reuse the first one's result.
+    with file_lock(f"{template}.lock"):
+        if os.path.exists(os.path.join(template, COMPLETE_MARKER)):
+            log(f"Using cached template environment {template}.")
+            return template
+
+        log(f"Building template environment {template}...")
+        scratch = f"{template}.tmp-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(scratch, ignore_errors=True)
+        # Build under a scratch name and rename once complete; the scripts
+        # embed the scratch path, so they are relocated like any clone.
+        venv.EnvBuilder(with_pip=True, symlinks=os.name != "nt").create(scratch)
+        if requirements_path and os.path.exists(requirements_path):
+            wheelhouse = Wheelhouse(requirements_path, cache_dir=cache_dir, log=log)
+            if not wheelhouse.install(python=venv_python(scratch)):
+                shutil.rmtree(scratch, ignore_errors=True)
+                return None
+
+        # Only an incomplete leftover of an interrupted build can be here.
+        shutil.rmtree(template, ignore_errors=True)
+        os.rename(scratch, template)
+        _relocate(template, scratch, template)
+        with open(os.path.join(template, COMPLETE_MARKER), "w", encoding="utf-8"):
+            pass
+    return template
+
+
+def _relocate(venv_dir: str, old_prefix: str, new_prefix: str) -> None:
+    """Rewrite references to ``old_prefix`` in the venv's path-bearing files."""
+
+    candidates = [os.path.join(venv_dir, "pyvenv.cfg")]
+    scripts = _scripts_dir(venv_dir)
+    candidates.extend(
+        os.path.join(scripts, name)
+        for name in os.listdir(scripts)
+        if not os.path.islink(os.path.join(scripts, name))
+    )
+
+    old = old_prefix.encode()
+    new = new_prefix.encode()
+    for path in candidates:
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        if old not in data or b"\0" in data:
+            continue
+        mode = os.stat(path).st_mode
+        # Replace rather than edit so hardlinked template files stay intact.
+        os.remove(path)
+        with open(path, "wb") as f:
+            f.write(data.replace(old, new))
+        os.chmod(path, mode)
+
+
+def clone_venv(template: str, dest: str, log: LogFn = print) -> str:
+    """Clone ``template`` to ``dest`` and fix its embedded paths.
+
+    Returns:
+        str: The clone method used.
+    """
+
+    template = os.path.abspath(template)
+    dest = os.path.abspath(dest)
+    shutil.rmtree(dest, ignore_errors=True)
+    method = clone_tree(template, dest)
+    marker = os.path.join(dest, COMPLETE_MARKER)
+    if os.path.exists(marker):
+        os.remove(marker)
+    _relocate(dest, template, dest)
+    log(f"Cloned template environment to {dest} using {method}.")
+    return method
+
+
+def instance_env(
+    venv_dir: str,
+    requirements_path: Optional[str],
+    version: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+    log: LogFn = print,
+) -> Optional[str]:
+    """Create the instance venv at ``venv_dir`` and return its interpreter.
+
+    The venv is cloned from the cached template and then brought up to
+    date with an offline install from the wheelhouse, which is a no-op when
+    the template already satisfies ``requirements_path``.
+    """
+
+    template = ensure_template(
+        requirements_path, version=version, cache_dir=cache_dir, log=log
+    )
+    if template is None:
+        return None
+
+    # The interpreter is launched from the Odoo tree, not from here.
+    venv_dir = os.path.abspath(venv_dir)
+    clone_venv(template, venv_dir, log=log)
+    python = venv_python(venv_dir)
+    if requirements_path and os.path.exists(requirements_path):
+        wheelhouse = Wheelhouse(requirements_path, cache_dir=cache_dir, log=log)
+        if not wheelhouse.install(python=python):
+            return None
+    return python
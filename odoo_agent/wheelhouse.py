@@ -0,0 +1,190 @@
+"""Local wheelhouse for Odoo's Python requirements.
+
+Wheels are kept under ``<cache_dir>/wheelhouse/<key>`` where ``key`` hashes
+the contents of ``requirements.txt`` together with the interpreter ABI and
+platform, so a wheel built for one Python never leaks into another. A
+cold wheelhouse is filled by building one wheel per requirement in
+parallel; installs then run offline (``--no-index``) from the wheelhouse,
+which also works on air-gapped machines once the cache is warm.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import subprocess
+import sys
+import sysconfig
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from .cache import default_cache_dir
+from .commands import run_command
+from .events import LogFn
+
+COMPLETE_MARKER = ".complete"
+
+_local_abi: Optional[str] = None
+_local_abi_lock = threading.Lock()
+
+
+def abi_tag(python: Optional[str] = None) -> str:
+    """Return an identifier for the interpreter ABI and platform of ``python``."""
+
+    global _local_abi
+    if python is None or python == sys.executable:
+        # sysconfig fills its variables lazily and not thread-safely; a
+        # racing first call can miss SOABI and split the cache keys.
+        with _local_abi_lock:
+            if _local_abi is None:
+                _local_abi = "-".join(
+                    [
+                        sys.implementation.cache_tag or sys.implementation.name,
+                        sysconfig.get_config_var("SOABI") or "",
+                        sysconfig.get_platform(),
+                    ]
+                )
+        return _local_abi
+    code = (
+        "import sys, sysconfig; print('-'.join([sys.implementation.cache_tag or "
+        "sys.implementation.name, sysconfig.get_config_var('SOABI') or '', "
+        "sysconfig.get_platform()]))"
+    )
+    return subprocess.run(
+        [python, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def requirements_hash(requirements_path: str) -> str:
+    """Return the SHA-256 of ``requirements_path``."""
+
+    with open(requirements_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def parse_requirements(requirements_path: str) -> List[str]:
+    """Return the requirement lines of ``requirements_path``.
+
+    Comments, blank lines and pip options (``-r``, ``--index-url`` ...) are
+    skipped; environment markers are kept so pip can evaluate them.
+    """
+
+    requirements = []
+    with open(requirements_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split(" #", 1)[0].strip()
+            if line and not line.startswith(("#", "-")):
+                requirements.append(line)
+    return requirements
+
+
+class Wheelhouse:
+    """Cache of built wheels keyed by requirements hash and Python ABI."""
+
+    def __init__(
+        self,
+        requirements_path: str,
+        python: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        workers: Optional[int] = None,
+        log: LogFn = print,
+    ):
+        self.log = log
+        self.requirements_path = requirements_path
+        self.python = python or sys.executable
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.key = (
+            requirements_hash(requirements_path)[:16] + "-" + abi_tag(self.python)
+        )
+        root = os.path.join(cache_dir or default_cache_dir(), "wheelhouse")
+        self.path = os.path.join(root, self.key)
+
+    def is_warm(self) -> bool:
+        return os.path.exists(os.path.join(self.path, COMPLETE_MARKER))
+
+    def _pip(self, *args: str) -> List[str]:
+        return [self.python, "-m", "pip", *args]
+
+    def build(self) -> bool:
+        """Build every missing wheel into the wheelhouse.
+
+        Top-level requirements are built concurrently with ``--no-deps``;
+        a final resolver pass then adds any transitive dependencies, reusing
+        the wheels already present through ``--find-links``.
+        """
+
+        if self.is_warm():
+            self.log(f"Wheelhouse {self.key} is warm.")
+            return True
+
+        os.makedirs(self.path, exist_ok=True)
+        requirements = parse_requirements(self.requirements_path)
+        self.log(
+            f"Building {len(requirements)} wheels with {self.workers} workers "
+            f"into {self.path}..."
+        )
+
+        def build_one(requirement: str) -> bool:
+            return run_command(
+                self._pip(
+                    "wheel",
+                    "--no-deps",
+                    "--wheel-dir",
+                    self.path,
+                    "--find-links",
+                    self.path,
+                    requirement,
+                ),
+                log=self.log,
+            )
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(build_one, requirements))
+        if not all(results):
+            failed = [r for r, ok in zip(requirements, results) if not ok]
+            self.log(f"Failed to build wheels for: {', '.join(failed)}")
+            return False
+
+        if not run_command(
+            self._pip(
+                "wheel",
+                "--wheel-dir",
+                self.path,
+                "--find-links",
+                self.path,
+                "-r",
+                self.requirements_path,
+            ),
+            log=self.log,
+        ):
+            return False
+
+        with open(os.path.join(self.path, COMPLETE_MARKER), "w", encoding="utf-8"):
+            pass
+        return True
+
+    def install(self, python: Optional[str] = None) -> bool:
+        """Install the requirements offline from the wheelhouse.
+
+        Args:
+            python: Interpreter to install into; defaults to the interpreter
+                the wheelhouse was built for.
+        """
+
+        if not self.build():
+            return False
+        return run_command(
+            [
+                python or self.python,
+                "-m",
+                "pip",
+                "install",
+                "--no-index",
+                "--find-links",
+                self.path,
+                "-r",
+                self.requirements_path,
+            ],
+            log=self.log,
+        )
@@ -6,13 +6,21 @@ Run with:
 
 from __future__ import annotations
 
-import io
 import os
-import contextlib
 
 import streamlit as st
 
-from odoo_agent import OdooInstallerAgent
+from odoo_agent.jobs import SUCCEEDED, JobQueue
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """Return the job queue shared by all sessions of this server."""
+
+    return JobQueue(
+        workers=int(os.environ.get("ODOO_AGENT_JOB_WORKERS", "2")),
+        ttl=float(os.environ.get("ODOO_AGENT_JOB_TTL", "600")),
+    )
 
 
 st.set_page_config(page_title="Odoo Installer Agent", page_icon="🛠", layout="centered")
@@ -58,7 +66,6 @@ with st.form("odoo_install_form"):
     submitted = st.form_submit_button("Run installation workflow")
 
 if submitted:
-    st.write("### Running agent...")
 
     config = {}
     key_to_use = gemini_api_key
@@ -81,26 +88,49 @@ if submitted:
             icon="⚠️",
         )
 
-    agent = OdooInstallerAgent(config=config)
-
-    # Capture the agent's printed output so we can show it in the UI.
-    buffer = io.StringIO()
-    with contextlib.redirect_stdout(buffer):
-        success = agent.execute_installation_process(
-            odoo_version=odoo_version,
-            target_directory=target_directory,
-            real_install=False,  # Streamlit stays conceptual by default
-        )
+    # Runs go through a job queue shared by every session: identical
+    # requests reuse the queued, running or recently finished job.
+    job = get_job_queue().submit(
+        config,
+        odoo_version=odoo_version,
+        target_directory=target_directory,
+        real_install=False,  # Streamlit stays conceptual by default
+    )
+    st.session_state["job_id"] = job.id
 
-    logs = buffer.getvalue()
+job_id = st.session_state.get("job_id")
+job = get_job_queue().get(job_id) if job_id else None
 
+if job is not None:
+    status_placeholder = st.empty()
+    st.subheader("Steps")
+    steps_placeholder = st.empty()
     st.subheader("Agent logs")
-    if logs.strip():
-        st.code(logs, language="text")
-    else:
-        st.write("(No logs captured.)")
-
-    if success:
+    logs_placeholder = st.empty()
+
+    # The run's output goes to a log that belongs to this job only, so
+    # concurrent sessions stay isolated and lines show up as they arrive.
+    run = job.log
+    seen = 0
+    while True:
+        run.wait(since=seen, timeout=0.5)
+        seen = len(run.events())
+        status_placeholder.caption(f"Job {job.id}: {job.status}")
+        steps = run.steps()
+        if steps:
+            steps_placeholder.markdown(
+                "\n".join(f"- **{name}**: {status}" for name, status in steps.items())
+            )
+        logs = "\n".join(run.lines())
+        if logs.strip():
+            logs_placeholder.code(logs, language="text")
+        if run.done:
+            break
+
+    if not run.lines():
+        logs_placeholder.write("(No logs captured.)")
+
+    if job.status == SUCCEEDED:
         st.success("Odoo installation workflow completed successfully.")
     else:
         st.error("Odoo installation workflow failed. Check the logs above for details.")
@@ -0,0 +1,114 @@
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body):
+        server = self.server
+        requested = self.headers.get("Range")
+        with server.lock:
+            server.requests.append((self.command, requested))
+        data, etag = server.data, server.etag
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end, status = 0, len(data) - 1, 200
+        if requested:
+            parsed = re.fullmatch(r"bytes=(\d+)-(\d*)", requested)
+            start = int(parsed.group(1))
+            end = min(int(parsed.group(2) or end), end)
+            status = 206
+            if start in server.fail_offsets:
+                self.send_response(500)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+        body = data[start : end + 1]
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.end_headers()
+        if not send_body:
+            return
+        if server.stall:
+            # Send a little, then go quiet: only a read timeout ends this.
+            self.wfile.write(body[:1])
+            self.wfile.flush()
+            server.released.wait(server.stall)
+            return
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class FileServer(ThreadingHTTPServer):
+    """Loopback server for one payload with Range and ``ETag`` support.
+
+    ``fail_offsets`` makes ranges starting at those offsets answer ``500``;
+    ``stall`` makes every body stop after one byte for that many seconds.
+    ``requests`` records ``(method, Range header)`` per request.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, data: bytes, etag: str = '"v1"'):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.data = data
+        self.etag = etag
+        self.fail_offsets = set()
+        self.stall = 0.0
+        self.released = threading.Event()
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/odoo.zip"
+
+    def ranges(self):
+        with self.lock:
+            return [r for method, r in self.requests if method == "GET" and r]
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+@pytest.fixture
+def file_server():
+    servers = []
+
+    def start(data: bytes, **kwargs) -> FileServer:
+        server = FileServer(data, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.released.set()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,43 @@
+import os
+
+from odoo_agent.agent import OdooInstallerAgent
+from odoo_agent.benchmark import SCALES, ArchiveServer, build_archives, synthetic_files
+from odoo_agent.events import RunLog
+
+
+def _fetched(config, target, url):
+    run_log = RunLog()
+    agent = OdooInstallerAgent(config=config, run_log=run_log)
+    # Without Google credentials only the integration step fails.
+    agent.execute_installation_process(target_directory=target, download_url=url)
+    steps = {
+        event["name"]: event.get("cached", False)
+        for event in run_log.events()
+        if event["type"] == "step" and event["status"] == "ok"
+    }
+    assert steps["revalidate"] is False
+    return not steps["fetch"]
+
+
+def test_rerun_refetches_only_when_the_sources_changed(tmp_path):
+    v1 = build_archives(synthetic_files(SCALES["tiny"]), str(tmp_path / "v1"))
+    v2 = build_archives(synthetic_files(SCALES["small"]), str(tmp_path / "v2"))
+    target = str(tmp_path / "install")
+
+    for stream in (False, True):
+        config = {
+            "cache_dir": str(tmp_path / f"cache-{stream}"),
+            "stream_extract": stream,
+            "detect_roots": [str(tmp_path / "none")],
+        }
+        with ArchiveServer({"odoo.tar.gz": v1["tar.gz"]}) as server:
+            url = server.url("odoo.tar.gz")
+            for changed in (False, True):
+                if changed:
+                    path = v2["tar.gz"]
+                    server.entries["odoo.tar.gz"] = (path, os.path.getsize(path), '"v2"')
+                assert _fetched(config, f"{target}-{stream}", url)
+                # Once cached, the archive is validated by its digest instead
+                # of the server's ETag: that change costs one cached fetch.
+                assert _fetched(config, f"{target}-{stream}", url) is not stream
+                assert not _fetched(config, f"{target}-{stream}", url)
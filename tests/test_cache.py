@@ -0,0 +1,72 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from odoo_agent import cache
+from odoo_agent.cache import ArchiveCache
+
+
+def _quiet(message):
+    pass
+
+
+def test_fetch_fails_by_read_timeout_on_stalled_server(
+    file_server, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(cache, "HTTP_TIMEOUT", (1.0, 0.2))
+    server = file_server(os.urandom(4096))
+    server.stall = 30.0
+
+    start = time.monotonic()
+    with pytest.raises(requests.exceptions.RequestException):
+        ArchiveCache(str(tmp_path), log=_quiet).fetch(server.url)
+    assert time.monotonic() - start < 10
+
+
+def test_fetch_reuses_the_copy_while_the_server_answers_304(file_server, tmp_path):
+    data = os.urandom(4096)
+    server = file_server(data)
+    archives = ArchiveCache(str(tmp_path), log=_quiet)
+
+    blob, digest, hit = archives.fetch(server.url)
+    assert not hit
+    with open(blob, "rb") as f:
+        assert f.read() == data
+
+    assert archives.fetch(server.url) == (blob, digest, True)
+    assert archives.revalidate(server.url) == (blob, digest)
+    assert [method for method, _ in server.requests] == ["GET"] * 3
+
+
+def test_fetch_downloads_again_when_the_etag_changed(file_server, tmp_path):
+    server = file_server(b"old archive")
+    archives = ArchiveCache(str(tmp_path), log=_quiet)
+    _, old_digest, _ = archives.fetch(server.url)
+
+    server.data, server.etag = b"new archive", '"v2"'
+    assert archives.revalidate(server.url) is None
+    blob, digest, hit = archives.fetch(server.url)
+
+    assert not hit and digest != old_digest
+    with open(blob, "rb") as f:
+        assert f.read() == b"new archive"
+    assert archives.revalidate(server.url) == (blob, digest)
+
+
+def test_concurrent_fetches_download_once(file_server, tmp_path):
+    server = file_server(os.urandom(64 * 1024))
+
+    def fetch(_):
+        return ArchiveCache(str(tmp_path), log=_quiet).fetch(server.url)
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(fetch, range(6)))
+
+    assert len({digest for _, digest, _ in results}) == 1
+    assert sorted(hit for _, _, hit in results) == [False] + [True] * 5
+    assert len(server.requests) == 6
+    assert os.listdir(str(tmp_path / "blobs")) == [results[0][1]]
+    assert not any(name.endswith("part") for name in os.listdir(str(tmp_path / "tmp")))
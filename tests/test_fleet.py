@@ -0,0 +1,32 @@
+import os
+
+from odoo_agent.benchmark import SCALES, ArchiveServer, build_archives, synthetic_files
+from odoo_agent.fleet import InstanceSpec, install_many
+
+
+def test_fleet_downloads_and_extracts_each_archive_once(tmp_path):
+    archive = build_archives(synthetic_files(SCALES["tiny"]), str(tmp_path / "a"))["zip"]
+    lines = []
+    config = {
+        "cache_dir": str(tmp_path / "cache"),
+        "store_dir": str(tmp_path / "store"),
+        "precompile": False,
+    }
+
+    with ArchiveServer({"odoo.zip": archive}) as server:
+        specs = [
+            InstanceSpec(str(tmp_path / f"i{i}"), download_url=server.url("odoo.zip"))
+            for i in range(4)
+        ]
+        summary = install_many(specs, config=config, workers=4, log=lines.append)
+
+    assert len({result.port for result in summary.results}) == 4
+    assert sum("Cached archive" in line and " as " in line for line in lines) == 1
+    assert sum(line.startswith("Extracted ") for line in lines) == 1
+    assert sum("to source store" in line for line in lines) == 1
+    assert sum(line.startswith("Checked out") for line in lines) == 4
+    for spec in specs:
+        assert any(
+            os.path.exists(os.path.join(root, "odoo-bin"))
+            for root, _, _ in os.walk(spec.target_dir)
+        )
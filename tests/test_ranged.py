@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import time
+
+import pytest
+import requests
+
+from odoo_agent import ranged
+from odoo_agent.ranged import download_ranged
+
+
+def _quiet(message):
+    pass
+
+
+def test_stalled_segment_fails_by_read_timeout(file_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(ranged, "HTTP_TIMEOUT", (1.0, 0.2))
+    server = file_server(os.urandom(4096))
+    server.stall = 30.0
+
+    start = time.monotonic()
+    with pytest.raises(requests.exceptions.RequestException):
+        download_ranged(
+            server.url,
+            str(tmp_path / "odoo.zip"),
+            len(server.data),
+            workers=2,
+            segment_size=1024,
+            log=_quiet,
+        )
+    assert time.monotonic() - start < 10
+
+
+def _download(server, path, **kwargs):
+    return download_ranged(
+        server.url, path, len(server.data), segment_size=1024, log=_quiet, **kwargs
+    )
+
+
+def test_failing_segment_aborts_and_a_rerun_resumes(file_server, tmp_path):
+    data = os.urandom(4096)
+    server = file_server(data)
+    server.fail_offsets = {2048}
+    path = str(tmp_path / "odoo.zip")
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        _download(server, path, validator='"v1"', workers=1)
+    with open(path + ".manifest.json", encoding="utf-8") as f:
+        assert sorted(json.load(f)["done"]) == [0, 1024]
+    # Retried, then given up; a segment already in flight is not recorded.
+    assert server.ranges().count("bytes=2048-3071") == ranged.MAX_SEGMENT_RETRIES
+
+    server.fail_offsets = set()
+    server.requests.clear()
+    digest = _download(server, path, validator='"v1"', workers=2)
+
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert sorted(server.ranges()) == ["bytes=2048-3071", "bytes=3072-4095"]
+    assert not os.path.exists(path + ".manifest.json")
+
+
+def test_manifest_for_another_validator_is_not_resumed(file_server, tmp_path):
+    data = os.urandom(4096)
+    server = file_server(data)
+    server.fail_offsets = {3072}
+    path = str(tmp_path / "odoo.zip")
+    with pytest.raises(requests.exceptions.HTTPError):
+        _download(server, path, validator='"v1"', workers=1)
+
+    server.fail_offsets = set()
+    server.requests.clear()
+    digest = _download(server, path, validator='"v2"', workers=1)
+
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert len(server.ranges()) == 4
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from odoo_agent import rpc
+from odoo_agent.rpc import OdooClient
+
+
+class FakeClient(OdooClient):
+    """Client whose transport records calls instead of sending them."""
+
+    def __init__(self, **kwargs):
+        super().__init__("http://odoo.test", db="test", **kwargs)
+        self.calls = []
+        self._calls_lock = threading.Lock()
+
+    def _call(self, service, method, *args):
+        with self._calls_lock:
+            self.calls.append((service, method, args))
+        if service == "common" and method == "login":
+            return 2
+        return True
+
+    def object_calls(self, method):
+        return [args for service, name, args in self.calls if args[4:5] == (method,)]
+
+
+@pytest.fixture(autouse=True)
+def clear_uid_cache():
+    rpc._uid_cache.clear()
+    yield
+    rpc._uid_cache.clear()
+
+
+def test_write_many_groups_identical_values():
+    client = FakeClient()
+    values = {i: {"active": False} for i in range(1, 6)}
+    values[6] = {"active": True}
+
+    assert client.write_many("res.partner", values) == 2
+
+    writes = sorted(client.object_calls("write"), key=lambda args: len(args[5][0]))
+    assert [args[5] for args in writes] == [
+        [[6], {"active": True}],
+        [[1, 2, 3, 4, 5], {"active": False}],
+    ]
+
+
+def test_write_many_never_uses_load_for_text_values():
+    client = FakeClient()
+    values = {i: {"description_sale": f"Text {i}"} for i in range(1, 4)}
+
+    assert client.write_many("product.template", values) == 3
+
+    assert client.object_calls("load") == []
+    written = {args[5][0][0]: args[5][1] for args in client.object_calls("write")}
+    assert written == values
+
+
+def test_write_many_splits_groups_by_batch_size():
+    client = FakeClient()
+    values = {i: {"color": 3} for i in range(1, 8)}
+
+    assert client.write_many("res.partner", values, batch_size=3) == 3
+
+    sizes = sorted(len(args[5][0]) for args in client.object_calls("write"))
+    assert sizes == [1, 3, 3]
+
+
+def test_write_many_logs_in_once_before_fanning_out():
+    client = FakeClient(pool_size=4)
+    values = {i: {"sequence": i} for i in range(1, 20)}
+
+    client.write_many("res.partner", values)
+
+    logins = [c for c in client.calls if c[:2] == ("common", "login")]
+    assert len(logins) == 1
+
+
+def test_write_many_without_values_issues_no_call():
+    client = FakeClient()
+
+    assert client.write_many("res.partner", {}) == 0
+    assert client.calls == []
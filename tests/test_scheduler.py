@@ -0,0 +1,112 @@
+from odoo_agent.checkpoint import Checkpoint
+from odoo_agent.scheduler import CANCELLED, FAILED, OK, StepGraph
+
+
+def _quiet(message):
+    pass
+
+
+def _graph(tmp_path):
+    return StepGraph(checkpoint=Checkpoint.for_target(str(tmp_path)), log=_quiet)
+
+
+def test_step_with_a_none_key_always_runs(tmp_path):
+    runs = []
+    for _ in range(2):
+        graph = _graph(tmp_path)
+        graph.add("fetch", lambda inputs: runs.append(1) or "archive", key=lambda _: None)
+        assert graph.run()
+        assert not graph.results["fetch"].cached
+    assert len(runs) == 2
+
+
+def test_step_keyed_on_a_dependency_reruns_when_it_changes(tmp_path):
+    answers = iter(["v1", "v1", "v2"])
+    runs = []
+    for _ in range(3):
+        graph = _graph(tmp_path)
+        graph.add("revalidate", lambda _: next(answers))
+        graph.add(
+            "fetch",
+            lambda inputs: runs.append(inputs["revalidate"]) or "archive",
+            deps=["revalidate"],
+            key=lambda _: {"url": "odoo.zip"},
+        )
+        assert graph.run()
+        assert graph.results["fetch"].status == OK
+    assert runs == ["v1", "v2"]
+
+
+def test_step_run_without_a_key_forgets_its_recorded_value(tmp_path):
+    keys = iter([{"v": 1}, None, {"v": 1}])
+    runs = []
+    for _ in range(3):
+        graph = _graph(tmp_path)
+        graph.add(
+            "fetch", lambda _: runs.append(1) or len(runs), key=lambda _: next(keys)
+        )
+        assert graph.run()
+    assert graph.results["fetch"].value == 3
+
+
+def _boom(_):
+    raise RuntimeError("boom")
+
+
+def test_raising_step_fails_and_cancels_its_dependents():
+    graph = StepGraph(log=_quiet)
+    graph.add("fetch", _boom)
+    graph.add("extract", lambda _: "tree", deps=["fetch"])
+    graph.add("start", lambda _: True, deps=["extract"])
+    graph.add("integrate", lambda _: True)
+
+    assert not graph.run()
+    statuses = {name: result.status for name, result in graph.results.items()}
+    assert statuses == {
+        "fetch": FAILED,
+        "extract": CANCELLED,
+        "start": CANCELLED,
+        "integrate": OK,
+    }
+    assert isinstance(graph.results["fetch"].error, RuntimeError)
+
+
+def test_step_returning_false_fails():
+    graph = StepGraph(log=_quiet)
+    graph.add("db", lambda _: False)
+    graph.add("start", lambda _: True, deps=["db"])
+
+    assert not graph.run()
+    assert graph.results["db"].status == FAILED
+    assert graph.results["start"].status == CANCELLED
+
+
+def test_raising_key_fails_the_step_without_running_it(tmp_path):
+    runs = []
+    graph = _graph(tmp_path)
+    graph.add("extract", lambda _: runs.append(1), key=_boom)
+
+    assert not graph.run()
+    assert graph.results["extract"].status == FAILED
+    assert runs == []
+
+
+def test_raising_check_fails_the_step(tmp_path):
+    for check in (None, _boom):
+        graph = _graph(tmp_path)
+        graph.add("extract", lambda _: "tree", key=lambda _: {"v": 1}, check=check)
+        graph.run()
+    assert graph.results["extract"].status == FAILED
+    assert "extract" not in Checkpoint.for_target(str(tmp_path)).steps
+
+
+def test_failed_rerun_discards_the_checkpoint(tmp_path):
+    def recorded():
+        return "extract" in Checkpoint.for_target(str(tmp_path)).steps
+
+    for func in (lambda _: "tree", lambda _: False, lambda _: "tree", _boom):
+        graph = _graph(tmp_path)
+        # The check rejects the recorded tree, as if it had been deleted.
+        graph.add("extract", func, key=lambda _: {"v": 1}, check=lambda _: False)
+        graph.run()
+        assert recorded() is (graph.results["extract"].status == OK)
@@ -0,0 +1,85 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo_agent.store import SourceStore
+
+
+def _quiet(message):
+    pass
+
+
+def _writer(name):
+    def populate(scratch):
+        with open(os.path.join(scratch, "odoo-bin"), "w", encoding="utf-8") as f:
+            f.write(name)
+        return True
+
+    return populate
+
+
+def _content(store, key):
+    with open(os.path.join(store.path(key), "odoo-bin"), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_concurrent_adds_publish_one_complete_tree(tmp_path):
+    store = SourceStore(str(tmp_path), log=_quiet)
+    barrier = threading.Barrier(4)
+
+    def add(name):
+        def populate(scratch):
+            barrier.wait()
+            return _writer(name)(scratch)
+
+        return store.add("16.0-abc", populate)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert all(pool.map(add, ["a", "b", "c", "d"]))
+
+    assert store.has("16.0-abc")
+    assert _content(store, "16.0-abc") in "abcd"
+    assert sorted(os.listdir(str(tmp_path))) == [".lock-16.0-abc", "16.0-abc"]
+
+
+def test_completed_key_is_never_replaced(tmp_path):
+    store = SourceStore(str(tmp_path), log=_quiet)
+    assert store.add("16.0-abc", _writer("first"))
+
+    def populate(scratch):
+        raise AssertionError("a completed key is not populated again")
+
+    assert store.add("16.0-abc", populate)
+    assert _content(store, "16.0-abc") == "first"
+
+
+def test_adder_that_loses_the_race_keeps_the_published_tree(tmp_path):
+    store = SourceStore(str(tmp_path), log=_quiet)
+
+    def populate(scratch):
+        # Another adder publishes the key while this one is extracting.
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            assert pool.submit(store.add, "16.0-abc", _writer("winner")).result()
+        return _writer("loser")(scratch)
+
+    assert store.add("16.0-abc", populate)
+    assert _content(store, "16.0-abc") == "winner"
+    assert sorted(os.listdir(str(tmp_path))) == [".lock-16.0-abc", "16.0-abc"]
+
+
+def test_incomplete_leftover_is_replaced(tmp_path):
+    store = SourceStore(str(tmp_path), log=_quiet)
+    os.makedirs(store.path("16.0-abc"))
+    _writer("interrupted")(store.path("16.0-abc"))
+
+    assert not store.has("16.0-abc")
+    assert store.add("16.0-abc", _writer("fresh"))
+    assert store.has("16.0-abc") and _content(store, "16.0-abc") == "fresh"
+
+
+def test_failed_populate_leaves_nothing_behind(tmp_path):
+    store = SourceStore(str(tmp_path), log=_quiet)
+
+    assert not store.add("16.0-abc", lambda scratch: False)
+    assert not store.has("16.0-abc")
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,57 @@
+import hashlib
+import os
+
+from odoo_agent.benchmark import (
+    SCALES,
+    TOP_DIR,
+    ArchiveServer,
+    build_archives,
+    synthetic_files,
+)
+from odoo_agent.download import extract_odoo
+from odoo_agent.upgrade import MANIFEST_NAME, _load_state, update_odoo
+
+
+def _digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _quiet(message):
+    pass
+
+
+def test_update_defaults_to_the_installed_module_selection(tmp_path):
+    files = synthetic_files(SCALES["tiny"])
+    v1 = build_archives(files, str(tmp_path / "v1"))["zip"]
+    files["addons/addon_000/models/extra.py"] = b"x = 1\n"
+    files["addons/addon_019/models/extra.py"] = b"y = 2\n"
+    v2 = build_archives(files, str(tmp_path / "v2"))["zip"]
+
+    ok, root = extract_odoo(
+        v1,
+        _digest(v1),
+        target_dir=str(tmp_path / "install"),
+        modules=["addon_000"],
+        log=_quiet,
+    )
+    assert ok and root.endswith(TOP_DIR)
+    assert _load_state(root)["modules"] == ["addon_000"]
+    assert _load_state(root)["archive"] == _digest(v1)
+    assert not os.path.exists(os.path.join(root, "addons", "addon_019"))
+
+    with ArchiveServer({"odoo.zip": v2}) as server:
+        ok, summary = update_odoo(
+            root,
+            download_url=server.url("odoo.zip"),
+            cache_dir=str(tmp_path / "cache"),
+            log=_quiet,
+        )
+
+    assert ok, summary
+    assert os.path.exists(os.path.join(root, "addons", "addon_000", "models", "extra.py"))
+    assert not os.path.exists(os.path.join(root, "addons", "addon_019"))
+    state = _load_state(root)
+    assert state["modules"] == ["addon_000"]
+    assert state["archive"] == _digest(v2)
+    assert os.path.exists(os.path.join(root, MANIFEST_NAME))